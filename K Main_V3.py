@@ -14,6 +14,13 @@ from ui.action_popup import ActionPopup
 from ui.common_tags_manager import CommonTagsManager
 from ui.advanced_tag_selector import AdvancedTagSelector
 from data.db_manager import DatabaseManager
+from services.thumbnail_service import ThumbnailWorker
+from services.db_worker import DbWorker
+from services.image_storage import ImageStorageWorker
+from services.retention_service import RetentionWorker
+from services.backup_service import BackupService
+from services.change_feed import ChangeFeed
+from core.config import BACKUP_EXIT_TIMEOUT_S
 from core.settings import load_setting
 
 SERVER_NAME = "K_KUAIJIBIJI_SINGLE_INSTANCE_SERVER"
@@ -29,6 +36,11 @@ class AppManager(QObject):
         self.ball = None
         self.popup = None 
         self.tray_icon = None
+        self.image_storage = None
+        self.retention = None
+        self.thumbnails = None
+        self.backup = None
+        self.change_feed = None
         
         self.tags_manager_dialog = None
 
@@ -53,7 +65,10 @@ class AppManager(QObject):
 
         self._init_tray_icon(app_icon)
 
-        self.main_window = MainWindow()
+        # 各窗口按变更日志增量刷新；后台线程与其他进程的写入由定时检查发现
+        self.change_feed = ChangeFeed.instance(self.db_manager)
+
+        self.main_window = MainWindow(self.db_manager)
         self.main_window.closing.connect(self.on_main_window_closing)
 
         self.ball = FloatingBall(self.main_window)
@@ -104,6 +119,32 @@ class AppManager(QObject):
         
         self.quick_window.cm.data_captured.connect(self._on_clipboard_data_captured)
 
+        # 图片在后台重新编码为更小的格式；有新采集时唤醒
+        self.image_storage = ImageStorageWorker(self.db_manager)
+        self.quick_window.cm.data_captured.connect(lambda _id: self.image_storage.notify())
+
+        # 剪贴板历史按保留策略在空闲时分批清理；有新采集时推迟
+        self.retention = RetentionWorker(self.db_manager)
+        self.quick_window.cm.data_captured.connect(lambda _id: self.retention.touch())
+
+        # 定时在后台备份数据库，进度显示在托盘提示中
+        self.backup = BackupService.instance()
+        self.backup.progress.connect(self._on_backup_progress)
+        self.backup.finished.connect(lambda _path, _error: self.tray_icon.setToolTip("快速笔记"))
+        self.backup.start()
+
+        # 旧版本内联的图片已由结构迁移 v12 迁出 (data/schema_migrations.py)
+        self.image_storage.start()
+        self.retention.start()
+
+        # 缩略图在后台线程生成，并为旧图片补生成缩略图
+        self.thumbnails = ThumbnailWorker.instance(self.db_manager)
+        self.thumbnails.start()
+
+    def _on_backup_progress(self, copied, total):
+        if total:
+            self.tray_icon.setToolTip(f"快速笔记 - 正在备份 {copied * 100 // total}%")
+
     def _init_tray_icon(self, icon):
         self.tray_icon = QSystemTrayIcon(self.app)
         self.tray_icon.setIcon(icon)
@@ -158,9 +199,7 @@ class AppManager(QObject):
 
     def _handle_popup_favorite(self, idea_id):
         self.db_manager.set_favorite(idea_id, True)
-        if self.main_window.isVisible():
-            self.main_window._load_data()
-            self.main_window.sidebar.refresh()
+        self.change_feed.notify()
             
     # 【新增】处理弹窗的删除请求
     def _handle_popup_delete(self, idea_id):
@@ -172,21 +211,14 @@ class AppManager(QObject):
             QToolTip.showText(QCursor.pos(), "🗑️ 已撤销创建", self.popup)
             
             # 刷新可能打开的界面
-            if self.main_window.isVisible():
-                self.main_window._load_data()
-            if self.quick_window.isVisible():
-                self.quick_window._update_list()
-                self.quick_window._update_partition_tree()
+            self.change_feed.notify()
 
     def _handle_popup_tag_toggle(self, idea_id, tag_name, checked):
         if checked:
             self.db_manager.add_tags_to_multiple_ideas([idea_id], [tag_name])
         else:
             self.db_manager.remove_tag_from_multiple_ideas([idea_id], tag_name)
-            
-        if self.main_window.isVisible():
-            self.main_window._load_data()
-            self.main_window._refresh_tag_panel()
+        self.change_feed.notify()
 
     def _force_activate(self, window):
         if not window: return
@@ -222,6 +254,33 @@ class AppManager(QObject):
             try:
                 self.main_window.save_state()
             except: pass
+        # 写完尚未提交的剪贴板采集
+        if self.quick_window:
+            try:
+                self.quick_window.cm.flush()
+            except: pass
+        # 停止变更检查、图片重新编码与历史清理，等待后台查询结束，再关闭数据库连接
+        if self.change_feed:
+            self.change_feed.stop()
+        if self.image_storage:
+            self.image_storage.stop(timeout=5)
+        if self.retention:
+            self.retention.stop(timeout=5)
+        if self.thumbnails:
+            self.thumbnails.stop(timeout=5)
+        # 隐藏界面后在后台线程完成退出备份
+        for w in (self.ball, self.quick_window, self.main_window):
+            if w:
+                w.hide()
+        if self.tray_icon:
+            self.tray_icon.hide()
+        BackupService.instance().shutdown(final_backup=True, timeout=BACKUP_EXIT_TIMEOUT_S)
+        DbWorker.instance().shutdown()
+        if self.db_manager:
+            try:
+                # 提交并执行 WAL 检查点，避免退出后残留 -wal 文件
+                self.db_manager.close()
+            except: pass
         self.app.quit()
 
 def main():
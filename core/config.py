@@ -1,6 +1,60 @@
 # core/config.py
 DB_NAME = 'ideas.db'
 BACKUP_DIR = 'backups'
+BACKUP_KEEP = 100                      # 保留的完整快照数量 (其后的增量备份随快照一起保留或删除)
+BACKUP_INTERVAL_S = 3600               # 定时备份间隔 (秒)，两次完整快照之间只保存增量
+BACKUP_FULL_INTERVAL_S = 24 * 3600     # 完整快照间隔 (秒)
+BACKUP_STEP_PAGES = 256                # 在线备份每步复制的页数
+BACKUP_STEP_SLEEP_S = 0.005            # 在线备份每步之间让出的时间 (秒)
+BACKUP_EXIT_TIMEOUT_S = 60             # 退出时最多等待备份完成的时间 (秒)
+BACKUP_CHUNK_PAGES = 32                # 备份仓库按多少个数据库页切成一个数据块
+BACKUP_COMPRESS_LEVEL = 6              # 备份数据块的 zlib 压缩级别
+BACKUP_GC_GRACE_S = 3600               # 清理备份仓库时不删除这段时间内写入的未引用数据块 (秒)
+
+# === 数据库连接参数 ===
+DB_BUSY_TIMEOUT_MS = 5000              # 遇到锁时的最长等待时间 (毫秒)
+DB_CACHE_SIZE_KB = 16 * 1024           # 每个连接的页缓存大小 (KB)
+DB_MMAP_SIZE = 256 * 1024 * 1024       # 内存映射读取上限 (字节)
+DB_READ_POOL_SIZE = 4                  # 只读连接池大小
+DB_WORKER_THREADS = 2                  # 后台查询线程数 (不超过只读连接池大小)
+DB_PROGRESS_OPS = 10000                # 只读查询每执行多少条虚拟机指令检查一次是否已取消
+QUICK_FIRST_PAGE = 50                  # 快速窗口先显示的条数，其余结果随后追加
+CAPTURE_FLUSH_MS = 30                  # 剪贴板采集最长等待多久合并提交一次 (毫秒)
+CAPTURE_BATCH_MAX = 256                # 单次合并提交的最大采集条数
+CHANGE_POLL_MS = 500                   # 多久检查一次数据是否被修改 (毫秒)，界面据此增量刷新
+
+# === 大段文本压缩 ===
+CONTENT_COMPRESS_THRESHOLD = 64 * 1024 # 正文超过多少个字符时压缩存储
+CONTENT_PREFIX_CHARS = 4096            # 压缩存储时保留的纯文本前缀长度 (列表显示与全文索引使用)
+CONTENT_COMPRESS_LEVEL = 6             # zlib 压缩级别
+
+# === 缩略图缓存 ===
+THUMB_CARD_HEIGHT = 160                # 主界面卡片中的图片最大高度
+THUMB_CARD_MAX_WIDTH = 400             # 主界面卡片中的图片最大宽度
+THUMB_LIST_SIZE = (120, 90)            # 快速窗口列表图标尺寸
+THUMB_BACKFILL_BATCH = 20              # 后台为旧图片补生成缩略图时每批处理的图片数
+
+# === 图片后台重新编码 ===
+IMAGE_PNG_COMPRESSION = 9              # 无损重新编码时 PNG 的 zlib 压缩级别 (0-9)
+IMAGE_LOSSY_ENABLED = False            # 是否允许照片类图片改存为有损格式
+IMAGE_LOSSY_FORMAT = 'JPG'             # 有损格式
+IMAGE_LOSSY_QUALITIES = (90, 80, 70, 60)  # 有损压缩依次尝试的质量，直到满足大小预算
+IMAGE_SIZE_BUDGET = 2 * 1024 * 1024    # 单张图片的大小预算 (字节)，无损结果超出时才考虑有损格式
+IMAGE_MIN_SAVING = 0.05                # 新编码至少小这么多 (比例) 才替换原数据
+IMAGE_REENCODE_IDLE_S = 60             # 没有待处理图片时，多久再检查一次 (秒)
+
+# === 剪贴板历史保留策略 (默认关闭；在 settings.json 的 clipboard_retention 中设置上限开启，None 表示不限制) ===
+# 例如 {"clipboard_retention": {"max_items": 5000, "max_age_days": 90, "max_bytes": 536870912}}
+RETENTION_MAX_ITEMS = None             # 最多保留的剪贴板条目数
+RETENTION_MAX_AGE_DAYS = None          # 超过多少天未使用的剪贴板条目被清理
+RETENTION_MAX_BYTES = None             # 剪贴板条目正文与图片合计大小上限 (字节)
+RETENTION_KEEP_PINNED = True           # 置顶的条目不清理
+RETENTION_KEEP_FAVORITE = True         # 收藏的条目不清理
+RETENTION_KEEP_CATEGORIZED = True      # 已归入分类的条目不清理
+RETENTION_BATCH = 100                  # 每个写事务最多删除的条目数
+RETENTION_IDLE_S = 30                  # 多久没有新的采集才算空闲，开始清理 (秒)
+RETENTION_INTERVAL_S = 600             # 两次检查之间的间隔 (秒)
+RETENTION_VACUUM_PAGES = 256           # 每次增量回收的空闲页数
 
 COLORS = {
     'primary': '#4a90e2',   # 核心蓝 (UI按钮、高亮)
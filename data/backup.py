@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# data/backup.py
+"""
+数据库在线备份
+
+使用 SQLite 的在线备份 API (sqlite3.Connection.backup) 而不是直接复制文件：
+- 备份使用独立的源连接，并在整个复制过程中持有同一个读事务。WAL 模式下写操作照常提交，
+  备份内容固定为开始时的一致快照，也不会因为其他连接写入而从头重新开始
+- 每步复制 pages 页，步与步之间短暂让出，进度通过 progress(copied, total) 报告
+- 先写入 .part 临时文件，完成后再改名，中途失败不会留下不完整的备份
+
+增量备份
+完整快照之间只保存变更：根据 change_journal 找出上次备份之后变过的行，把这些行的当前内容
+写入一个小的 SQLite 文件 (增量文件)。增量文件记录自己的版本区间与上一份备份 (parent)，
+恢复时从完整快照开始依次重放整条链 (见 data/backup_repository.py)。
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+from core.config import DB_BUSY_TIMEOUT_MS
+from data.change_journal import (TRACKED, JOURNAL_TABLE, JournalGap, journal_version, oldest_version,
+                                 changed_keys, prune_journal)
+
+DELTA_SUFFIX = '.delta.db'
+# 重放顺序：笔记引用的标签、分类与图片先于笔记写入，标签关联最后整组替换
+_APPLY_ORDER = ('tags', 'categories', 'blobs', 'blob_encodings', 'ideas', 'idea_tags')
+_KEYS = dict(TRACKED)
+
+
+def online_backup(source_path, target_path, pages=256, sleep=0.005, progress=None):
+    """把 source_path 复制为 target_path，返回总页数"""
+    tmp = target_path + '.part'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    src = sqlite3.connect(source_path)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+        # 持有读事务固定快照 (BEGIN 之后的第一次读取才真正开始读事务)
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        total = src.execute("PRAGMA page_count").fetchone()[0]
+
+        def _step(status, remaining, pages_total):
+            if progress:
+                progress(pages_total - remaining, pages_total)
+
+        src.backup(dst, pages=pages, progress=_step, sleep=sleep)
+        # 备份文件单独使用，不需要 -wal 文件
+        dst.execute("PRAGMA journal_mode = DELETE")
+        dst.close()
+        os.replace(tmp, target_path)
+        return total
+    except Exception:
+        dst.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        src.rollback()
+        src.close()
+
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    return conn
+
+
+def _columns(c, schema, table):
+    c.execute(f"PRAGMA {schema}.table_info({table})")
+    return [r[1] for r in c.fetchall()]
+
+
+def is_delta(path):
+    return path.endswith(DELTA_SUFFIX)
+
+
+def backup_info(path):
+    """
+    读取备份文件的版本信息：
+    - 完整快照: {'kind': 'full', 'version'}，没有变更日志的旧备份 version 为 None
+    - 增量文件: {'kind': 'delta', 'version', 'from_version', 'parent', 'created'}
+    """
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        c = conn.cursor()
+        if is_delta(path):
+            c.execute("SELECT key, value FROM backup_meta")
+            meta = dict(c.fetchall())
+            return {'kind': 'delta', 'version': meta['to_version'], 'from_version': meta['from_version'],
+                    'parent': meta['parent'], 'created': meta['created']}
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (JOURNAL_TABLE,))
+        return {'kind': 'full', 'version': journal_version(c) if c.fetchone() else None}
+    finally:
+        conn.close()
+
+
+def write_delta(source_path, target_path, after_version, parent):
+    """
+    把 after_version 之后的变更写入增量文件 target_path，返回 (新版本号, 变更行数)。
+    没有变更时不创建文件；日志已被清理到 after_version 之后时抛出 JournalGap。
+    """
+    tmp = target_path + '.part'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    src = _connect(source_path)
+    c = src.cursor()
+    try:
+        c.execute("ATTACH DATABASE ? AS d", (tmp,))
+        # 读事务固定快照，日志与行内容来自同一时刻
+        c.execute("BEGIN")
+        to_version = journal_version(c)
+        first = oldest_version(c)
+        if first > after_version:
+            raise JournalGap(f"变更日志从 v{first} 开始，缺少 v{after_version} 之后的记录")
+        if to_version == after_version:
+            src.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return after_version, 0
+
+        keys = changed_keys(c, after_version, to_version)
+        c.execute("CREATE TABLE d.backup_meta (key TEXT PRIMARY KEY, value)")
+        c.execute("CREATE TABLE d.changes (entity TEXT NOT NULL, entity_id NOT NULL)")
+        rows = 0
+        for table, key in TRACKED:
+            c.execute(f"CREATE TABLE d.{table} AS SELECT * FROM main.{table} WHERE 0")
+            ids = json.dumps(list(keys.get(table, ())))
+            c.execute("INSERT INTO d.changes SELECT ?, value FROM json_each(?)", (table, ids))
+            c.execute(f"INSERT INTO d.{table} SELECT * FROM main.{table} WHERE {key} IN (SELECT value FROM json_each(?))", (ids,))
+            rows += c.rowcount
+        c.executemany("INSERT INTO d.backup_meta (key, value) VALUES (?, ?)", [
+            ('from_version', after_version), ('to_version', to_version),
+            ('parent', parent), ('created', datetime.now().isoformat(timespec='seconds')),
+        ])
+        src.commit()
+        src.close()
+        os.replace(tmp, target_path)
+        return to_version, rows
+    except Exception:
+        src.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def apply_delta(conn, delta_path):
+    """在一个事务内把增量文件重放到 conn (触发器会同步计数器与全文索引)"""
+    c = conn.cursor()
+    c.execute("ATTACH DATABASE ? AS d", (delta_path,))
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        for table in _APPLY_ORDER:
+            key = _KEYS[table]
+            live = set(_columns(c, 'main', table))
+            cols = [col for col in _columns(c, 'd', table) if col in live]
+            names = ', '.join(cols)
+            if table == 'idea_tags':
+                c.execute("DELETE FROM main.idea_tags WHERE idea_id IN (SELECT entity_id FROM d.changes WHERE entity = 'idea_tags')")
+                c.execute(f"INSERT OR IGNORE INTO main.idea_tags ({names}) SELECT {names} FROM d.idea_tags")
+                continue
+            # 已删除的行
+            c.execute(f"""DELETE FROM main.{table} WHERE {key} IN (
+                              SELECT entity_id FROM d.changes WHERE entity = ?
+                              AND entity_id NOT IN (SELECT {key} FROM d.{table}))""", (table,))
+            # 已有的行原地更新 (不先删除，避免触发图片引用回收)，其余插入
+            others = ', '.join(col for col in cols if col != key)
+            if others:
+                c.execute(f"""UPDATE main.{table} SET ({others}) = (SELECT {others} FROM d.{table} s WHERE s.{key} = main.{table}.{key})
+                              WHERE {key} IN (SELECT {key} FROM d.{table})""")
+            c.execute(f"""INSERT INTO main.{table} ({names}) SELECT {names} FROM d.{table}
+                          WHERE {key} NOT IN (SELECT {key} FROM main.{table})""")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        c.execute("DETACH DATABASE d")
+
+
+def trim_journal(db_path, upto_version):
+    """清理 upto_version 及之前的变更日志 (这些变更已包含在保留的最早快照中)，返回删除的条数"""
+    conn = _connect(db_path)
+    try:
+        with conn:
+            return prune_journal(conn.cursor(), upto_version)
+    finally:
+        conn.close()
+
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# data/backup_browser.py
+"""
+浏览备份、与当前数据库比较、选择性恢复
+
+不替换整个数据库文件：
+- BackupRepository.checkout() 把备份还原到 backups/cache/ 下的缓存文件 (只在第一次打开时还原)
+- BackupBrowser 以只读方式打开缓存文件并附加当前数据库，按 id 与 content_hash 比较一次，
+  结果存入临时表 diff (以 id 为主键)，之后按状态分页浏览只需按主键查找
+- restore_items() 在写连接上附加备份，把选中的笔记连同其标签、分类与图片在一个事务内恢复
+"""
+import argparse
+import json
+import os
+import sqlite3
+from data.backup import _columns
+from data.content_store import unpack_content
+
+# 比较结果
+DELETED = 'deleted'      # 备份中有，当前数据库中按 id 与 content_hash 都找不到
+MOVED = 'moved'          # 原 id 已不存在，但相同内容 (content_hash) 仍在当前数据库中
+CHANGED = 'changed'      # 同一 id，标题、正文、状态或所属分类不同
+ADDED = 'added'          # 只有当前数据库中有
+
+_COMPARED = ('title', 'content', 'content_z', 'color', 'is_pinned', 'is_favorite', 'updated_at',
+             'category_id', 'is_deleted', 'blob_hash')
+
+
+class BackupBrowser:
+    def __init__(self, backup_path, live_path):
+        self.backup_path = backup_path
+        self.live_path = live_path
+        self.conn = None
+
+    def open(self):
+        uri = lambda p: f"file:{os.path.abspath(p)}?mode=ro"
+        self.conn = sqlite3.connect(uri(self.backup_path), uri=True)
+        self.conn.execute("ATTACH DATABASE ? AS live", (uri(self.live_path),))
+        self._build_diff()
+        return self
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _build_diff(self):
+        c = self.conn.cursor()
+        differs = ' OR '.join(f'l.{col} IS NOT b.{col}' for col in _COMPARED)
+        c.execute("CREATE TEMP TABLE diff (id INTEGER PRIMARY KEY, status TEXT NOT NULL, live_id INTEGER)")
+        c.execute("CREATE INDEX temp.idx_diff_status ON diff(status, id)")
+        c.execute(f'''
+            INSERT INTO temp.diff (id, status, live_id)
+            SELECT id, status, live_id FROM (
+                SELECT b.id,
+                       CASE WHEN l.id IS NULL THEN (CASE WHEN m.id IS NULL THEN '{DELETED}' ELSE '{MOVED}' END)
+                            WHEN {differs} THEN '{CHANGED}' END AS status,
+                       COALESCE(l.id, m.id) AS live_id
+                FROM main.ideas b
+                LEFT JOIN live.ideas l ON l.id = b.id
+                LEFT JOIN live.ideas m ON m.id = (
+                    SELECT id FROM live.ideas WHERE l.id IS NULL AND content_hash = b.content_hash LIMIT 1)
+            ) WHERE status IS NOT NULL''')
+        c.execute(f'''
+            INSERT INTO temp.diff (id, status, live_id)
+            SELECT l.id, '{ADDED}', l.id FROM live.ideas l
+            WHERE NOT EXISTS (SELECT 1 FROM main.ideas WHERE id = l.id)''')
+
+    def summary(self):
+        """返回 {状态: 条数}"""
+        c = self.conn.execute("SELECT status, COUNT(*) FROM temp.diff GROUP BY status")
+        return dict(c.fetchall())
+
+    def items(self, status=None, limit=50, after_id=0):
+        """
+        按 id 分页列出有差异的笔记：[(id, status, live_id, title, item_type, updated_at, is_deleted)]。
+        added 的笔记取当前数据库中的标题，其余取备份中的标题。
+        """
+        cond, params = ("d.status = ? AND ", [status]) if status else ("", [])
+        c = self.conn.execute(f'''
+            SELECT d.id, d.status, d.live_id,
+                   COALESCE(b.title, l.title), COALESCE(b.item_type, l.item_type),
+                   COALESCE(b.updated_at, l.updated_at), COALESCE(b.is_deleted, l.is_deleted)
+            FROM temp.diff d
+            LEFT JOIN main.ideas b ON b.id = d.id AND d.status != '{ADDED}'
+            LEFT JOIN live.ideas l ON l.id = d.id AND d.status = '{ADDED}'
+            WHERE {cond}d.id > ? ORDER BY d.id LIMIT ?''', (*params, after_id, limit))
+        return c.fetchall()
+
+    def get(self, iid):
+        """备份中的一条笔记：(id, title, content, item_type, updated_at, category_id, tags)，content 为完整正文"""
+        c = self.conn.execute('''SELECT id, title, content, content_z, item_type, updated_at, category_id
+                                 FROM main.ideas WHERE id = ?''', (iid,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        tags = [r[0] for r in self.conn.execute(
+            'SELECT t.name FROM main.idea_tags it JOIN main.tags t ON t.id = it.tag_id WHERE it.idea_id = ?', (iid,))]
+        return (row[0], row[1], unpack_content(row[2], row[3]), row[4], row[5], row[6], tags)
+
+
+def _shared_columns(c, table):
+    live = set(_columns(c, 'main', table))
+    return [col for col in _columns(c, 'bk', table) if col in live]
+
+
+def restore_items(c, idea_ids):
+    """
+    把附加为 bk 的备份中的一组笔记恢复到当前数据库 (调用方负责事务)：
+    - 当前数据库中不存在的分类 (含上级分类) 按原 id 恢复，已存在的保持不变
+    - 标签按名称对应，当前没有的标签重新创建
+    - 引用的图片及其缩略图、重新编码记录一并复制
+    - 原 id 仍存在的笔记恢复为备份中的内容，已被删除的按原 id 重新插入；标签整组替换为备份中的标签
+    返回恢复的笔记 [(id, content_hash)]。
+    """
+    ids = json.dumps([int(i) for i in idea_ids])
+    selected = "SELECT value FROM json_each(?)"
+
+    c.execute(f"SELECT DISTINCT category_id FROM bk.ideas WHERE id IN ({selected}) AND category_id IS NOT NULL", (ids,))
+    pending, categories = [r[0] for r in c.fetchall()], set()
+    while pending:
+        cid = pending.pop()
+        if cid in categories:
+            continue
+        categories.add(cid)
+        c.execute("SELECT parent_id FROM bk.categories WHERE id = ?", (cid,))
+        row = c.fetchone()
+        if row and row[0] is not None:
+            pending.append(row[0])
+    cols = ', '.join(_shared_columns(c, 'categories'))
+    c.execute(f'''INSERT INTO main.categories ({cols}) SELECT {cols} FROM bk.categories
+                  WHERE id IN ({selected}) AND id NOT IN (SELECT id FROM main.categories)''', (json.dumps(list(categories)),))
+
+    c.execute(f'''INSERT OR IGNORE INTO main.tags (name)
+                  SELECT DISTINCT t.name FROM bk.idea_tags it JOIN bk.tags t ON t.id = it.tag_id
+                  WHERE it.idea_id IN ({selected})''', (ids,))
+
+    blob_hashes = f"SELECT blob_hash FROM bk.ideas WHERE id IN ({selected}) AND blob_hash IS NOT NULL"
+    for table in ('blobs', 'blob_encodings'):
+        cols = ', '.join(_shared_columns(c, table))
+        c.execute(f"INSERT OR IGNORE INTO main.{table} ({cols}) SELECT {cols} FROM bk.{table} WHERE content_hash IN ({blob_hashes})", (ids,))
+    cols = ', '.join(_shared_columns(c, 'thumbnails'))
+    c.execute(f"INSERT OR IGNORE INTO main.thumbnails ({cols}) SELECT {cols} FROM bk.thumbnails WHERE blob_hash IN ({blob_hashes})", (ids,))
+
+    shared = _shared_columns(c, 'ideas')
+    others = ', '.join(col for col in shared if col != 'id')
+    cols = ', '.join(shared)
+    c.execute(f'''UPDATE main.ideas SET ({others}) = (SELECT {others} FROM bk.ideas b WHERE b.id = main.ideas.id)
+                  WHERE id IN ({selected}) AND id IN (SELECT id FROM bk.ideas)''', (ids,))
+    c.execute(f'''INSERT INTO main.ideas ({cols}) SELECT {cols} FROM bk.ideas
+                  WHERE id IN ({selected}) AND id NOT IN (SELECT id FROM main.ideas)''', (ids,))
+
+    c.execute(f"DELETE FROM main.idea_tags WHERE idea_id IN ({selected}) AND idea_id IN (SELECT id FROM bk.ideas)", (ids,))
+    c.execute(f'''INSERT OR IGNORE INTO main.idea_tags (idea_id, tag_id)
+                  SELECT it.idea_id, lt.id FROM bk.idea_tags it
+                  JOIN bk.tags bt ON bt.id = it.tag_id JOIN main.tags lt ON lt.name = bt.name
+                  WHERE it.idea_id IN ({selected})''', (ids,))
+
+    c.execute(f"SELECT id, content_hash FROM bk.ideas WHERE id IN ({selected})", (ids,))
+    return c.fetchall()
+
+
+def main(argv=None):
+    from core.config import BACKUP_DIR, DB_NAME
+    from data.backup_repository import BackupRepository
+    parser = argparse.ArgumentParser(description="浏览备份并选择性恢复笔记")
+    parser.add_argument('--repo', default=BACKUP_DIR)
+    parser.add_argument('--db', default=DB_NAME)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('diff', help="列出备份与当前数据库的差异")
+    p.add_argument('name')
+    p.add_argument('--status', choices=(DELETED, MOVED, CHANGED, ADDED))
+    p.add_argument('--limit', type=int, default=50)
+    p.add_argument('--after', type=int, default=0, help="从该 id 之后继续列出")
+    p = sub.add_parser('show', help="显示备份中的一条笔记")
+    p.add_argument('name')
+    p.add_argument('id', type=int)
+    p = sub.add_parser('restore', help="把备份中的笔记恢复到当前数据库")
+    p.add_argument('name')
+    p.add_argument('ids', type=int, nargs='+')
+    args = parser.parse_args(argv)
+    path = BackupRepository(args.repo).checkout(args.name)
+
+    if args.command == 'restore':
+        from data.connection_manager import ConnectionManager
+        from data.db_manager import DatabaseManager
+        db = DatabaseManager(ConnectionManager(args.db))
+        try:
+            print(f"已恢复 {db.restore_from_backup(path, args.ids)} 条笔记")
+        finally:
+            db.close()
+        return 0
+
+    with BackupBrowser(path, args.db) as browser:
+        if args.command == 'diff':
+            print('  '.join(f"{k}: {v}" for k, v in sorted(browser.summary().items())))
+            for iid, status, live_id, title, item_type, updated_at, deleted in browser.items(args.status, args.limit, args.after):
+                moved = f" -> {live_id}" if status == MOVED else ''
+                print(f"{iid}{moved}\t{status}\t{item_type}\t{updated_at}\t{'[回收站] ' if deleted else ''}{title}")
+        elif args.command == 'show':
+            row = browser.get(args.id)
+            if row is None:
+                print("备份中没有这条笔记")
+                return 1
+            print(f"{row[1]}\n类型: {row[3]}  更新: {row[4]}  分类: {row[5]}  标签: {', '.join(row[6])}\n\n{row[2]}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
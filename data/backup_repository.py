@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+# data/backup_repository.py
+"""
+去重压缩的备份仓库
+
+BACKUP_DIR 下的目录结构：
+- chunks/ab/<sha256>    数据块，按未压缩内容的 SHA-256 命名，zlib 压缩后保存，同样的内容只存一份
+- snapshots/<名称>.json 每份备份 (完整快照或增量文件) 的索引：版本信息与按顺序排列的数据块摘要
+                        (32 字节原始摘要拼接后 base64 编码，多 GB 的数据库索引也只有几百 KB)
+- cache/<名称>.db       checkout() 还原出的数据库，供浏览与选择性恢复反复使用，gc() 时随索引一起删除
+- lock                  仓库锁：add_file()、checkout() 与 gc() 互斥 (跨进程，例如程序内的定时备份与命令行工具)
+
+数据库文件按页对齐切块 (每块 chunk_pages 页)。SQLite 修改数据时原地改写所在的页，
+相邻两次备份之间绝大部分块完全相同，保留很多个还原点也只比一份多占少量空间。
+gc() 按保留份数删除旧索引并清理不再被引用的数据块；verify() 校验索引与数据块是否完整。
+gc() 还会跳过最近 grace_s 秒内写入的数据块，不持有仓库锁的旧版本程序正在写入时也不会误删。
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from core.config import BACKUP_CHUNK_PAGES, BACKUP_COMPRESS_LEVEL, BACKUP_GC_GRACE_S
+from data.backup import DELTA_SUFFIX, apply_delta, backup_info, online_backup
+
+MANIFEST_SUFFIX = '.json'
+LOCK_NAME = 'lock'
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        while True:
+            try:
+                # LK_LOCK 重试约 10 秒后仍被占用时抛出 OSError，继续等待
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                time.sleep(0.1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _page_size(path):
+    """从数据库文件头读取页大小 (偏移 16 的两个字节，1 表示 65536)"""
+    with open(path, 'rb') as f:
+        header = f.read(100)
+    if len(header) < 100 or not header.startswith(b'SQLite format 3\0'):
+        return 4096
+    size = int.from_bytes(header[16:18], 'big')
+    return 65536 if size == 1 else size
+
+
+def _pack_chunks(digests):
+    return base64.b64encode(b''.join(digests)).decode('ascii')
+
+
+def _unpack_chunks(text):
+    raw = base64.b64decode(text)
+    return [raw[i:i + 32] for i in range(0, len(raw), 32)]
+
+
+def _write_atomic(path, data):
+    tmp = path + '.part'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class BackupRepository:
+    def __init__(self, root, chunk_pages=BACKUP_CHUNK_PAGES, level=BACKUP_COMPRESS_LEVEL):
+        self.root = root
+        self.chunk_pages = chunk_pages
+        self.level = level
+        self.chunk_dir = os.path.join(root, 'chunks')
+        self.snapshot_dir = os.path.join(root, 'snapshots')
+        self.cache_dir = os.path.join(root, 'cache')
+
+    def _chunk_path(self, digest):
+        h = digest.hex()
+        return os.path.join(self.chunk_dir, h[:2], h)
+
+    def _manifest_path(self, name):
+        return os.path.join(self.snapshot_dir, name + MANIFEST_SUFFIX)
+
+    @contextmanager
+    def locked(self):
+        """独占仓库锁 (阻塞等待)；锁随文件句柄释放，进程异常退出时由系统自动释放"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_NAME), 'a+b') as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+    # --- 写入 ---
+
+    def add_file(self, path, name, created=None, **meta):
+        """
+        把备份文件切块存入仓库并写入索引，返回索引。
+        meta 为版本信息：kind ('full' / 'delta')、version，增量另有 from_version、parent。
+        持有仓库锁直到索引写入，gc() 不会删除尚未被索引引用的新数据块。
+        """
+        with self.locked():
+            return self._add_file(path, name, created, meta)
+
+    def _add_file(self, path, name, created, meta):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        chunk_size = _page_size(path) * self.chunk_pages
+        chunks, stored = [], 0
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(chunk_size)
+                if not block:
+                    break
+                h = hashlib.sha256(block).digest()
+                chunk_path = self._chunk_path(h)
+                if not os.path.exists(chunk_path):
+                    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                    packed = zlib.compress(block, self.level)
+                    _write_atomic(chunk_path, packed)
+                    stored += len(packed)
+                chunks.append(h)
+        manifest = dict(meta, name=name, created=created or time.time(), size=os.path.getsize(path),
+                        chunk_size=chunk_size, new_bytes=stored, chunks=_pack_chunks(chunks))
+        # 数据块全部写入后才写索引，中途失败不会留下引用缺失数据块的索引
+        _write_atomic(self._manifest_path(name), json.dumps(manifest).encode('utf-8'))
+        manifest['chunks'] = chunks
+        return manifest
+
+    def import_file(self, path):
+        """把旧版本直接存放在备份目录中的备份文件导入仓库 (导入后删除原文件)"""
+        info = backup_info(path)
+        meta = {'kind': info['kind'], 'version': info['version']}
+        if info['kind'] == 'delta':
+            meta.update(from_version=info['from_version'], parent=info['parent'])
+        manifest = self.add_file(path, os.path.basename(path), created=os.path.getmtime(path), **meta)
+        os.remove(path)
+        return manifest
+
+    # --- 读取 ---
+
+    def manifests(self):
+        """全部索引，按创建时间从旧到新排列"""
+        try:
+            names = [f for f in os.listdir(self.snapshot_dir) if f.endswith(MANIFEST_SUFFIX)]
+        except OSError:
+            return []
+        result = [self._load(os.path.join(self.snapshot_dir, f)) for f in names]
+        return sorted(result, key=lambda m: m['created'])
+
+    def _load(self, path):
+        with open(path, 'rb') as f:
+            manifest = json.loads(f.read())
+        manifest['chunks'] = _unpack_chunks(manifest['chunks'])
+        return manifest
+
+    def get(self, name):
+        return self._load(self._manifest_path(name))
+
+    def _read_chunk(self, h):
+        with open(self._chunk_path(h), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def materialize(self, name, target, progress=None):
+        """把一份备份还原为文件 target (逐块校验哈希)"""
+        manifest = self.get(name)
+        total = len(manifest['chunks'])
+        tmp = target + '.part'
+        with open(tmp, 'wb') as f:
+            for i, h in enumerate(manifest['chunks']):
+                block = self._read_chunk(h)
+                if hashlib.sha256(block).digest() != h:
+                    raise ValueError(f"数据块 {h.hex()[:12]} 校验失败")
+                f.write(block)
+                if progress:
+                    progress(i + 1, total)
+        os.replace(tmp, target)
+        return manifest
+
+    def chain(self, name):
+        """从完整快照到 name 依次需要重放的索引列表"""
+        chain = [self.get(name)]
+        while chain[0]['kind'] == 'delta':
+            parent = chain[0]['parent']
+            if not os.path.exists(self._manifest_path(parent)):
+                raise FileNotFoundError(f"备份链不完整，缺少 {parent}")
+            chain.insert(0, self.get(parent))
+        return chain
+
+    def restore(self, name, target_path, progress=None):
+        """把 name 对应时刻的数据库恢复到 target_path (不能是正在使用的数据库)，返回恢复到的版本号"""
+        from data.schema_migrations import SchemaMigration
+        chain = self.chain(name)
+        self.materialize(chain[0]['name'], target_path, progress=progress)
+        version = chain[0]['version']
+        conn = sqlite3.connect(target_path)
+        try:
+            # 快照可能来自旧版本程序，先升级结构再重放增量
+            SchemaMigration.apply(conn)
+            for manifest in chain[1:]:
+                if manifest['from_version'] != version:
+                    raise ValueError(f"{manifest['name']} 基于 v{manifest['from_version']}，与前一份备份 v{version} 不连续")
+                fd, delta_path = tempfile.mkstemp(suffix=DELTA_SUFFIX, dir=os.path.dirname(os.path.abspath(target_path)))
+                os.close(fd)
+                try:
+                    self.materialize(manifest['name'], delta_path)
+                    apply_delta(conn, delta_path)
+                finally:
+                    os.remove(delta_path)
+                version = manifest['version']
+        finally:
+            conn.close()
+        return version
+
+    def checkout(self, name, progress=None):
+        """把 name 还原为 cache 下的数据库文件并返回路径；已还原过时直接复用"""
+        path = os.path.join(self.cache_dir, name if name.endswith('.db') else name + '.db')
+        with self.locked():
+            self._checkout(name, path, progress)
+        return path
+
+    def _checkout(self, name, path, progress):
+        if not os.path.exists(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = path + '.restore'
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            try:
+                self.restore(name, tmp, progress=progress)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    # --- 维护 ---
+
+    def gc(self, keep, grace_s=BACKUP_GC_GRACE_S):
+        """
+        只保留最近 keep 份完整快照及其之后的增量，删除其余索引与不再被引用的数据块
+        (最近 grace_s 秒内写入的数据块除外)。
+        返回 (最早保留的完整快照索引, 删除的索引数, 删除的数据块数)。
+        """
+        with self.locked():
+            return self._gc(keep, grace_s)
+
+    def _gc(self, keep, grace_s):
+        manifests = self.manifests()
+        fulls = [m for m in manifests if m['kind'] == 'full']
+        if not fulls:
+            return None, 0, 0
+        oldest = fulls[-keep] if len(fulls) > keep else fulls[0]
+        removed = [m for m in manifests if m['created'] < oldest['created']]
+        for m in removed:
+            os.remove(self._manifest_path(m['name']))
+
+        referenced = {h.hex() for m in manifests if m['created'] >= oldest['created'] for h in m['chunks']}
+        deleted, cutoff = 0, time.time() - grace_s
+        for sub in os.listdir(self.chunk_dir) if os.path.isdir(self.chunk_dir) else ():
+            sub_dir = os.path.join(self.chunk_dir, sub)
+            for f in os.listdir(sub_dir):
+                # 中断写入留下的 .part 临时文件一并清理
+                chunk_path = os.path.join(sub_dir, f)
+                if f not in referenced and os.path.getmtime(chunk_path) < cutoff:
+                    os.remove(chunk_path)
+                    deleted += 1
+        kept = {m['name'] for m in manifests if m['created'] >= oldest['created']}
+        for f in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else ():
+            if f[:-len('.db')] not in kept and f not in kept:
+                os.remove(os.path.join(self.cache_dir, f))
+        return oldest, len(removed), deleted
+
+    def verify(self, deep=False):
+        """
+        校验仓库，返回问题列表 (空列表表示完好)：
+        - 每个索引引用的数据块都存在、可以解压且哈希一致，增量的上一份备份存在
+        - deep=True 时还原每份完整快照并执行 PRAGMA integrity_check
+        """
+        problems, checked = [], {}
+        manifests = self.manifests()
+        names = {m['name'] for m in manifests}
+        for m in manifests:
+            if m['kind'] == 'delta' and m['parent'] not in names:
+                problems.append(f"{m['name']}: 缺少上一份备份 {m['parent']}")
+            for h in m['chunks']:
+                if h not in checked:
+                    try:
+                        checked[h] = hashlib.sha256(self._read_chunk(h)).digest() == h
+                    except (OSError, zlib.error):
+                        checked[h] = False
+                if not checked[h]:
+                    problems.append(f"{m['name']}: 数据块 {h.hex()[:12]} 缺失或损坏")
+            if deep and m['kind'] == 'full' and all(checked[h] for h in m['chunks']):
+                fd, path = tempfile.mkstemp(suffix='.db')
+                os.close(fd)
+                try:
+                    self.materialize(m['name'], path)
+                    conn = sqlite3.connect(path)
+                    try:
+                        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+                    finally:
+                        conn.close()
+                    if result != 'ok':
+                        problems.append(f"{m['name']}: {result}")
+                finally:
+                    os.remove(path)
+        return problems
+
+    def stats(self):
+        """返回 {'backups', 'logical_bytes', 'stored_bytes'}：全部备份的原始总大小与仓库实际占用"""
+        manifests = self.manifests()
+        stored = 0
+        for h in {h for m in manifests for h in m['chunks']}:
+            stored += os.path.getsize(self._chunk_path(h))
+        return {'backups': len(manifests), 'logical_bytes': sum(m['size'] for m in manifests), 'stored_bytes': stored}
+
+
+def main(argv=None):
+    from core.config import BACKUP_DIR
+    parser = argparse.ArgumentParser(description="备份仓库工具")
+    parser.add_argument('--repo', default=BACKUP_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="列出全部备份")
+    p = sub.add_parser('restore', help="把某份备份恢复为新的数据库文件")
+    p.add_argument('name')
+    p.add_argument('target')
+    p = sub.add_parser('verify', help="校验仓库完整性")
+    p.add_argument('--deep', action='store_true', help="同时还原完整快照并执行 integrity_check")
+    p = sub.add_parser('gc', help="只保留最近 N 份完整快照并清理数据块")
+    p.add_argument('keep', type=int)
+    args = parser.parse_args(argv)
+    repo = BackupRepository(args.repo)
+
+    if args.command == 'list':
+        for m in repo.manifests():
+            created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(m['created']))
+            print(f"{m['name']}\t{m['kind']}\tv{m['version']}\t{created}\t{m['size'] / 1048576:.1f} MB")
+        s = repo.stats()
+        print(f"{s['backups']} 份备份，原始大小 {s['logical_bytes'] / 1048576:.1f} MB，"
+              f"实际占用 {s['stored_bytes'] / 1048576:.1f} MB")
+    elif args.command == 'restore':
+        if os.path.exists(args.target):
+            parser.error(f"{args.target} 已存在")
+        version = repo.restore(args.name, args.target)
+        print(f"已恢复到 {args.target} (v{version})")
+    elif args.command == 'verify':
+        problems = repo.verify(deep=args.deep)
+        for p in problems:
+            print(p)
+        print("仓库完好" if not problems else f"发现 {len(problems)} 个问题")
+        return 1 if problems else 0
+    elif args.command == 'gc':
+        oldest, manifests, chunks = repo.gc(args.keep)
+        print(f"删除 {manifests} 份备份索引、{chunks} 个数据块")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
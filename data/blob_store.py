@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# data/blob_store.py
+"""
+内容寻址的二进制存储
+
+图片等大块二进制数据统一存放在 blobs 表中，以内容的 SHA-256 为主键；
+ideas 行只保存 blob_hash 引用。这样列表查询扫描 ideas 表时不会再把整张截图
+读进页缓存，相同内容的图片也只存一份。
+
+thumbnails 表按 (blob_hash, size_key) 缓存缩略图，列表渲染只读取几 KB 的小图。
+
+图片保存后会在后台重新编码为更小的格式 (services/image_storage.py)，blobs 行的主键仍是
+原始数据的哈希，去重与缩略图不受影响；blob_encodings 表记录编码方式与原始大小。
+该表单独存放，统计与查找待处理图片时不必读取 blobs 行 (大块数据在溢出页中)。
+"""
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+BLOB_MIGRATION_BATCH = 20
+
+
+def blob_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def ensure_blob_store(c):
+    """创建 blobs 表、ideas.blob_hash 列以及回收无引用数据的触发器"""
+    c.execute('''CREATE TABLE IF NOT EXISTS blobs (
+        content_hash TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        byte_size INTEGER NOT NULL
+    )''')
+
+    c.execute("PRAGMA table_info(ideas)")
+    cols = [i[1] for i in c.fetchall()]
+    if 'blob_hash' not in cols:
+        c.execute('ALTER TABLE ideas ADD COLUMN blob_hash TEXT')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_ideas_blob_hash ON ideas(blob_hash)')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS thumbnails (
+        blob_hash TEXT NOT NULL,
+        size_key TEXT NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (blob_hash, size_key)
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_blob_drop_thumbnails AFTER DELETE ON blobs BEGIN
+            DELETE FROM thumbnails WHERE blob_hash = old.content_hash;
+        END''')
+
+    # 最后一个引用消失时删除对应的数据
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_blob_release_delete AFTER DELETE ON ideas
+        WHEN old.blob_hash IS NOT NULL BEGIN
+            DELETE FROM blobs WHERE content_hash = old.blob_hash
+              AND NOT EXISTS (SELECT 1 FROM ideas WHERE blob_hash = old.blob_hash);
+        END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_blob_release_update AFTER UPDATE OF blob_hash ON ideas
+        WHEN old.blob_hash IS NOT NULL AND old.blob_hash IS NOT new.blob_hash BEGIN
+            DELETE FROM blobs WHERE content_hash = old.blob_hash
+              AND NOT EXISTS (SELECT 1 FROM ideas WHERE blob_hash = old.blob_hash);
+        END''')
+
+
+def ensure_blob_encodings(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS blob_encodings (
+        content_hash TEXT PRIMARY KEY,
+        encoding TEXT NOT NULL,
+        original_size INTEGER NOT NULL,
+        stored_size INTEGER NOT NULL
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_blob_drop_encoding AFTER DELETE ON blobs BEGIN
+            DELETE FROM blob_encodings WHERE content_hash = old.content_hash;
+        END''')
+
+
+def put_blob(c, data, known_hash=None):
+    """写入二进制数据 (已存在则复用)，返回其哈希；data 为空时返回 None。known_hash 为调用方已算好的 SHA-256"""
+    if not data:
+        return None
+    h = known_hash or blob_hash(data)
+    c.execute('INSERT OR IGNORE INTO blobs (content_hash, data, byte_size) VALUES (?,?,?)', (h, data, len(data)))
+    return h
+
+
+def get_blob(c, content_hash):
+    if not content_hash:
+        return None
+    c.execute('SELECT data FROM blobs WHERE content_hash=?', (content_hash,))
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+def migrate_inline_blobs(c, after_id, limit=BLOB_MIGRATION_BATCH):
+    """
+    把 id > after_id 的至多 limit 条仍内联在 ideas.data_blob 中的数据迁移到 blobs 表。
+    返回本批最后一个 id，没有剩余行时返回 None；可以重复执行 (已迁移的行 data_blob 为 NULL)。
+    作为 v12 的数据迁移由 SchemaMigration 分批执行 (进度保存在 schema_migration_state 中)。
+    """
+    c.execute('SELECT id, data_blob FROM ideas WHERE id > ? AND data_blob IS NOT NULL ORDER BY id LIMIT ?',
+              (after_id, limit))
+    rows = c.fetchall()
+    for iid, data in rows:
+        h = put_blob(c, data)
+        c.execute('UPDATE ideas SET blob_hash=?, data_blob=NULL WHERE id=?', (h, iid))
+    return rows[-1][0] if rows else None
+
+
+def put_thumbnails(c, content_hash, thumbs):
+    """thumbs: {size_key: bytes}；空 bytes 表示该图无法生成缩略图，避免反复重试"""
+    c.executemany(
+        'INSERT OR REPLACE INTO thumbnails (blob_hash, size_key, data) VALUES (?,?,?)',
+        [(content_hash, key, data or b'') for key, data in thumbs.items()]
+    )
+
+
+def get_thumbnails(c, idea_ids, size_key, chunk_size=500):
+    """批量读取缩略图，返回 {idea_id: bytes}；无法生成缩略图的为空 bytes，尚未生成的不包含在内"""
+    result = {}
+    for start in range(0, len(idea_ids), chunk_size):
+        chunk = idea_ids[start:start + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        c.execute(f'''
+            SELECT i.id, t.data FROM ideas i
+            JOIN thumbnails t ON t.blob_hash = i.blob_hash AND t.size_key = ?
+            WHERE i.id IN ({placeholders})
+        ''', (size_key, *chunk))
+        result.update((iid, data or b'') for iid, data in c.fetchall())
+    return result
+
+
+def blobs_pending_reencode(c, limit):
+    """返回尚未重新编码过的图片 blob 哈希"""
+    c.execute('''
+        SELECT DISTINCT i.blob_hash FROM ideas i
+        WHERE i.item_type = 'image' AND i.blob_hash IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM blob_encodings e WHERE e.content_hash = i.blob_hash)
+        LIMIT ?
+    ''', (limit,))
+    return [r[0] for r in c.fetchall()]
+
+
+def save_encoding(c, content_hash, data, encoding, original_size):
+    """
+    记录一张图片的重新编码结果；data 为 None 表示保留原数据。
+    数据在编码期间已被删除时不做任何事，返回 False。
+    """
+    if data is not None:
+        c.execute('UPDATE blobs SET data=?, byte_size=? WHERE content_hash=?', (data, len(data), content_hash))
+        if c.rowcount == 0:
+            return False
+    else:
+        c.execute('SELECT 1 FROM blobs WHERE content_hash=?', (content_hash,))
+        if c.fetchone() is None:
+            return False
+    stored_size = len(data) if data is not None else original_size
+    c.execute('INSERT OR REPLACE INTO blob_encodings (content_hash, encoding, original_size, stored_size) VALUES (?,?,?,?)',
+              (content_hash, encoding, original_size, stored_size))
+    return True
+
+
+def encoding_stats(c):
+    """返回 (已处理图片数, 原始总字节数, 当前总字节数)"""
+    c.execute('SELECT COUNT(*), COALESCE(SUM(original_size), 0), COALESCE(SUM(stored_size), 0) FROM blob_encodings')
+    return c.fetchone()
+
+
+def blobs_missing_thumbnail(c, size_key, limit):
+    """返回尚未生成指定尺寸缩略图的图片 blob 哈希 (回填任务使用)"""
+    c.execute('''
+        SELECT DISTINCT i.blob_hash FROM ideas i
+        WHERE i.item_type = 'image' AND i.blob_hash IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM thumbnails t WHERE t.blob_hash = i.blob_hash AND t.size_key = ?)
+        LIMIT ?
+    ''', (size_key, limit))
+    return [r[0] for r in c.fetchall()]
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# data/change_journal.py
+"""
+变更日志
+
+触发器把 ideas / idea_tags / tags / categories / blobs / blob_encodings 的每次增删改记录到
+change_journal (version, entity, entity_id, op)：
+- version 单调递增 (AUTOINCREMENT，删除旧记录后也不会复用)，当前版本号即 sqlite_sequence 中的值
+- entity 为表名，entity_id 为主键 (idea_tags 记录 idea_id，blobs 记录 content_hash)
+- op 为 'i' / 'u' / 'd'；时间戳触发器回写派生列 (created_ts / updated_ts) 的那次修改不记录，
+  其余每次修改都记录 (同一行的多条记录由 changes_since / changed_keys 合并)
+日志只记录"哪一行变了"，不保存行内容，增量备份时按当前数据读取变更行。
+界面按 changes_since() 返回的 ChangeSet 只刷新受影响的部分 (services/change_feed.py)。
+"""
+
+JOURNAL_TABLE = 'change_journal'
+
+# (表名, 日志中记录的键列)
+TRACKED = (
+    ('ideas', 'id'),
+    ('idea_tags', 'idea_id'),
+    ('tags', 'id'),
+    ('categories', 'id'),
+    ('blobs', 'content_hash'),
+    ('blob_encodings', 'content_hash'),
+)
+
+
+class JournalGap(Exception):
+    """变更日志已被清理到所需版本之后，缺少中间的记录"""
+
+
+class ChangeSet:
+    """
+    from_version 之后到 version 为止的变更。
+    rows = {entity: {entity_id: op}}，同一行只保留最终结果：区间内新插入的行为 'i' (之后的修改不改变)，
+    被删除的行为 'd'，其余为 'u'。
+    """
+    def __init__(self, from_version, version, rows):
+        self.from_version = from_version
+        self.version = version
+        self.rows = rows
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __repr__(self):
+        return f"ChangeSet(v{self.from_version} -> v{self.version}, {self.rows})"
+
+    def keys(self, entity, *ops):
+        """entity 中发生变更的键 (可按 op 过滤)"""
+        rows = self.rows.get(entity, {})
+        return {k for k, op in rows.items() if not ops or op in ops}
+
+    def touches(self, *entities):
+        return any(entity in self.rows for entity in entities)
+
+
+def _record(entity, key, op):
+    return f"INSERT INTO {JOURNAL_TABLE} (entity, entity_id, op) VALUES ('{entity}', {key}, '{op}');"
+
+
+# 只由时间戳触发器 (data/filter_indexes.py) 回写的派生列：回写时 created_at / updated_at 不变
+_DERIVED = {'ideas': ('created_ts', 'updated_ts')}
+
+
+def _update_condition(table, key):
+    """更新触发器的 WHEN：只跳过派生列的回写，主键变化时另记一条删除"""
+    derived = _DERIVED.get(table)
+    if not derived:
+        return None
+    unchanged = ' AND '.join(f'old.{col} IS new.{col}' for col in derived)
+    return (f'({unchanged}) OR old.created_at IS NOT new.created_at OR old.updated_at IS NOT new.updated_at '
+            f'OR old.{key} IS NOT new.{key}')
+
+
+def _update_trigger(table, key):
+    condition = _update_condition(table, key)
+    when = f'\n        WHEN {condition}' if condition else ''
+    return f'''
+        CREATE TRIGGER trg_journal_{table}_update AFTER UPDATE ON {table}{when} BEGIN
+            {_record(table, f'new.{key}', 'u')}
+            INSERT INTO {JOURNAL_TABLE} (entity, entity_id, op)
+                SELECT '{table}', old.{key}, 'd' WHERE old.{key} IS NOT new.{key};
+        END'''
+
+
+def _triggers():
+    triggers = {}
+    for table, key in TRACKED:
+        triggers[f'trg_journal_{table}_insert'] = f'''
+        CREATE TRIGGER trg_journal_{table}_insert AFTER INSERT ON {table} BEGIN
+            {_record(table, f'new.{key}', 'i')}
+        END'''
+        triggers[f'trg_journal_{table}_update'] = _update_trigger(table, key)
+        triggers[f'trg_journal_{table}_delete'] = f'''
+        CREATE TRIGGER trg_journal_{table}_delete AFTER DELETE ON {table} BEGIN
+            {_record(table, f'old.{key}', 'd')}
+        END'''
+    return triggers
+
+
+def ensure_change_journal(c):
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE} (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        entity_id NOT NULL,
+        op TEXT NOT NULL
+    )''')
+    for name, sql in _triggers().items():
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?", (name,))
+        if c.fetchone() is None:
+            c.execute(sql)
+
+
+def rebuild_update_triggers(c):
+    """
+    替换 v9 的更新触发器：旧版本在"该行已是日志中最新一条"时跳过记录，
+    之后的事务再修改同一行不会留下记录，增量备份与界面刷新都会漏掉这些修改
+    """
+    for table, key in TRACKED:
+        c.execute(f'DROP TRIGGER IF EXISTS trg_journal_{table}_update')
+        c.execute(_update_trigger(table, key))
+
+
+def journal_version(c):
+    """当前版本号 (还没有任何变更时为 0)"""
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (JOURNAL_TABLE,))
+    row = c.fetchone()
+    return row[0] if row else 0
+
+
+def oldest_version(c):
+    """日志中仍保留的最早版本号之前一个版本；从该版本之后的变更都可以查询"""
+    c.execute(f'SELECT MIN(version) FROM {JOURNAL_TABLE}')
+    first = c.fetchone()[0]
+    return journal_version(c) if first is None else first - 1
+
+
+def changed_keys(c, after_version, upto_version):
+    """返回 {entity: set(entity_id)}：(after_version, upto_version] 之间有过变更的行"""
+    c.execute(f'''SELECT DISTINCT entity, entity_id FROM {JOURNAL_TABLE}
+                  WHERE version > ? AND version <= ?''', (after_version, upto_version))
+    keys = {}
+    for entity, entity_id in c.fetchall():
+        keys.setdefault(entity, set()).add(entity_id)
+    return keys
+
+
+def changes_since(c, version):
+    """
+    返回 version 之后的 ChangeSet (没有变更时为空)。
+    日志已被清理到 version 之后时抛出 JournalGap，调用方应整体重新加载。
+    """
+    current = journal_version(c)
+    if current == version:
+        return ChangeSet(version, current, {})
+    if version > current or oldest_version(c) > version:
+        raise JournalGap(f"变更日志中没有 v{version} 之后的完整记录")
+    c.execute(f'''SELECT entity, entity_id, op FROM {JOURNAL_TABLE}
+                  WHERE version > ? AND version <= ? ORDER BY version''', (version, current))
+    rows, inserted = {}, set()
+    for entity, entity_id, op in c.fetchall():
+        seen = rows.setdefault(entity, {})
+        if entity_id not in seen:
+            seen[entity_id] = op
+            if op == 'i':
+                inserted.add((entity, entity_id))
+        elif op == 'd':
+            seen[entity_id] = 'd'
+        elif seen[entity_id] == 'd':
+            # 删除后又插入 (如整组替换标签)：区间开始时已存在的行按修改处理
+            seen[entity_id] = 'i' if (entity, entity_id) in inserted else 'u'
+    return ChangeSet(version, current, rows)
+
+
+def prune_journal(c, upto_version):
+    """删除 upto_version 及之前的记录"""
+    c.execute(f'DELETE FROM {JOURNAL_TABLE} WHERE version <= ?', (upto_version,))
+    return c.rowcount
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# data/connection_manager.py
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from core.config import (DB_NAME, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB,
+                         DB_MMAP_SIZE, DB_READ_POOL_SIZE, DB_PROGRESS_OPS)
+from data.tag_cache import TagCache
+from data.hash_filter import HashFilter
+from data.query_cancel import QueryCancelled, current_token, progress_handler
+
+logger = logging.getLogger(__name__)
+
+class ConnectionManager:
+    """
+    进程级数据库连接管理器：
+    - 一个写连接，所有写事务通过 transaction() 串行执行
+    - 一组只读连接组成的连接池，WAL 模式下读操作不会被写操作阻塞
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, db_path=DB_NAME, read_pool_size=DB_READ_POOL_SIZE):
+        self.db_path = db_path
+        self._read_pool_size = max(1, read_pool_size)
+        self._write_lock = threading.RLock()
+        self._tx_depth = 0
+        self._pool_lock = threading.Lock()
+        self._idle_readers = queue.Queue()
+        self._all_readers = []
+        self._schema_ready = False
+        self._closed = False
+        self._rollback_listeners = []
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+
+        # 标签名 -> id 缓存与写连接绑定，回滚时清空
+        self.tag_cache = TagCache()
+        self.add_rollback_listener(self.tag_cache.clear)
+        # 采集去重用的内容哈希过滤器 (回滚只会留下多余的哈希，不影响正确性)
+        self.hash_filter = HashFilter()
+
+        self._writer = self._open_writer()
+
+    @classmethod
+    def instance(cls):
+        """获取进程内唯一的连接管理器"""
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance._closed:
+                cls._instance = cls()
+            return cls._instance
+
+    # --- 连接创建 ---
+
+    def _apply_common_pragmas(self, conn):
+        conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+        conn.execute(f"PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+
+    def _open_writer(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._apply_common_pragmas(conn)
+        # 只对尚未建表的新数据库生效；旧数据库在 vacuum() 时切换
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if str(mode).lower() != 'wal':
+            logger.warning(f"无法切换到 WAL 模式，当前日志模式: {mode}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _open_reader(self):
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._apply_common_pragmas(conn)
+        conn.execute("PRAGMA query_only = 1")
+        # 后台查询被取消时由进度回调中止语句 (见 data/query_cancel.py)
+        conn.set_progress_handler(progress_handler, DB_PROGRESS_OPS)
+        return conn
+
+    def _acquire_reader(self):
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if len(self._all_readers) < self._read_pool_size:
+                conn = self._open_reader()
+                self._all_readers.append(conn)
+                return conn
+        return self._idle_readers.get()
+
+    # --- 对外接口 ---
+
+    @property
+    def writer(self):
+        """写连接 (仅供兼容旧代码直接访问，新代码请使用 transaction())"""
+        return self._writer
+
+    def add_rollback_listener(self, callback):
+        """注册写事务回滚后的回调 (用于清理依赖未提交数据的内存缓存)"""
+        self._rollback_listeners.append(callback)
+
+    @contextmanager
+    def transaction(self):
+        """
+        独占写连接执行事务：最外层正常退出时提交，异常时回滚。
+        支持嵌套调用，内层不会提前提交。
+        """
+        with self._write_lock:
+            self._tx_depth += 1
+            cursor = self._writer.cursor()
+            try:
+                yield cursor
+                if self._tx_depth == 1:
+                    self._writer.commit()
+            except Exception:
+                if self._tx_depth == 1:
+                    self._writer.rollback()
+                    for callback in self._rollback_listeners:
+                        callback()
+                raise
+            finally:
+                self._tx_depth -= 1
+
+    @contextmanager
+    def reader(self):
+        """
+        从连接池借出一个只读连接，用完自动归还。
+        当前线程处于 cancel_scope() 中时，连接登记到取消令牌上，查询被取消时抛出 QueryCancelled。
+        """
+        token = current_token()
+        conn = self._acquire_reader()
+        try:
+            if token is None:
+                yield conn
+                return
+            token.attach(conn)
+            try:
+                yield conn
+            except sqlite3.OperationalError:
+                if token.cancelled:
+                    raise QueryCancelled()
+                raise
+            finally:
+                token.detach(conn)
+        finally:
+            self._idle_readers.put(conn)
+
+    def data_version(self):
+        """
+        PRAGMA data_version：本进程的写连接或其他进程提交修改后变化。
+        该值只在同一个连接上前后可比较，因此使用一个专用的只读连接；只读取 WAL 索引头，适合频繁轮询。
+        """
+        with self._monitor_lock:
+            if self._monitor is None:
+                self._monitor = self._open_reader()
+            return self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def ensure_schema(self, initializer):
+        """保证表结构初始化在进程内只执行一次"""
+        with self._write_lock:
+            if self._schema_ready:
+                return
+            initializer(self._writer)
+            self._writer.commit()
+            self._schema_ready = True
+
+    def vacuum(self):
+        """
+        完整 VACUUM：重写整个数据库文件，同时把 auto_vacuum 切换为 INCREMENTAL。
+        执行期间占用写连接 (其他写操作等待)，耗时与文件大小成正比，只应由用户显式操作调用。
+        """
+        with self._write_lock:
+            if self._tx_depth:
+                raise RuntimeError("不能在写事务中执行 VACUUM")
+            self._writer.commit()
+            self._writer.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._writer.execute("VACUUM")
+
+    @contextmanager
+    def attached(self, path, alias):
+        """
+        在写连接上附加另一个数据库文件，期间独占写连接，退出时分离。
+        ATTACH / DETACH 不能在事务中执行，因此不能在 transaction() 内调用；需要写入时在其中再开启 transaction()。
+        """
+        with self._write_lock:
+            if self._tx_depth:
+                raise RuntimeError("不能在写事务中附加数据库")
+            self._writer.commit()
+            self._writer.execute("ATTACH DATABASE ? AS " + alias, (str(path),))
+            try:
+                yield
+            finally:
+                self._writer.execute(f"DETACH DATABASE {alias}")
+
+    def close(self):
+        """关闭所有连接，并执行 WAL 检查点把日志合并回主库"""
+        with self._write_lock:
+            if self._closed:
+                return
+            self._closed = True
+            with self._pool_lock:
+                for conn in self._all_readers:
+                    conn.close()
+                self._all_readers.clear()
+            with self._monitor_lock:
+                if self._monitor is not None:
+                    self._monitor.close()
+                    self._monitor = None
+            try:
+                self._writer.commit()
+                self._writer.execute("PRAGMA optimize")
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                logger.warning(f"关闭数据库时检查点失败: {e}")
+            finally:
+                self._writer.close()
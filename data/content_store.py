@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# data/content_store.py
+"""
+大段文本的透明压缩
+
+超过 CONTENT_COMPRESS_THRESHOLD 个字符的正文 (日志、JSON 等) 以 zlib 压缩后存入 ideas.content_z，
+并把 ideas.content_compressed 置为 1；ideas.content 只保留前 CONTENT_PREFIX_CHARS 个字符的纯文本前缀。
+
+- 列表查询、卡片预览与全文索引直接使用 content 中的前缀，不需要解压，也不再把整段日志读进页缓存
+- 需要完整正文时 (get_idea / 预览 / 编辑 / 粘贴 / 导出) 额外读取 content_z 并解压
+- content_hash 始终按完整正文计算，去重不受影响
+"""
+import logging
+import zlib
+from core.config import CONTENT_COMPRESS_THRESHOLD, CONTENT_PREFIX_CHARS, CONTENT_COMPRESS_LEVEL
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_content_store(c):
+    c.execute("PRAGMA table_info(ideas)")
+    cols = [i[1] for i in c.fetchall()]
+    if 'content_z' not in cols:
+        c.execute('ALTER TABLE ideas ADD COLUMN content_z BLOB')
+    if 'content_compressed' not in cols:
+        c.execute('ALTER TABLE ideas ADD COLUMN content_compressed INTEGER DEFAULT 0')
+
+
+def pack_content(text):
+    """返回写入 ideas 的 (content, content_z, content_compressed)；压缩收益不足时按原文保存"""
+    if not text or len(text) <= CONTENT_COMPRESS_THRESHOLD:
+        return text, None, 0
+    raw = text.encode('utf-8')
+    packed = zlib.compress(raw, CONTENT_COMPRESS_LEVEL)
+    if len(packed) > len(raw) * 0.9:
+        return text, None, 0
+    return text[:CONTENT_PREFIX_CHARS], packed, 1
+
+
+def unpack_content(content, content_z):
+    """content_z 非空时返回解压后的完整正文，否则原样返回 content"""
+    if content_z is None:
+        return content
+    try:
+        return zlib.decompress(content_z).decode('utf-8')
+    except (zlib.error, UnicodeDecodeError) as e:
+        logger.warning(f"正文解压失败，使用已保存的前缀: {e}")
+        return content
+
+
+def inflate_rows(rows, index=2):
+    """行末尾多选了一列 content_z 时，用完整正文替换第 index 列并去掉该列"""
+    result = []
+    for row in rows:
+        row = list(row)
+        content_z = row.pop()
+        row[index] = unpack_content(row[index], content_z)
+        result.append(tuple(row))
+    return result
+
+
+def compress_large_content(c, after_id, limit):
+    """把 id > after_id 的一批笔记中超过阈值的旧正文压缩存储，返回本批最后一个 id (无剩余行时返回 None)"""
+    c.execute('SELECT MAX(id) FROM (SELECT id FROM ideas WHERE id > ? ORDER BY id LIMIT ?)', (after_id, limit))
+    last = c.fetchone()[0]
+    if last is None:
+        return None
+    c.execute('''SELECT id, content FROM ideas
+                 WHERE id > ? AND id <= ? AND COALESCE(content_compressed, 0) = 0 AND length(content) > ?''',
+              (after_id, last, CONTENT_COMPRESS_THRESHOLD))
+    updates = []
+    for iid, text in c.fetchall():
+        stored, packed, flag = pack_content(text)
+        if flag:
+            updates.append((stored, packed, flag, iid))
+    c.executemany('UPDATE ideas SET content=?, content_z=?, content_compressed=? WHERE id=?', updates)
+    return last
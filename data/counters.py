@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# data/counters.py
+"""
+侧边栏计数器
+
+由触发器在 ideas / idea_tags / tags 变化时增量维护，读取计数只需查几行小表：
+- stat_counters:     all / clipboard / uncategorized / untagged / favorite / trash
+- category_counters: 每个分类下未删除的笔记数
+- day_counters:      按 date(updated_at, 'localtime') 统计未删除的笔记数
+
+"今日" 计数直接按当天日期取 day_counters 中的一行，跨天时无需任何重置操作。
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLIPBOARD_TAG = '剪贴板'
+STAT_NAMES = ('all', 'clipboard', 'uncategorized', 'untagged', 'favorite', 'trash')
+
+_CLIP_TAG_ID = f"(SELECT id FROM tags WHERE name = '{CLIPBOARD_TAG}')"
+
+
+def _active(r):
+    return f"(COALESCE({r}.is_deleted, 0) = 0)"
+
+
+def _stat_terms(r):
+    """某行 ideas 对各项统计的贡献 (0/1)"""
+    active = _active(r)
+    return {
+        'all': active,
+        'trash': f"({r}.is_deleted = 1)",
+        'uncategorized': f"({active} AND {r}.category_id IS NULL)",
+        'favorite': f"({active} AND {r}.is_favorite = 1)",
+        'clipboard': f"({active} AND EXISTS (SELECT 1 FROM idea_tags WHERE idea_id = {r}.id AND tag_id = {_CLIP_TAG_ID}))",
+        'untagged': f"({active} AND NOT EXISTS (SELECT 1 FROM idea_tags WHERE idea_id = {r}.id))",
+    }
+
+
+def _apply_row(r, sign):
+    """生成把一行 ideas 计入 (sign='+') 或移出 (sign='-') 统计的语句"""
+    cases = ' '.join(f"WHEN '{k}' THEN {v}" for k, v in _stat_terms(r).items())
+    day = f"date({r}.updated_at, 'localtime')"
+    active = _active(r)
+    return f'''
+            UPDATE stat_counters SET value = value {sign} (CASE name {cases} ELSE 0 END);
+            INSERT OR IGNORE INTO category_counters (category_id, value)
+                SELECT {r}.category_id, 0 WHERE {r}.category_id IS NOT NULL AND {active};
+            UPDATE category_counters SET value = value {sign} 1
+                WHERE category_id = {r}.category_id AND {active};
+            INSERT OR IGNORE INTO day_counters (day, value)
+                SELECT {day}, 0 WHERE {day} IS NOT NULL AND {active};
+            UPDATE day_counters SET value = value {sign} 1
+                WHERE day = {day} AND {active};'''
+
+
+def _link_change(r, sign, untagged=True):
+    """idea_tags 增删一行时，更新 clipboard / untagged 两项 (仅对仍存在且未删除的笔记)"""
+    alive = f"EXISTS (SELECT 1 FROM ideas WHERE id = {r}.idea_id AND COALESCE(is_deleted, 0) = 0)"
+    # 插入后标签数为 1 说明之前无标签；删除后标签数为 0 说明变为无标签
+    untagged_delta = (
+        f"-(SELECT COUNT(*) = 1 FROM idea_tags WHERE idea_id = {r}.idea_id)" if sign == '+'
+        else f"(SELECT COUNT(*) = 0 FROM idea_tags WHERE idea_id = {r}.idea_id)"
+    )
+    sql = f'''
+            UPDATE stat_counters SET value = value {sign} 1
+                WHERE name = 'clipboard' AND {r}.tag_id = {_CLIP_TAG_ID} AND {alive};'''
+    if untagged:
+        sql += f'''
+            UPDATE stat_counters SET value = value + {untagged_delta}
+                WHERE name = 'untagged' AND {alive};'''
+    return sql
+
+
+_RECOUNT_CLIPBOARD = f'''
+            UPDATE stat_counters SET value = (
+                SELECT COUNT(*) FROM ideas i WHERE COALESCE(i.is_deleted, 0) = 0
+                  AND EXISTS (SELECT 1 FROM idea_tags WHERE idea_id = i.id AND tag_id = {_CLIP_TAG_ID})
+            ) WHERE name = 'clipboard';'''
+
+_TRIGGERS = {
+    'trg_cnt_idea_insert': f'''
+        CREATE TRIGGER trg_cnt_idea_insert AFTER INSERT ON ideas BEGIN{_apply_row('new', '+')}
+        END''',
+    'trg_cnt_idea_delete': f'''
+        CREATE TRIGGER trg_cnt_idea_delete AFTER DELETE ON ideas BEGIN{_apply_row('old', '-')}
+        END''',
+    'trg_cnt_idea_update': f'''
+        CREATE TRIGGER trg_cnt_idea_update AFTER UPDATE OF is_deleted, category_id, is_favorite, updated_at ON ideas BEGIN{_apply_row('old', '-')}{_apply_row('new', '+')}
+        END''',
+    'trg_cnt_link_insert': f'''
+        CREATE TRIGGER trg_cnt_link_insert AFTER INSERT ON idea_tags BEGIN{_link_change('new', '+')}
+        END''',
+    'trg_cnt_link_delete': f'''
+        CREATE TRIGGER trg_cnt_link_delete AFTER DELETE ON idea_tags BEGIN{_link_change('old', '-')}
+        END''',
+    # 改标签 (合并标签) 不改变笔记的标签数量，只影响 clipboard
+    'trg_cnt_link_update': f'''
+        CREATE TRIGGER trg_cnt_link_update AFTER UPDATE OF tag_id ON idea_tags BEGIN{_link_change('old', '-', False)}{_link_change('new', '+', False)}
+        END''',
+    # 剪贴板标签本身被改名 / 删除 / 新建时，整体重算 (极少发生)
+    'trg_cnt_tag_rename': f'''
+        CREATE TRIGGER trg_cnt_tag_rename AFTER UPDATE OF name ON tags
+        WHEN old.name = '{CLIPBOARD_TAG}' OR new.name = '{CLIPBOARD_TAG}' BEGIN{_RECOUNT_CLIPBOARD}
+        END''',
+    'trg_cnt_tag_delete': f'''
+        CREATE TRIGGER trg_cnt_tag_delete AFTER DELETE ON tags
+        WHEN old.name = '{CLIPBOARD_TAG}' BEGIN{_RECOUNT_CLIPBOARD}
+        END''',
+    # 关联行可能先于标签写入 (按 id 导入数据、旧数据中遗留的关联)
+    'trg_cnt_tag_insert': f'''
+        CREATE TRIGGER trg_cnt_tag_insert AFTER INSERT ON tags
+        WHEN new.name = '{CLIPBOARD_TAG}' BEGIN{_RECOUNT_CLIPBOARD}
+        END''',
+}
+
+
+def ensure_counters(c):
+    """创建计数表与触发器；首次创建时根据现有数据初始化"""
+    c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='stat_counters'")
+    is_new = c.fetchone() is None
+
+    c.execute('CREATE TABLE IF NOT EXISTS stat_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)')
+    c.execute('CREATE TABLE IF NOT EXISTS category_counters (category_id INTEGER PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)')
+    c.execute('CREATE TABLE IF NOT EXISTS day_counters (day TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)')
+
+    for name, sql in _TRIGGERS.items():
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?", (name,))
+        if c.fetchone() is None:
+            c.execute(sql)
+
+    if is_new:
+        rebuild_counters(c)
+
+
+def add_tag_insert_trigger(c):
+    """v11：补上剪贴板标签新建时的重算触发器，并按现有数据重算一次 clipboard"""
+    ensure_counters(c)
+    c.execute(_RECOUNT_CLIPBOARD)
+
+
+def rebuild_counters(c):
+    """根据 ideas / idea_tags 全量重算所有计数"""
+    c.execute('DELETE FROM stat_counters')
+    c.execute('DELETE FROM category_counters')
+    c.execute('DELETE FROM day_counters')
+
+    terms = _stat_terms('i')
+    for name in STAT_NAMES:
+        c.execute(f"INSERT INTO stat_counters (name, value) SELECT '{name}', COUNT(*) FROM ideas i WHERE {terms[name]}")
+    c.execute('''INSERT INTO category_counters (category_id, value)
+                 SELECT category_id, COUNT(*) FROM ideas
+                 WHERE COALESCE(is_deleted, 0) = 0 AND category_id IS NOT NULL GROUP BY category_id''')
+    c.execute('''INSERT INTO day_counters (day, value)
+                 SELECT date(updated_at, 'localtime') AS d, COUNT(*) FROM ideas
+                 WHERE COALESCE(is_deleted, 0) = 0 AND d IS NOT NULL GROUP BY d''')
+    logger.info("侧边栏计数器已重建")
+
+
+def read_counters(c):
+    """返回 (stats, categories, today)"""
+    c.execute('SELECT name, value FROM stat_counters')
+    stats = {name: 0 for name in STAT_NAMES}
+    stats.update(c.fetchall())
+
+    c.execute('SELECT category_id, value FROM category_counters WHERE value > 0')
+    categories = dict(c.fetchall())
+
+    c.execute("SELECT value FROM day_counters WHERE day = date('now', 'localtime')")
+    row = c.fetchone()
+    return stats, categories, (row[0] if row else 0)
@@ -1,402 +1,501 @@
 # -*- coding: utf-8 -*-
 # data/db_manager.py
-import sqlite3
 import hashlib
 import os
 import random
-from core.config import DB_NAME, COLORS
+from contextlib import contextmanager
+from core.config import COLORS
+from data.connection_manager import ConnectionManager
+from data import blob_store, idea_bulk
+from data.blob_store import put_blob
+from data.content_store import pack_content, inflate_rows
+from data.counters import read_counters
+from data.change_journal import changes_since, journal_version
+from data import retention
+from data.backup_browser import restore_items
+from data.schema_migrations import SchemaMigration
+from data.idea_query import IDEA_FULL_COLUMNS, IdeaQuery, fetch_page, page_key
 
 class DatabaseManager:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_NAME)
-        self._init_schema()
-
-    def _init_schema(self):
-        c = self.conn.cursor()
-        
-        c.execute(f'''CREATE TABLE IF NOT EXISTS ideas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL, content TEXT, color TEXT DEFAULT '{COLORS['default_note']}',
-            is_pinned INTEGER DEFAULT 0, is_favorite INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            category_id INTEGER, is_deleted INTEGER DEFAULT 0
-        )''')
-        c.execute('CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL)')
-        c.execute('''CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            name TEXT NOT NULL, 
-            parent_id INTEGER, 
-            color TEXT DEFAULT "#808080",
-            sort_order INTEGER DEFAULT 0
-        )''')
-        c.execute('CREATE TABLE IF NOT EXISTS idea_tags (idea_id INTEGER, tag_id INTEGER, PRIMARY KEY (idea_id, tag_id))')
-        
-        c.execute("PRAGMA table_info(ideas)")
-        cols = [i[1] for i in c.fetchall()]
-        if 'category_id' not in cols:
-            try: c.execute('ALTER TABLE ideas ADD COLUMN category_id INTEGER')
-            except: pass
-        if 'is_deleted' not in cols:
-            try: c.execute('ALTER TABLE ideas ADD COLUMN is_deleted INTEGER DEFAULT 0')
-            except: pass
-        if 'item_type' not in cols:
-            try: c.execute("ALTER TABLE ideas ADD COLUMN item_type TEXT DEFAULT 'text'")
-            except: pass
-        if 'data_blob' not in cols:
-            try: c.execute('ALTER TABLE ideas ADD COLUMN data_blob BLOB')
-            except: pass
-        if 'content_hash' not in cols:
-            try:
-                c.execute('ALTER TABLE ideas ADD COLUMN content_hash TEXT')
-                c.execute('CREATE INDEX IF NOT EXISTS idx_content_hash ON ideas(content_hash)')
-            except: pass
-        
-        c.execute("PRAGMA table_info(categories)")
-        cat_cols = [i[1] for i in c.fetchall()]
-        if 'sort_order' not in cat_cols:
-            try: c.execute('ALTER TABLE categories ADD COLUMN sort_order INTEGER DEFAULT 0')
-            except: pass
-        if 'preset_tags' not in cat_cols:
-            try: c.execute('ALTER TABLE categories ADD COLUMN preset_tags TEXT')
-            except: pass
-            
-        self.conn.commit()
+    def __init__(self, connection_manager=None):
+        self._cm = connection_manager or ConnectionManager.instance()
+        self._cm.ensure_schema(self._init_schema)
+
+    @property
+    def conn(self):
+        """写连接 (兼容旧代码直接使用 conn.cursor() 的调用方)"""
+        return self._cm.writer
+
+    @contextmanager
+    def _write(self):
+        """写事务游标：正常结束自动提交，异常自动回滚"""
+        with self._cm.transaction() as c:
+            yield c
+
+    @contextmanager
+    def _read(self):
+        """从只读连接池取出游标"""
+        with self._cm.reader() as conn:
+            yield conn.cursor()
+
+    def close(self):
+        self._cm.close()
+
+    def _init_schema(self, conn):
+        # 版本已是最新时只读取一次 user_version
+        SchemaMigration.apply(conn)
 
     def add_idea(self, title, content, color=None, tags=[], category_id=None, item_type='text', data_blob=None):
         if color is None:
             color = COLORS['default_note']
-            
-        c = self.conn.cursor()
-        c.execute(
-            'INSERT INTO ideas (title, content, color, category_id, item_type, data_blob) VALUES (?,?,?,?,?,?)',
-            (title, content, color, category_id, item_type, data_blob)
-        )
-        iid = c.lastrowid
-        self._update_tags(iid, tags)
-        self.conn.commit()
+
+        stored, content_z, compressed = pack_content(content)
+        with self._write() as c:
+            c.execute(
+                'INSERT INTO ideas (title, content, content_z, content_compressed, color, category_id, item_type, blob_hash) VALUES (?,?,?,?,?,?,?,?)',
+                (title, stored, content_z, compressed, color, category_id, item_type, put_blob(c, data_blob))
+            )
+            iid = c.lastrowid
+            self._update_tags(c, iid, tags)
         return iid
 
     def update_idea(self, iid, title, content, color, tags, category_id=None, item_type='text', data_blob=None):
-        c = self.conn.cursor()
-        c.execute(
-            'UPDATE ideas SET title=?, content=?, color=?, category_id=?, item_type=?, data_blob=?, updated_at=CURRENT_TIMESTAMP WHERE id=?',
-            (title, content, color, category_id, item_type, data_blob, iid)
-        )
-        self._update_tags(iid, tags)
-        self.conn.commit()
+        stored, content_z, compressed = pack_content(content)
+        with self._write() as c:
+            c.execute(
+                'UPDATE ideas SET title=?, content=?, content_z=?, content_compressed=?, color=?, category_id=?, item_type=?, blob_hash=?, data_blob=NULL, updated_at=CURRENT_TIMESTAMP WHERE id=?',
+                (title, stored, content_z, compressed, color, category_id, item_type, put_blob(c, data_blob), iid)
+            )
+            self._update_tags(c, iid, tags)
 
-    def _update_tags(self, iid, tags):
-        c = self.conn.cursor()
+    def _update_tags(self, c, iid, tags):
+        """用给定标签替换笔记的全部标签"""
         c.execute('DELETE FROM idea_tags WHERE idea_id=?', (iid,))
         if not tags: return
-        for t in tags:
-            t = t.strip()
-            if t:
-                c.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (t,))
-                c.execute('SELECT id FROM tags WHERE name=?', (t,))
-                tid = c.fetchone()[0]
-                c.execute('INSERT INTO idea_tags VALUES (?,?)', (iid, tid))
-
-    def _append_tags(self, iid, tags):
-        c = self.conn.cursor()
-        for t in tags:
-            t = t.strip()
-            if t:
-                c.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (t,))
-                c.execute('SELECT id FROM tags WHERE name=?', (t,))
-                tid = c.fetchone()[0]
-                c.execute('INSERT OR IGNORE INTO idea_tags VALUES (?,?)', (iid, tid))
+        tag_ids = self._cm.tag_cache.resolve(c, tags)
+        c.executemany('INSERT OR IGNORE INTO idea_tags (idea_id, tag_id) VALUES (?,?)',
+                      [(iid, tid) for tid in tag_ids.values()])
+
+    def set_idea_tags(self, iid, tags):
+        with self._write() as c:
+            self._update_tags(c, iid, tags)
+
+    @staticmethod
+    def _ids_param(idea_ids):
+        """把 id 集合编码为 JSON 数组，配合 json_each(?) 在单条语句中处理任意数量的 id"""
+        return idea_bulk.ids_param(idea_ids)
+
+    def _link_tags(self, c, idea_ids, tags):
+        """集合方式给一组笔记追加标签 (见 data/idea_bulk.py)"""
+        idea_bulk.link_tags(c, self._cm.tag_cache, idea_ids, tags)
 
     def add_tags_to_multiple_ideas(self, idea_ids, tags_list):
         if not idea_ids or not tags_list: return
-        c = self.conn.cursor()
-        for tag_name in tags_list:
-            tag_name = tag_name.strip()
-            if not tag_name: continue
-            c.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag_name,))
-            c.execute('SELECT id FROM tags WHERE name=?', (tag_name,))
-            tid = c.fetchone()[0]
-            for iid in idea_ids:
-                c.execute('INSERT OR IGNORE INTO idea_tags (idea_id, tag_id) VALUES (?,?)', (iid, tid))
-        self.conn.commit()
+        with self._write() as c:
+            self._link_tags(c, idea_ids, tags_list)
 
     def remove_tag_from_multiple_ideas(self, idea_ids, tag_name):
         if not idea_ids or not tag_name: return
-        c = self.conn.cursor()
-        c.execute('SELECT id FROM tags WHERE name=?', (tag_name,))
-        res = c.fetchone()
-        if not res: return
-        tid = res[0]
-        placeholders = ','.join('?' * len(idea_ids))
-        sql = f'DELETE FROM idea_tags WHERE tag_id=? AND idea_id IN ({placeholders})'
-        c.execute(sql, (tid, *idea_ids))
-        self.conn.commit()
+        with self._write() as c:
+            tid = self._cm.tag_cache.lookup(c, tag_name)
+            if tid is None: return
+            c.execute('DELETE FROM idea_tags WHERE tag_id=? AND idea_id IN (SELECT value FROM json_each(?))',
+                      (tid, self._ids_param(idea_ids)))
 
     def get_union_tags(self, idea_ids):
         if not idea_ids: return []
-        c = self.conn.cursor()
         placeholders = ','.join('?' * len(idea_ids))
         sql = f'''
-            SELECT DISTINCT t.name 
-            FROM tags t 
-            JOIN idea_tags it ON t.id = it.tag_id 
+            SELECT DISTINCT t.name
+            FROM tags t
+            JOIN idea_tags it ON t.id = it.tag_id
             WHERE it.idea_id IN ({placeholders})
             ORDER BY t.name ASC
         '''
-        c.execute(sql, tuple(idea_ids))
-        return [r[0] for r in c.fetchall()]
+        with self._read() as c:
+            c.execute(sql, tuple(idea_ids))
+            return [r[0] for r in c.fetchall()]
 
     # 【核心修改】增加 is_new 返回值
-    def add_clipboard_item(self, item_type, content, data_blob=None, category_id=None):
-        c = self.conn.cursor()
-        hasher = hashlib.sha256()
-        if item_type == 'text' or item_type == 'file':
-            hasher.update(content.encode('utf-8'))
-        elif item_type == 'image' and data_blob:
-            hasher.update(data_blob)
-        content_hash = hasher.hexdigest()
-
-        c.execute("SELECT id FROM ideas WHERE content_hash = ?", (content_hash,))
-        existing_idea = c.fetchone()
+    def add_clipboard_item(self, item_type, content, data_blob=None, category_id=None, content_hash=None):
+        with self._write() as c:
+            return self._save_clipboard_item(c, item_type, content, data_blob, category_id, content_hash)
+
+    def add_clipboard_items(self, items):
+        """
+        批量保存剪贴板采集 (一个事务，一次提交)。
+        items: [(item_type, content, data_blob, category_id, extra_tags, content_hash)]，返回 [(idea_id, is_new)]；
+        extra_tags 只追加到新建的笔记上。同一批次中的重复内容按顺序去重。
+        """
+        results = []
+        with self._write() as c:
+            for item_type, content, data_blob, category_id, extra_tags, content_hash in items:
+                idea_id, is_new = self._save_clipboard_item(c, item_type, content, data_blob, category_id, content_hash)
+                if is_new and extra_tags:
+                    self._link_tags(c, [idea_id], extra_tags)
+                results.append((idea_id, is_new))
+        return results
+
+    def warm_hash_filter(self):
+        """预先加载内容哈希过滤器 (采集写入线程启动时调用)"""
+        with self._write() as c:
+            self._cm.hash_filter.warm(c)
+
+    def _save_clipboard_item(self, c, item_type, content, data_blob=None, category_id=None, content_hash=None):
+        """content_hash 由调用方 (services/hash_calculator.HashCalculator) 计算；未提供时按相同规则现算"""
+        if content_hash is None:
+            hasher = hashlib.sha256()
+            if item_type == 'text' or item_type == 'file':
+                hasher.update(content.encode('utf-8'))
+            elif item_type == 'image' and data_blob:
+                hasher.update(data_blob)
+            content_hash = hasher.hexdigest()
+
+        # 过滤器确定不存在时省去一次按哈希的查询
+        hashes = self._cm.hash_filter
+        existing_idea = None
+        if hashes.might_contain(c, content_hash):
+            c.execute("SELECT id FROM ideas WHERE content_hash = ?", (content_hash,))
+            existing_idea = c.fetchone()
 
         if existing_idea:
             idea_id = existing_idea[0]
             c.execute("UPDATE ideas SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (idea_id,))
-            self.conn.commit()
             # 返回 False 表示是旧数据
-            return idea_id, False 
+            return idea_id, False
+
+        if item_type == 'text':
+            title = content.strip().split('\n')[0][:50]
+        elif item_type == 'image':
+            title = "[图片]"
+        elif item_type == 'file':
+            title = f"[文件] {os.path.basename(content.split(';')[0])}"
         else:
-            if item_type == 'text':
-                title = content.strip().split('\n')[0][:50]
-            elif item_type == 'image':
-                title = "[图片]"
-            elif item_type == 'file':
-                title = f"[文件] {os.path.basename(content.split(';')[0])}"
-            else:
-                title = "未命名"
+            title = "未命名"
 
-            default_color = COLORS['default_note']
-            c.execute(
-                'INSERT INTO ideas (title, content, item_type, data_blob, category_id, content_hash, color) VALUES (?,?,?,?,?,?,?)',
-                (title, content, item_type, data_blob, category_id, content_hash, default_color)
-            )
-            idea_id = c.lastrowid
-            
-            self._update_tags(idea_id, ["剪贴板"])
-            self.conn.commit()
-            # 返回 True 表示是新数据
-            return idea_id, True
+        default_color = COLORS['default_note']
+        stored, content_z, compressed = pack_content(content)
+        c.execute(
+            'INSERT INTO ideas (title, content, content_z, content_compressed, item_type, blob_hash, category_id, content_hash, color) VALUES (?,?,?,?,?,?,?,?,?)',
+            (title, stored, content_z, compressed, item_type, put_blob(c, data_blob, content_hash if item_type == 'image' else None),
+             category_id, content_hash, default_color)
+        )
+        idea_id = c.lastrowid
+        hashes.add(content_hash)
+
+        self._update_tags(c, idea_id, ["剪贴板"])
+        # 返回 True 表示是新数据
+        return idea_id, True
 
     def toggle_field(self, iid, field):
-        c = self.conn.cursor()
-        c.execute(f'UPDATE ideas SET {field} = NOT {field} WHERE id=?', (iid,))
-        self.conn.commit()
+        self.toggle_field_many([iid], field)
 
     def set_deleted(self, iid, state):
-        c = self.conn.cursor()
-        c.execute('UPDATE ideas SET is_deleted=?, updated_at=CURRENT_TIMESTAMP WHERE id=?', (1 if state else 0, iid))
-        self.conn.commit()
+        self.set_deleted_many([iid], state)
 
     def set_favorite(self, iid, state):
-        c = self.conn.cursor()
-        c.execute('UPDATE ideas SET is_favorite=? WHERE id=?', (1 if state else 0, iid))
-        self.conn.commit()
+        self.set_favorite_many([iid], state)
 
     def move_category(self, iid, cat_id):
-        c = self.conn.cursor()
-        c.execute('UPDATE ideas SET category_id=? WHERE id=?', (cat_id, iid))
-        if cat_id is not None:
-            c.execute('SELECT color, preset_tags FROM categories WHERE id=?', (cat_id,))
-            result = c.fetchone()
-            if result:
-                cat_color = result[0]
-                preset_tags_str = result[1]
-                if cat_color:
-                    c.execute('UPDATE ideas SET color=? WHERE id=?', (cat_color, iid))
-                if preset_tags_str:
-                    tags_list = [t.strip() for t in preset_tags_str.split(',') if t.strip()]
-                    if tags_list:
-                        self._append_tags(iid, tags_list)
-        self.conn.commit()
+        self.move_category_many([iid], cat_id)
 
     def delete_permanent(self, iid):
-        c = self.conn.cursor()
-        c.execute('DELETE FROM ideas WHERE id=?', (iid,))
-        self.conn.commit()
+        self.delete_permanent_many([iid])
+
+    # --- 批量操作：每种操作一条集合语句，整体一个事务 (见 data/idea_bulk.py) ---
+
+    def toggle_field_many(self, idea_ids, field):
+        if field not in idea_bulk.TOGGLE_FIELDS:
+            raise ValueError(f"不支持切换的字段: {field}")
+        if not idea_ids: return
+        with self._write() as c:
+            idea_bulk.toggle_field_many(c, idea_ids, field)
+
+    def set_deleted_many(self, idea_ids, state):
+        if not idea_ids: return
+        with self._write() as c:
+            idea_bulk.set_deleted_many(c, idea_ids, state)
+
+    def set_favorite_many(self, idea_ids, state):
+        if not idea_ids: return
+        with self._write() as c:
+            idea_bulk.set_favorite_many(c, idea_ids, state)
+
+    def move_category_many(self, idea_ids, cat_id):
+        """移动到分类，并套用分类颜色与预设标签"""
+        if not idea_ids: return
+        with self._write() as c:
+            idea_bulk.move_category_many(c, self._cm.tag_cache, idea_ids, cat_id)
+
+    def delete_permanent_many(self, idea_ids):
+        if not idea_ids: return
+        with self._write() as c:
+            idea_bulk.delete_permanent_many(c, idea_ids)
 
     def get_idea(self, iid, include_blob=False):
-        c = self.conn.cursor()
-        if include_blob:
-            c.execute('SELECT * FROM ideas WHERE id=?', (iid,))
-        else:
-            c.execute('SELECT id, title, content, color, is_pinned, is_favorite, created_at, updated_at, category_id, item_type FROM ideas WHERE id=?', (iid,))
-        return c.fetchone()
-
-    def get_ideas(self, search, f_type, f_val, page=None, page_size=20, tag_filter=None):
-        c = self.conn.cursor()
-        q = "SELECT DISTINCT i.* FROM ideas i LEFT JOIN idea_tags it ON i.id=it.idea_id LEFT JOIN tags t ON it.tag_id=t.id WHERE 1=1"
-        p = []
-        
-        if f_type == 'trash': q += ' AND i.is_deleted=1'
-        else: q += ' AND (i.is_deleted=0 OR i.is_deleted IS NULL)'
-        
-        if f_type == 'category':
-            if f_val is None: q += ' AND i.category_id IS NULL'
-            else: q += ' AND i.category_id=?'; p.append(f_val)
-        elif f_type == 'today': q += " AND date(i.updated_at,'localtime')=date('now','localtime')"
-        elif f_type == 'clipboard': q += " AND i.id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = '剪贴板'))"
-        elif f_type == 'untagged': q += ' AND i.id NOT IN (SELECT idea_id FROM idea_tags)'
-        elif f_type == 'favorite': q += ' AND i.is_favorite=1'
-        
-        if tag_filter:
-            q += " AND i.id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?))"
-            p.append(tag_filter)
-        
-        if search:
-            q += ' AND (i.title LIKE ? OR i.content LIKE ? OR t.name LIKE ?)'
-            p.extend([f'%{search}%']*3)
-            
-        if f_type == 'trash':
-            q += ' ORDER BY i.updated_at DESC'
-        else:
-            q += ' ORDER BY i.is_pinned DESC, i.updated_at DESC'
-            
+        """读取单条笔记，content 为完整正文 (压缩存储的会被解压)"""
+        with self._read() as c:
+            if include_blob:
+                c.execute(f'SELECT {IDEA_FULL_COLUMNS}, i.content_z FROM ideas i LEFT JOIN blobs b ON b.content_hash = i.blob_hash WHERE i.id=?', (iid,))
+            else:
+                c.execute('SELECT id, title, content, color, is_pinned, is_favorite, created_at, updated_at, category_id, item_type, content_z FROM ideas WHERE id=?', (iid,))
+            rows = inflate_rows(c.fetchall())
+            return rows[0] if rows else None
+
+    @staticmethod
+    def page_key(row):
+        """从 ideas 行中取出分页游标 (is_pinned, updated_at, id)"""
+        return page_key(row)
+
+    def get_ideas(self, search, f_type, f_val, page=None, page_size=20, tag_filter=None, full_content=False):
+        """full_content=True 时返回完整正文 (导出使用)，否则大段正文只有前缀"""
+        query = IdeaQuery(search, f_type, f_val, tag_filter)
+        kw = {}
         if page is not None and page_size is not None:
-            limit = page_size
-            offset = (page - 1) * page_size
-            q += ' LIMIT ? OFFSET ?'
-            p.extend([limit, offset])
-            
-        c.execute(q, p)
-        return c.fetchall()
+            kw = {'limit': page_size, 'offset': (page - 1) * page_size}
+        with self._read() as c:
+            return fetch_page(c, query, full_content=full_content, **kw)
+
+    def get_ideas_page(self, search, f_type, f_val, page_size=20, after=None, before=None, tag_filter=None, offset=0, from_end=False, with_total=False):
+        """
+        键集分页 (seek)：按 (is_pinned, updated_at, id) 定位，代价与页码深度无关。
+        - after:    上一页最后一行的 page_key，取其后的一页
+        - before:   下一页第一行的 page_key，取其前的一页 (返回结果仍为正序)
+        - from_end: 从列表末尾倒着取 (用于"最后一页")
+        - 都不传时取第一页；offset 仅用于从某个位置再跳过若干行 (跳页)
+        - with_total: 同一次查询带回筛选结果总数，返回 (rows, total)
+        """
+        query = IdeaQuery(search, f_type, f_val, tag_filter)
+        with self._read() as c:
+            return fetch_page(c, query, with_total=with_total, after=after, before=before,
+                              from_end=from_end, limit=page_size, offset=offset)
 
     def get_ideas_count(self, search, f_type, f_val, tag_filter=None):
-        c = self.conn.cursor()
-        q = "SELECT COUNT(DISTINCT i.id) FROM ideas i LEFT JOIN idea_tags it ON i.id=it.idea_id LEFT JOIN tags t ON it.tag_id=t.id WHERE 1=1"
-        p = []
-        
-        if f_type == 'trash': q += ' AND i.is_deleted=1'
-        else: q += ' AND (i.is_deleted=0 OR i.is_deleted IS NULL)'
-        
-        if f_type == 'category':
-            if f_val is None: q += ' AND i.category_id IS NULL'
-            else: q += ' AND i.category_id=?'; p.append(f_val)
-        elif f_type == 'today': q += " AND date(i.updated_at,'localtime')=date('now','localtime')"
-        elif f_type == 'clipboard': q += " AND i.id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = '剪贴板'))"
-        elif f_type == 'untagged': q += ' AND i.id NOT IN (SELECT idea_id FROM idea_tags)'
-        elif f_type == 'favorite': q += ' AND i.is_favorite=1'
-        
-        if tag_filter:
-            q += " AND i.id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?))"
-            p.append(tag_filter)
-            
-        if search:
-            q += ' AND (i.title LIKE ? OR i.content LIKE ? OR t.name LIKE ?)'
-            p.extend([f'%{search}%']*3)
-            
-        c.execute(q, p)
-        return c.fetchone()[0]
+        with self._read() as c:
+            c.execute(*IdeaQuery(search, f_type, f_val, tag_filter).count())
+            return c.fetchone()[0]
+
+    def save_thumbnails(self, content_hash, thumbs):
+        with self._write() as c:
+            blob_store.put_thumbnails(c, content_hash, thumbs)
+
+    def get_thumbnails(self, idea_ids, size_key):
+        """批量读取一组笔记的缩略图 {idea_id: bytes}"""
+        with self._read() as c:
+            return blob_store.get_thumbnails(c, list(idea_ids), size_key)
+
+    def get_blobs_missing_thumbnail(self, size_key, limit=20):
+        with self._read() as c:
+            return blob_store.blobs_missing_thumbnail(c, size_key, limit)
+
+    def get_blob(self, content_hash):
+        with self._read() as c:
+            return blob_store.get_blob(c, content_hash)
+
+    def get_blobs_pending_reencode(self, limit=20):
+        with self._read() as c:
+            return blob_store.blobs_pending_reencode(c, limit)
+
+    def save_reencoded_blob(self, content_hash, data, encoding, original_size):
+        """保存重新编码后的图片 (data 为 None 表示保留原数据)，主键仍为原始数据的哈希"""
+        with self._write() as c:
+            return blob_store.save_encoding(c, content_hash, data, encoding, original_size)
+
+    def get_image_storage_stats(self):
+        """返回 {'count', 'original_bytes', 'stored_bytes', 'saved_bytes'}"""
+        with self._read() as c:
+            count, original, stored = blob_store.encoding_stats(c)
+        return {'count': count, 'original_bytes': original, 'stored_bytes': stored, 'saved_bytes': original - stored}
+
+    def get_clipboard_byte_cutoff(self, policy):
+        """保留策略 max_bytes 的删除分界 (见 retention.byte_cutoff)，每轮清理计算一次"""
+        with self._read() as c:
+            return retention.byte_cutoff(c, policy)
+
+    def purge_clipboard_history(self, policy, batch_size=100, byte_cutoff=None):
+        """按保留策略删除一批剪贴板条目 (一个短写事务)，返回删除条数，0 表示已满足策略"""
+        with self._write() as c:
+            ids = retention.purge_step(c, policy, batch_size, byte_cutoff)
+            if ids:
+                param = self._ids_param(ids)
+                c.execute('DELETE FROM ideas WHERE id IN (SELECT value FROM json_each(?))', (param,))
+                c.execute('DELETE FROM idea_tags WHERE idea_id IN (SELECT value FROM json_each(?))', (param,))
+            return len(ids)
+
+    def get_space_stats(self):
+        """返回 {'auto_vacuum', 'page_count', 'free_pages'}"""
+        # 只读连接打开时缓存了 auto_vacuum 模式，VACUUM 切换后读不到新值，因此在写连接上查询
+        with self._write() as c:
+            mode, pages, free = retention.space_stats(c)
+        return {'auto_vacuum': mode, 'page_count': pages, 'free_pages': free}
+
+    def reclaim_space(self, max_pages=256):
+        """增量回收至多 max_pages 个空闲页，返回回收的页数"""
+        with self._write() as c:
+            return retention.incremental_vacuum(c, max_pages)
+
+    def vacuum(self):
+        self._cm.vacuum()
+
+    def restore_from_backup(self, backup_path, idea_ids):
+        """从备份文件中把一组笔记 (连同标签、分类与图片) 恢复到当前数据库，在一个事务内完成，返回恢复的条数"""
+        with self._cm.attached(backup_path, 'bk'):
+            with self._write() as c:
+                restored = restore_items(c, idea_ids)
+        for _, h in restored:
+            if h:
+                self._cm.hash_filter.add(h)
+        return len(restored)
+
+    def current_version(self):
+        """变更日志的当前版本号，每次数据修改后递增"""
+        with self._read() as c:
+            return journal_version(c)
+
+    def changes_since(self, version):
+        """version 之后的变更 (ChangeSet)；日志已清理到 version 之后时抛出 JournalGap"""
+        with self._read() as c:
+            return changes_since(c, version)
+
+    def data_version(self):
+        """数据有新提交 (本进程或其他进程) 时变化，用于廉价地判断是否需要查询变更"""
+        return self._cm.data_version()
 
     def get_tags(self, iid):
-        c = self.conn.cursor()
-        c.execute('SELECT t.name FROM tags t JOIN idea_tags it ON t.id=it.tag_id WHERE it.idea_id=?', (iid,))
-        return [r[0] for r in c.fetchall()]
+        with self._read() as c:
+            c.execute('SELECT t.name FROM tags t JOIN idea_tags it ON t.id=it.tag_id WHERE it.idea_id=?', (iid,))
+            return [r[0] for r in c.fetchall()]
+
+    def get_tags_for_ideas(self, idea_ids):
+        """一次查询取回一组笔记的标签，返回 {idea_id: [tag, ...]} (无标签的 id 不在结果中)"""
+        if not idea_ids: return {}
+        result = {}
+        with self._read() as c:
+            c.execute('''SELECT it.idea_id, t.name FROM idea_tags it JOIN tags t ON t.id = it.tag_id
+                         WHERE it.idea_id IN (SELECT value FROM json_each(?))
+                         ORDER BY it.idea_id, t.id''', (self._ids_param(idea_ids),))
+            for iid, name in c.fetchall():
+                result.setdefault(iid, []).append(name)
+        return result
 
     def get_all_tags(self):
-        c = self.conn.cursor()
-        c.execute('SELECT name FROM tags ORDER BY name')
-        return [r[0] for r in c.fetchall()]
+        with self._read() as c:
+            c.execute('SELECT name FROM tags ORDER BY name')
+            return [r[0] for r in c.fetchall()]
 
     def get_categories(self):
-        c = self.conn.cursor()
-        c.execute('SELECT * FROM categories ORDER BY sort_order ASC, name ASC')
-        return c.fetchall()
+        with self._read() as c:
+            c.execute('SELECT * FROM categories ORDER BY sort_order ASC, name ASC')
+            return c.fetchall()
 
     def add_category(self, name, parent_id=None):
-        c = self.conn.cursor()
-        if parent_id is None:
-            c.execute("SELECT MAX(sort_order) FROM categories WHERE parent_id IS NULL")
-        else:
-            c.execute("SELECT MAX(sort_order) FROM categories WHERE parent_id = ?", (parent_id,))
-        max_order = c.fetchone()[0]
-        new_order = (max_order or 0) + 1
-        
         palette = [
             '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEEAD',
             '#D4A5A5', '#9B59B6', '#3498DB', '#E67E22', '#2ECC71',
             '#E74C3C', '#F1C40F', '#1ABC9C', '#34495E', '#95A5A6'
         ]
         chosen_color = random.choice(palette)
-        
-        c.execute(
-            'INSERT INTO categories (name, parent_id, sort_order, color) VALUES (?, ?, ?, ?)', 
-            (name, parent_id, new_order, chosen_color)
-        )
-        self.conn.commit()
+
+        with self._write() as c:
+            if parent_id is None:
+                c.execute("SELECT MAX(sort_order) FROM categories WHERE parent_id IS NULL")
+            else:
+                c.execute("SELECT MAX(sort_order) FROM categories WHERE parent_id = ?", (parent_id,))
+            max_order = c.fetchone()[0]
+            new_order = (max_order or 0) + 1
+
+            c.execute(
+                'INSERT INTO categories (name, parent_id, sort_order, color) VALUES (?, ?, ?, ?)',
+                (name, parent_id, new_order, chosen_color)
+            )
 
     def rename_category(self, cat_id, new_name):
-        c = self.conn.cursor()
-        c.execute('UPDATE categories SET name=? WHERE id=?', (new_name, cat_id))
-        self.conn.commit()
-    
+        with self._write() as c:
+            c.execute('UPDATE categories SET name=? WHERE id=?', (new_name, cat_id))
+
     def set_category_color(self, cat_id, color):
-        c = self.conn.cursor()
-        c.execute('UPDATE categories SET color=? WHERE id=?', (color, cat_id))
-        self.conn.commit()
+        with self._write() as c:
+            c.execute('UPDATE categories SET color=? WHERE id=?', (color, cat_id))
 
     def set_category_preset_tags(self, cat_id, tags_str):
-        c = self.conn.cursor()
-        c.execute('UPDATE categories SET preset_tags=? WHERE id=?', (tags_str, cat_id))
-        self.conn.commit()
+        with self._write() as c:
+            c.execute('UPDATE categories SET preset_tags=? WHERE id=?', (tags_str, cat_id))
 
     def get_category_preset_tags(self, cat_id):
-        c = self.conn.cursor()
-        c.execute('SELECT preset_tags FROM categories WHERE id=?', (cat_id,))
-        res = c.fetchone()
-        return res[0] if res else ""
+        with self._read() as c:
+            c.execute('SELECT preset_tags FROM categories WHERE id=?', (cat_id,))
+            res = c.fetchone()
+            return res[0] if res else ""
 
     def apply_preset_tags_to_category_items(self, cat_id, tags_list):
         if not tags_list: return
-        c = self.conn.cursor()
-        c.execute('SELECT id FROM ideas WHERE category_id=? AND is_deleted=0', (cat_id,))
-        items = c.fetchall()
-        for (iid,) in items:
-            self._append_tags(iid, tags_list)
-        self.conn.commit()
+        with self._write() as c:
+            c.execute('SELECT id FROM ideas WHERE category_id=? AND is_deleted=0', (cat_id,))
+            self._link_tags(c, [r[0] for r in c.fetchall()], tags_list)
+
+    def get_child_category_ids(self, cid):
+        with self._read() as c:
+            c.execute('SELECT id FROM categories WHERE parent_id=?', (cid,))
+            return [r[0] for r in c.fetchall()]
 
     def delete_category(self, cid):
-        c = self.conn.cursor()
-        c.execute('UPDATE ideas SET category_id=NULL WHERE category_id=?', (cid,))
-        c.execute('DELETE FROM categories WHERE id=?', (cid,))
-        self.conn.commit()
+        with self._write() as c:
+            c.execute('UPDATE ideas SET category_id=NULL WHERE category_id=?', (cid,))
+            c.execute('DELETE FROM categories WHERE id=?', (cid,))
 
     def get_counts(self):
-        c = self.conn.cursor()
-        d = {}
-        queries = {
-            'all': "is_deleted=0 OR is_deleted IS NULL",
-            'today': "(is_deleted=0 OR is_deleted IS NULL) AND date(updated_at,'localtime')=date('now','localtime')",
-            'clipboard': "(is_deleted=0 OR is_deleted IS NULL) AND id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = '剪贴板'))",
-            'uncategorized': "(is_deleted=0 OR is_deleted IS NULL) AND category_id IS NULL",
-            'untagged': "(is_deleted=0 OR is_deleted IS NULL) AND id NOT IN (SELECT idea_id FROM idea_tags)",
-            'favorite': "(is_deleted=0 OR is_deleted IS NULL) AND is_favorite=1",
-            'trash': "is_deleted=1"
-        }
-        for k, v in queries.items():
-            c.execute(f"SELECT COUNT(*) FROM ideas WHERE {v}")
-            d[k] = c.fetchone()[0]
-            
-        c.execute("SELECT category_id, COUNT(*) FROM ideas WHERE (is_deleted=0 OR is_deleted IS NULL) GROUP BY category_id")
-        d['categories'] = dict(c.fetchall())
+        """侧边栏计数，直接读取触发器维护的计数表"""
+        with self._read() as c:
+            stats, categories, today = read_counters(c)
+        d = dict(stats)
+        d['today'] = today
+        d['categories'] = dict(categories)
+        if stats['uncategorized']:
+            d['categories'][None] = stats['uncategorized']
         return d
 
+    def add_tag(self, name):
+        """创建标签 (已存在时不变)"""
+        with self._write() as c:
+            self._cm.tag_cache.resolve(c, [name])
+
+    def get_tags_by_last_used(self):
+        """标签选择器：全部标签 (含未使用的)，按最近使用时间排序，返回 [(name, count, last_used)]"""
+        with self._read() as c:
+            c.execute('''
+                SELECT t.name, COUNT(it.idea_id) as cnt, MAX(i.updated_at) as last_used
+                FROM tags t
+                LEFT JOIN idea_tags it ON t.id = it.tag_id
+                LEFT JOIN ideas i ON it.idea_id = i.id AND i.is_deleted = 0
+                GROUP BY t.id
+                ORDER BY last_used DESC, cnt DESC, t.name ASC
+            ''')
+            return c.fetchall()
+
+    def get_recent_tags(self, search_term=''):
+        """主界面标签面板：未删除笔记上的标签，按最近使用时间排序，返回 [(name, count, last_used)]"""
+        sql = '''
+            SELECT t.name, COUNT(it.idea_id) as cnt, MAX(i.updated_at) as last_used
+            FROM tags t
+            JOIN idea_tags it ON t.id = it.tag_id
+            JOIN ideas i ON it.idea_id = i.id
+            WHERE i.is_deleted = 0
+        '''
+        params = []
+        if search_term:
+            sql += " AND t.name LIKE ?"
+            params.append(f"%{search_term}%")
+        sql += ' GROUP BY t.id ORDER BY last_used DESC, cnt DESC, t.name ASC'
+        with self._read() as c:
+            c.execute(sql, params)
+            return c.fetchall()
+
     def get_top_tags(self):
-        c = self.conn.cursor()
-        c.execute('''SELECT t.name, COUNT(it.idea_id) as c FROM tags t 
-                     JOIN idea_tags it ON t.id=it.tag_id JOIN ideas i ON it.idea_id=i.id 
-                     WHERE i.is_deleted=0 GROUP BY t.id ORDER BY c DESC LIMIT 5''')
-        return c.fetchall()
+        with self._read() as c:
+            c.execute('''SELECT t.name, COUNT(it.idea_id) as c FROM tags t
+                         JOIN idea_tags it ON t.id=it.tag_id JOIN ideas i ON it.idea_id=i.id
+                         WHERE i.is_deleted=0 GROUP BY t.id ORDER BY c DESC LIMIT 5''')
+            return c.fetchall()
 
     def get_partitions_tree(self):
         class Partition:
@@ -408,88 +507,69 @@ class DatabaseManager:
                 self.sort_order = sort_order
                 self.children = []
 
-        c = self.conn.cursor()
-        c.execute("SELECT id, name, color, parent_id, sort_order FROM categories ORDER BY sort_order ASC, name ASC")
-        
-        nodes = {row[0]: Partition(*row) for row in c.fetchall()}
-        
+        with self._read() as c:
+            c.execute("SELECT id, name, color, parent_id, sort_order FROM categories ORDER BY sort_order ASC, name ASC")
+            nodes = {row[0]: Partition(*row) for row in c.fetchall()}
+
         tree = []
         for node_id, node in nodes.items():
             if node.parent_id in nodes:
                 nodes[node.parent_id].children.append(node)
             else:
                 tree.append(node)
-                
+
         return tree
 
     def get_partition_item_counts(self):
-        c = self.conn.cursor()
-        counts = {'partitions': {}}
-
-        c.execute("SELECT COUNT(*) FROM ideas WHERE is_deleted=0")
-        counts['total'] = c.fetchone()[0]
-
-        c.execute("SELECT COUNT(*) FROM ideas WHERE is_deleted=0 AND date(updated_at, 'localtime') = date('now', 'localtime')")
-        counts['today_modified'] = c.fetchone()[0]
-        
-        c.execute("SELECT category_id, COUNT(*) FROM ideas WHERE is_deleted=0 GROUP BY category_id")
-        for cat_id, count in c.fetchall():
-            if cat_id is not None:
-                counts['partitions'][cat_id] = count
-
-        # Add missing counts
-        c.execute("SELECT COUNT(*) FROM ideas i JOIN idea_tags it ON i.id = it.idea_id JOIN tags t ON it.tag_id = t.id WHERE t.name = '剪贴板' AND i.is_deleted=0")
-        counts['clipboard'] = c.fetchone()[0]
-
-        c.execute("SELECT COUNT(*) FROM ideas WHERE is_favorite=1 AND is_deleted=0")
-        counts['favorite'] = c.fetchone()[0]
+        with self._read() as c:
+            stats, categories, today = read_counters(c)
+        return {
+            'total': stats['all'],
+            'today_modified': today,
+            'partitions': categories,
+            'clipboard': stats['clipboard'],
+            'favorite': stats['favorite'],
+        }
 
-        return counts
-    
     def save_category_order(self, update_list):
-        c = self.conn.cursor()
         try:
-            c.execute("BEGIN TRANSACTION")
-            for item in update_list:
-                c.execute(
-                    "UPDATE categories SET sort_order = ?, parent_id = ? WHERE id = ?",
-                    (item['sort_order'], item['parent_id'], item['id'])
-                )
-            c.execute("COMMIT")
+            with self._write() as c:
+                for item in update_list:
+                    c.execute(
+                        "UPDATE categories SET sort_order = ?, parent_id = ? WHERE id = ?",
+                        (item['sort_order'], item['parent_id'], item['id'])
+                    )
         except Exception as e:
-            c.execute("ROLLBACK")
             pass
-        finally:
-            self.conn.commit()
 
     def rename_tag(self, old_name, new_name):
         new_name = new_name.strip()
         if not new_name or old_name == new_name: return
-        c = self.conn.cursor()
-        c.execute("SELECT id FROM tags WHERE name=?", (old_name,))
-        old_res = c.fetchone()
-        if not old_res: return
-        old_id = old_res[0]
-        c.execute("SELECT id FROM tags WHERE name=?", (new_name,))
-        new_res = c.fetchone()
         try:
-            if new_res:
-                new_id = new_res[0]
-                c.execute("UPDATE OR IGNORE idea_tags SET tag_id=? WHERE tag_id=?", (new_id, old_id))
-                c.execute("DELETE FROM idea_tags WHERE tag_id=?", (old_id,))
-                c.execute("DELETE FROM tags WHERE id=?", (old_id,))
-            else:
-                c.execute("UPDATE tags SET name=? WHERE id=?", (new_name, old_id))
-            self.conn.commit()
+            with self._write() as c:
+                c.execute("SELECT id FROM tags WHERE name=?", (old_name,))
+                old_res = c.fetchone()
+                if not old_res: return
+                old_id = old_res[0]
+                c.execute("SELECT id FROM tags WHERE name=?", (new_name,))
+                new_res = c.fetchone()
+                if new_res:
+                    new_id = new_res[0]
+                    c.execute("UPDATE OR IGNORE idea_tags SET tag_id=? WHERE tag_id=?", (new_id, old_id))
+                    c.execute("DELETE FROM idea_tags WHERE tag_id=?", (old_id,))
+                    c.execute("DELETE FROM tags WHERE id=?", (old_id,))
+                else:
+                    c.execute("UPDATE tags SET name=? WHERE id=?", (new_name, old_id))
+                self._cm.tag_cache.invalidate(old_name, new_name)
         except Exception as e:
-            self.conn.rollback()
+            pass
 
     def delete_tag(self, tag_name):
-        c = self.conn.cursor()
-        c.execute("SELECT id FROM tags WHERE name=?", (tag_name,))
-        res = c.fetchone()
-        if res:
-            tag_id = res[0]
-            c.execute("DELETE FROM idea_tags WHERE tag_id=?", (tag_id,))
-            c.execute("DELETE FROM tags WHERE id=?", (tag_id,))
-            self.conn.commit()
\ No newline at end of file
+        with self._write() as c:
+            c.execute("SELECT id FROM tags WHERE name=?", (tag_name,))
+            res = c.fetchone()
+            if res:
+                tag_id = res[0]
+                c.execute("DELETE FROM idea_tags WHERE tag_id=?", (tag_id,))
+                c.execute("DELETE FROM tags WHERE id=?", (tag_id,))
+            self._cm.tag_cache.invalidate(tag_name)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# data/filter_indexes.py
+"""
+列表筛选所用的索引与整数时间戳列
+
+- created_ts / updated_ts: created_at / updated_at 对应的 Unix 时间戳 (秒)，由触发器维护。
+  "今日" 筛选改为对 updated_ts 的区间比较，可以走索引，而 date(updated_at,'localtime')
+  这样的函数表达式只能全表扫描。
+- 未删除笔记的筛选全部带 is_deleted = 0 条件，对应的索引建为部分索引 (WHERE is_deleted = 0)，
+  回收站单独一个 is_deleted = 1 的部分索引，索引体积只包含各自需要的行。
+- 各索引的列顺序与列表排序 (is_pinned, updated_at, id 降序) 一致，分页查询无需额外排序。
+"""
+_EPOCH = "CAST(strftime('%s', {col}) AS INTEGER)"
+
+# 当天 (本地时区) 0 点与次日 0 点对应的时间戳
+TODAY_START = _EPOCH.format(col="'now', 'localtime', 'start of day', 'utc'")
+TODAY_END = _EPOCH.format(col="'now', 'localtime', 'start of day', '+1 day', 'utc'")
+
+
+def active_condition(alias='i'):
+    """未删除笔记的条件，写法需与部分索引的 WHERE 保持一致才能命中索引"""
+    return f'{alias}.is_deleted = 0'
+
+
+def today_condition(alias='i'):
+    return f'{alias}.updated_ts >= {TODAY_START} AND {alias}.updated_ts < {TODAY_END}'
+
+
+_TRIGGERS = {
+    'trg_ideas_ts_insert': f'''
+        CREATE TRIGGER trg_ideas_ts_insert AFTER INSERT ON ideas BEGIN
+            UPDATE ideas SET created_ts = {_EPOCH.format(col='new.created_at')},
+                             updated_ts = {_EPOCH.format(col='new.updated_at')}
+            WHERE id = new.id;
+        END''',
+    'trg_ideas_ts_update': f'''
+        CREATE TRIGGER trg_ideas_ts_update AFTER UPDATE OF created_at, updated_at ON ideas BEGIN
+            UPDATE ideas SET created_ts = {_EPOCH.format(col='new.created_at')},
+                             updated_ts = {_EPOCH.format(col='new.updated_at')}
+            WHERE id = new.id;
+        END''',
+}
+
+_INDEXES = {
+    # 全部 (默认列表)
+    'idx_ideas_active': 'ON ideas(is_pinned, updated_at) WHERE is_deleted = 0',
+    # 分类 / 未分类 (category_id IS NULL 同样按等值使用索引)
+    'idx_ideas_category': 'ON ideas(category_id, is_pinned, updated_at) WHERE is_deleted = 0',
+    'idx_ideas_favorite': 'ON ideas(is_pinned, updated_at) WHERE is_deleted = 0 AND is_favorite = 1',
+    'idx_ideas_today': 'ON ideas(updated_ts) WHERE is_deleted = 0',
+    'idx_ideas_trash': 'ON ideas(updated_at) WHERE is_deleted = 1',
+    # 总数统计 (COUNT) 用的覆盖索引，避免为计数读取整行
+    'idx_ideas_deleted': 'ON ideas(is_deleted)',
+    # 按标签反查笔记 (剪贴板 / 标签筛选)
+    'idx_idea_tags_tag': 'ON idea_tags(tag_id, idea_id)',
+}
+
+# 被上面的部分索引取代的旧索引
+_OBSOLETE_INDEXES = ('idx_ideas_page', 'idx_ideas_updated')
+
+
+def ensure_timestamp_columns(c):
+    """添加时间戳列与维护触发器；已有数据由 backfill_timestamps 分批回填"""
+    c.execute("PRAGMA table_info(ideas)")
+    cols = [i[1] for i in c.fetchall()]
+    for col in ('created_ts', 'updated_ts'):
+        if col not in cols:
+            c.execute(f'ALTER TABLE ideas ADD COLUMN {col} INTEGER')
+
+    for name, sql in _TRIGGERS.items():
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?", (name,))
+        if c.fetchone() is None:
+            c.execute(sql)
+
+
+def backfill_timestamps(c, after_id, limit):
+    """
+    回填 id > after_id 的一批笔记的时间戳列，并把 is_deleted 的 NULL 统一为 0
+    (部分索引要求取值明确)。返回本批最后一个 id，没有剩余行时返回 None。
+    """
+    c.execute('SELECT MAX(id) FROM (SELECT id FROM ideas WHERE id > ? ORDER BY id LIMIT ?)', (after_id, limit))
+    last = c.fetchone()[0]
+    if last is None:
+        return None
+    c.execute(f'''UPDATE ideas SET created_ts = {_EPOCH.format(col='created_at')},
+                                   updated_ts = {_EPOCH.format(col='updated_at')}
+                 WHERE id > ? AND id <= ? AND (created_ts IS NULL OR updated_ts IS NULL)''', (after_id, last))
+    c.execute('UPDATE ideas SET is_deleted = 0 WHERE id > ? AND id <= ? AND is_deleted IS NULL', (after_id, last))
+    return last
+
+
+def ensure_filter_indexes(c):
+    """创建筛选索引，删除被取代的旧索引"""
+    for name in _OBSOLETE_INDEXES:
+        c.execute(f'DROP INDEX IF EXISTS {name}')
+    for name, sql in _INDEXES.items():
+        c.execute(f'CREATE INDEX IF NOT EXISTS {name} {sql}')
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# data/hash_filter.py
+import hashlib
+import threading
+
+MIN_CAPACITY = 100_000
+BITS_PER_ITEM = 16
+HASH_COUNT = 4        # 16 位/条、4 个位置时误判率约 0.25%
+
+
+class HashFilter:
+    """
+    ideas.content_hash 的布隆过滤器，供采集写路径判断内容是否可能已存在 (必须在写事务内调用)。
+    - 返回 False 时内容一定不存在，可以跳过按 content_hash 的查询直接插入
+    - 返回 True 时可能存在，仍需查库确认
+    首次使用时从数据库加载全部哈希；条数超过容量、或写连接的 PRAGMA data_version
+    表明其他连接提交过修改时，下次使用前整体重新加载。
+    删除笔记不会从过滤器中移除哈希，只会增加误判，不影响正确性。
+    """
+    def __init__(self):
+        self._bits = None
+        self._size = 0
+        self._capacity = 0
+        self._count = 0
+        self._data_version = None
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._bits = None
+
+    def _positions(self, content_hash):
+        # content_hash 本身是均匀分布的摘要，直接切出两段作为双重哈希的种子
+        try:
+            h1, h2 = int(content_hash[:16], 16), int(content_hash[16:32], 16)
+        except (TypeError, ValueError):
+            digest = hashlib.blake2b(str(content_hash).encode('utf-8'), digest_size=16).digest()
+            h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        h2 |= 1
+        size = self._size
+        return [(h1 + i * h2) % size for i in range(HASH_COUNT)]
+
+    def _set(self, content_hash):
+        for pos in self._positions(content_hash):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def _load(self, c):
+        c.execute('SELECT COUNT(content_hash) FROM ideas')
+        count = c.fetchone()[0]
+        self._capacity = max(MIN_CAPACITY, count * 2)
+        self._size = self._capacity * BITS_PER_ITEM
+        self._bits = bytearray((self._size + 7) // 8)
+        self._count = 0
+        c.execute('SELECT content_hash FROM ideas WHERE content_hash IS NOT NULL')
+        bits, positions = self._bits, self._positions
+        for (content_hash,) in c:
+            for pos in positions(content_hash):
+                bits[pos >> 3] |= 1 << (pos & 7)
+            self._count += 1
+
+    def _ensure_loaded(self, c):
+        version = c.execute('PRAGMA data_version').fetchone()[0]
+        if self._bits is None or version != self._data_version or self._count > self._capacity:
+            self._load(c)
+            self._data_version = version
+
+    def warm(self, c):
+        """预先加载 (在后台写入线程中调用，避免首次采集时等待)"""
+        with self._lock:
+            self._ensure_loaded(c)
+
+    def might_contain(self, c, content_hash):
+        with self._lock:
+            self._ensure_loaded(c)
+            bits = self._bits
+            return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(content_hash))
+
+    def add(self, content_hash):
+        """登记新写入的哈希；尚未加载时忽略 (加载时会从数据库读到)"""
+        with self._lock:
+            if self._bits is not None and content_hash:
+                self._set(content_hash)
+                self._count += 1
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# data/idea_bulk.py
+"""
+笔记的批量写操作 (DatabaseManager 与 IdeaRepository 共用)
+
+每种操作一条集合语句：id 集合编码为 JSON 数组，配合 json_each(?) 在单条语句中处理任意数量的 id。
+函数只接收游标，由调用方放在同一个写事务中执行；新标签一律经 TagCache 创建，
+回滚时 ConnectionManager 会清空缓存 (见 data/tag_cache.py)。
+"""
+import json
+
+TOGGLE_FIELDS = ('is_pinned', 'is_favorite')
+
+
+def ids_param(idea_ids):
+    """把 id 集合编码为 JSON 数组"""
+    return json.dumps([int(i) for i in idea_ids])
+
+
+def link_tags(c, tag_cache, idea_ids, tags):
+    """给一组笔记追加标签：标签 id 走内存缓存，关联行一次 executemany 写入"""
+    if not idea_ids: return
+    tag_ids = list(tag_cache.resolve(c, tags).values())
+    if not tag_ids: return
+    c.executemany('INSERT OR IGNORE INTO idea_tags (idea_id, tag_id) VALUES (?,?)',
+                  [(int(iid), tid) for iid in idea_ids for tid in tag_ids])
+
+
+def toggle_field_many(c, idea_ids, field):
+    if field not in TOGGLE_FIELDS:
+        raise ValueError(f"不支持切换的字段: {field}")
+    c.execute(f'UPDATE ideas SET {field} = NOT {field} WHERE id IN (SELECT value FROM json_each(?))',
+              (ids_param(idea_ids),))
+
+
+def set_deleted_many(c, idea_ids, state):
+    c.execute('UPDATE ideas SET is_deleted=?, updated_at=CURRENT_TIMESTAMP WHERE id IN (SELECT value FROM json_each(?))',
+              (1 if state else 0, ids_param(idea_ids)))
+
+
+def set_favorite_many(c, idea_ids, state):
+    c.execute('UPDATE ideas SET is_favorite=? WHERE id IN (SELECT value FROM json_each(?))',
+              (1 if state else 0, ids_param(idea_ids)))
+
+
+def move_category_many(c, tag_cache, idea_ids, cat_id):
+    """移动到分类，并套用分类颜色与预设标签"""
+    ids = ids_param(idea_ids)
+    c.execute('UPDATE ideas SET category_id=? WHERE id IN (SELECT value FROM json_each(?))', (cat_id, ids))
+    if cat_id is None:
+        return
+    c.execute('SELECT color, preset_tags FROM categories WHERE id=?', (cat_id,))
+    row = c.fetchone()
+    if not row:
+        return
+    cat_color, preset_tags = row
+    if cat_color:
+        c.execute('UPDATE ideas SET color=? WHERE id IN (SELECT value FROM json_each(?))', (cat_color, ids))
+    if preset_tags:
+        link_tags(c, tag_cache, idea_ids, preset_tags.split(','))
+
+
+def delete_permanent_many(c, idea_ids):
+    ids = ids_param(idea_ids)
+    c.execute('DELETE FROM ideas WHERE id IN (SELECT value FROM json_each(?))', (ids,))
+    c.execute('DELETE FROM idea_tags WHERE idea_id IN (SELECT value FROM json_each(?))', (ids,))
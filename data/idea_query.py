@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# data/idea_query.py
+"""
+笔记列表查询构造器
+
+主窗口、快速窗口、导出与统计共用同一套筛选 SQL：
+- 标签相关的条件 (剪贴板 / 标签筛选 / 无标签) 用 EXISTS 子查询表达，
+  不再 LEFT JOIN 标签表后用 DISTINCT 去掉重复行
+- 分页查询可以在同一条语句里带回筛选结果总数，翻页刷新只需一次查询
+- 筛选条件的写法与 data/filter_indexes.py 中的索引保持一致
+"""
+from data.content_store import inflate_rows
+from data.counters import CLIPBOARD_TAG
+from data.filter_indexes import active_condition, today_condition
+from data.search_index import search_condition
+
+# ideas 行的对外字段顺序 (UI 按下标读取)：
+# 0:id 1:title 2:content 3:color 4:is_pinned 5:is_favorite 6:created_at 7:updated_at
+# 8:category_id 9:is_deleted 10:item_type 11:data_blob 12:content_hash
+# 列表查询不加载图片数据，data_blob 位置固定为 NULL；只有 get_idea(include_blob=True) 会读取 blobs 表
+# 压缩存储的大段正文在 content 中只有前缀 (见 data/content_store.py)
+IDEA_LIST_COLUMNS = ('i.id, i.title, i.content, i.color, i.is_pinned, i.is_favorite, i.created_at, i.updated_at, '
+                     'i.category_id, i.is_deleted, i.item_type, NULL AS data_blob, i.content_hash')
+IDEA_FULL_COLUMNS = IDEA_LIST_COLUMNS.replace('NULL AS data_blob', 'COALESCE(b.data, i.data_blob) AS data_blob')
+
+
+def _has_tag(alias):
+    """笔记带有某个标签 (标签名作为参数)，走 idea_tags 主键"""
+    return (f"EXISTS (SELECT 1 FROM idea_tags WHERE idea_id = {alias}.id "
+            f"AND tag_id = (SELECT id FROM tags WHERE name = ?))")
+
+
+def page_key(row):
+    """从 ideas 行中取出分页游标 (is_pinned, updated_at, id)"""
+    return (row[4], row[7], row[0])
+
+
+class IdeaQuery:
+    """
+    一组筛选条件 (搜索词 + 侧边栏筛选 + 标签筛选)。
+    f_type 可以是字符串或 core.enums.FilterType。
+    """
+    def __init__(self, search='', f_type='all', f_val=None, tag_filter=None, alias='i'):
+        self.search = search
+        self.f_type = getattr(f_type, 'value', f_type) or 'all'
+        self.f_val = f_val
+        self.tag_filter = tag_filter
+        self.alias = alias
+
+    def where(self):
+        """返回 (以 ' WHERE' 开头的子句, 参数列表)"""
+        a = self.alias
+        conds, p = [], []
+
+        if self.f_type == 'trash': conds.append(f'{a}.is_deleted = 1')
+        else: conds.append(active_condition(a))
+
+        if self.f_type == 'category' and self.f_val is not None:
+            conds.append(f'{a}.category_id = ?'); p.append(self.f_val)
+        elif self.f_type in ('category', 'uncategorized'):
+            conds.append(f'{a}.category_id IS NULL')
+        elif self.f_type == 'today':
+            conds.append(today_condition(a))
+        elif self.f_type == 'clipboard':
+            conds.append(_has_tag(a)); p.append(CLIPBOARD_TAG)
+        elif self.f_type == 'untagged':
+            conds.append(f'NOT EXISTS (SELECT 1 FROM idea_tags WHERE idea_id = {a}.id)')
+        elif self.f_type == 'favorite':
+            conds.append(f'{a}.is_favorite = 1')
+
+        if self.tag_filter:
+            conds.append(_has_tag(a)); p.append(self.tag_filter)
+
+        if self.search:
+            cond, args = search_condition(self.search, alias=a)
+            if cond:
+                conds.append(cond); p.extend(args)
+
+        return ' WHERE ' + ' AND '.join(conds), p
+
+    def order_columns(self):
+        """列表排序列 (全部降序)，回收站不区分置顶"""
+        a = self.alias
+        if self.f_type == 'trash':
+            return [f'{a}.updated_at', f'{a}.id']
+        return [f'{a}.is_pinned', f'{a}.updated_at', f'{a}.id']
+
+    def count(self):
+        where, p = self.where()
+        return f'SELECT COUNT(*) FROM ideas {self.alias}' + where, p
+
+    def select(self, columns=IDEA_LIST_COLUMNS, after=None, before=None, from_end=False,
+               limit=None, offset=0, with_total=False):
+        """
+        返回 (sql, params, reverse)。
+        - after / before: 键集分页游标 (page_key)，取其后 / 其前的一页
+        - from_end: 从列表末尾倒着取；reverse 为 True 时调用方需把结果倒序
+        - with_total: 在每行末尾附加筛选结果总数。总数用不相关子查询计算，只执行一次，
+          不受游标条件影响，也不需要像 COUNT(*) OVER () 那样先物化全部匹配行
+        """
+        cols = self.order_columns()
+        where, where_p = self.where()
+        join_blobs = 'b.data' in columns
+        p = []
+        if with_total:
+            count_sql, count_p = self.count()
+            columns = f'{columns}, ({count_sql}) AS total'
+            p.extend(count_p)
+        q = f'SELECT {columns} FROM ideas {self.alias}'
+        if join_blobs:
+            q += f' LEFT JOIN blobs b ON b.content_hash = {self.alias}.blob_hash'
+        q += where
+        p.extend(where_p)
+
+        cursor = after if after is not None else before
+        reverse = from_end or (after is None and before is not None)
+        if cursor is not None:
+            key = list(cursor)[-len(cols):]
+            op = '>' if reverse else '<'
+            q += f" AND ({', '.join(cols)}) {op} ({', '.join('?' * len(cols))})"
+            p.extend(key)
+
+        direction = 'ASC' if reverse else 'DESC'
+        q += ' ORDER BY ' + ', '.join(f'{col} {direction}' for col in cols)
+        if limit is not None:
+            q += ' LIMIT ? OFFSET ?'
+            p.extend([limit, max(0, offset)])
+        return q, p, reverse
+
+
+def fetch_page(c, query, with_total=False, full_content=False, **kw):
+    """
+    执行 query.select()，返回行列表 (已恢复为正序)；with_total=True 时返回 (rows, total)。
+    结果为空时 (例如游标之后已无数据) 再单独统计一次总数。
+    full_content=True 时 content 列为解压后的完整正文 (导出等场景使用)。
+    """
+    if full_content:
+        kw['columns'] = f"{kw.get('columns', IDEA_LIST_COLUMNS)}, {query.alias}.content_z"
+    sql, p, reverse = query.select(with_total=with_total, **kw)
+    c.execute(sql, p)
+    rows = c.fetchall()
+    if reverse:
+        rows.reverse()
+    total = None
+    if with_total:
+        if rows:
+            rows, total = [r[:-1] for r in rows], rows[0][-1]
+        else:
+            c.execute(*query.count())
+            total = c.fetchone()[0]
+    if full_content:
+        rows = inflate_rows(rows)
+    return (rows, total) if with_total else rows
+
+
+def fetch_counts(c, queries):
+    """一次查询统计多组筛选条件，queries: {key: IdeaQuery}，返回 {key: count}"""
+    keys = list(queries)
+    parts, p = [], []
+    for k in keys:
+        sql, args = queries[k].count()
+        parts.append(f'({sql})')
+        p.extend(args)
+    c.execute('SELECT ' + ', '.join(parts), p)
+    return dict(zip(keys, c.fetchone()))
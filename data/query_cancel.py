@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# data/query_cancel.py
+"""
+可取消的只读查询
+
+后台线程在 cancel_scope(token) 中执行查询时，借出的只读连接会登记到 token 上：
+- token.cancel() 对正在使用的连接调用 Connection.interrupt()，正在执行的语句立即中止
+- 只读连接上的进度回调 (set_progress_handler) 每执行一定数量的虚拟机指令检查一次 token，
+  两条语句之间发生的取消也能在下一条语句开始后很快生效
+被中止的查询抛出 QueryCancelled。
+"""
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class QueryCancelled(Exception):
+    """查询已被取消 (被更新的请求取代)"""
+
+
+class CancelToken:
+    def __init__(self):
+        self.cancelled = False
+        self._conns = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            for conn in self._conns:
+                conn.interrupt()
+
+    def attach(self, conn):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled()
+            self._conns.add(conn)
+
+    def detach(self, conn):
+        # 归还连接前解除登记，避免 interrupt() 误伤复用该连接的其他查询
+        with self._lock:
+            self._conns.discard(conn)
+
+
+@contextmanager
+def cancel_scope(token):
+    """在当前线程内把查询与 token 关联"""
+    previous = getattr(_local, 'token', None)
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def current_token():
+    return getattr(_local, 'token', None)
+
+
+def progress_handler():
+    """只读连接的进度回调：返回非 0 时 SQLite 中止当前语句"""
+    token = getattr(_local, 'token', None)
+    return 1 if token is not None and token.cancelled else 0
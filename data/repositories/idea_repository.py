@@ -1,119 +1,105 @@
 # data/repositories/idea_repository.py
 import sqlite3
 import hashlib
+import json
 import os
 from core.enums import FilterType
+from data import idea_bulk
+from data.blob_store import put_blob
+from data.content_store import pack_content, inflate_rows
+from data.filter_indexes import active_condition
+from data.connection_manager import ConnectionManager
+from data.idea_query import IDEA_FULL_COLUMNS, IdeaQuery, fetch_page, fetch_counts
 
 class IdeaRepository:
-    def __init__(self, conn):
-        self.conn = conn
+    def __init__(self, connection_manager=None):
+        self._cm = connection_manager or ConnectionManager.instance()
 
     def add(self, title, content, color, category_id=None, item_type='text', data_blob=None, content_hash=None):
-        c = self.conn.cursor()
-        c.execute(
-            'INSERT INTO ideas (title, content, color, category_id, item_type, data_blob, content_hash) VALUES (?,?,?,?,?,?,?)',
-            (title, content, color, category_id, item_type, data_blob, content_hash)
-        )
-        self.conn.commit()
-        return c.lastrowid
+        stored, content_z, compressed = pack_content(content)
+        with self._cm.transaction() as c:
+            c.execute(
+                'INSERT INTO ideas (title, content, content_z, content_compressed, color, category_id, item_type, blob_hash, content_hash) VALUES (?,?,?,?,?,?,?,?,?)',
+                (title, stored, content_z, compressed, color, category_id, item_type, put_blob(c, data_blob), content_hash)
+            )
+            return c.lastrowid
 
     def update(self, iid, title, content, color, category_id=None, item_type='text', data_blob=None):
-        c = self.conn.cursor()
-        c.execute(
-            'UPDATE ideas SET title=?, content=?, color=?, category_id=?, item_type=?, data_blob=?, updated_at=CURRENT_TIMESTAMP WHERE id=?',
-            (title, content, color, category_id, item_type, data_blob, iid)
-        )
-        self.conn.commit()
+        stored, content_z, compressed = pack_content(content)
+        with self._cm.transaction() as c:
+            c.execute(
+                'UPDATE ideas SET title=?, content=?, content_z=?, content_compressed=?, color=?, category_id=?, item_type=?, blob_hash=?, data_blob=NULL, updated_at=CURRENT_TIMESTAMP WHERE id=?',
+                (title, stored, content_z, compressed, color, category_id, item_type, put_blob(c, data_blob), iid)
+            )
 
     def find_by_hash(self, content_hash):
-        c = self.conn.cursor()
-        c.execute("SELECT id FROM ideas WHERE content_hash = ?", (content_hash,))
-        return c.fetchone()
+        with self._cm.reader() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id FROM ideas WHERE content_hash = ?", (content_hash,))
+            return c.fetchone()
 
     def update_timestamp(self, iid):
-        c = self.conn.cursor()
-        c.execute("UPDATE ideas SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (iid,))
-        self.conn.commit()
+        with self._cm.transaction() as c:
+            c.execute("UPDATE ideas SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (iid,))
 
     def toggle_field(self, iid, field):
         if field not in ['is_pinned', 'is_favorite']:
             raise ValueError("Invalid field for toggling")
-        c = self.conn.cursor()
-        c.execute(f'UPDATE ideas SET {field} = NOT {field} WHERE id=?', (iid,))
-        self.conn.commit()
+        with self._cm.transaction() as c:
+            c.execute(f'UPDATE ideas SET {field} = NOT {field} WHERE id=?', (iid,))
 
     def set_deleted(self, iid, state):
-        c = self.conn.cursor()
-        c.execute('UPDATE ideas SET is_deleted=? WHERE id=?', (1 if state else 0, iid))
-        self.conn.commit()
+        with self._cm.transaction() as c:
+            c.execute('UPDATE ideas SET is_deleted=? WHERE id=?', (1 if state else 0, iid))
 
     def move_category(self, iid, cat_id):
-        c = self.conn.cursor()
-        c.execute('UPDATE ideas SET category_id=? WHERE id=?', (cat_id, iid))
-        self.conn.commit()
+        with self._cm.transaction() as c:
+            c.execute('UPDATE ideas SET category_id=? WHERE id=?', (cat_id, iid))
 
     def delete_permanent(self, iid):
-        c = self.conn.cursor()
-        c.execute('DELETE FROM ideas WHERE id=?', (iid,))
-        c.execute('DELETE FROM idea_tags WHERE idea_id=?', (iid,))
-        self.conn.commit()
+        with self._cm.transaction() as c:
+            c.execute('DELETE FROM ideas WHERE id=?', (iid,))
+            c.execute('DELETE FROM idea_tags WHERE idea_id=?', (iid,))
+
+    # --- 批量操作 (与 DatabaseManager 共用 data/idea_bulk.py，每种操作一条集合语句、一次提交) ---
+
+    def toggle_field_many(self, idea_ids, field):
+        with self._cm.transaction() as c:
+            idea_bulk.toggle_field_many(c, idea_ids, field)
+
+    def set_deleted_many(self, idea_ids, state):
+        with self._cm.transaction() as c:
+            idea_bulk.set_deleted_many(c, idea_ids, state)
+
+    def move_category_many(self, idea_ids, cat_id):
+        """移动到分类，并套用分类颜色与预设标签 (新标签经 TagCache 创建)"""
+        with self._cm.transaction() as c:
+            idea_bulk.move_category_many(c, self._cm.tag_cache, idea_ids, cat_id)
+
+    def delete_permanent_many(self, idea_ids):
+        with self._cm.transaction() as c:
+            idea_bulk.delete_permanent_many(c, idea_ids)
 
     def get_by_id(self, iid, include_blob=False):
-        c = self.conn.cursor()
-        if include_blob:
-            c.execute('SELECT * FROM ideas WHERE id=?', (iid,))
-        else:
-            c.execute('SELECT id, title, content, color, is_pinned, is_favorite, created_at, updated_at, category_id, item_type FROM ideas WHERE id=?', (iid,))
-        return c.fetchone()
+        with self._cm.reader() as conn:
+            c = conn.cursor()
+            if include_blob:
+                c.execute(f'SELECT {IDEA_FULL_COLUMNS}, i.content_z FROM ideas i LEFT JOIN blobs b ON b.content_hash = i.blob_hash WHERE i.id=?', (iid,))
+            else:
+                c.execute('SELECT id, title, content, color, is_pinned, is_favorite, created_at, updated_at, category_id, item_type, content_z FROM ideas WHERE id=?', (iid,))
+            rows = inflate_rows(c.fetchall())
+            return rows[0] if rows else None
 
     def get_all(self, search: str, f_type: FilterType, f_val):
-        c = self.conn.cursor()
-        q = "SELECT DISTINCT i.* FROM ideas i LEFT JOIN idea_tags it ON i.id=it.idea_id LEFT JOIN tags t ON it.tag_id=t.id WHERE 1=1"
-        p = []
-        
-        if f_type == FilterType.TRASH:
-            q += ' AND i.is_deleted=1'
-        else:
-            q += ' AND (i.is_deleted=0 OR i.is_deleted IS NULL)'
-        
-        if f_type == FilterType.CATEGORY:
-            if f_val is None: q += ' AND i.category_id IS NULL'
-            else: q += ' AND i.category_id=?'; p.append(f_val)
-        elif f_type == FilterType.TODAY:
-            q += " AND date(i.updated_at,'localtime')=date('now','localtime')"
-        elif f_type == FilterType.CLIPBOARD:
-            q += " AND i.id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = '剪贴板'))"
-        elif f_type == FilterType.UNTAGGED:
-            q += ' AND i.id NOT IN (SELECT idea_id FROM idea_tags)'
-        elif f_type == FilterType.FAVORITE:
-            q += ' AND i.is_favorite=1'
-        elif f_type == FilterType.UNCATEGORIZED:
-            q += ' AND i.category_id IS NULL'
-        
-        if search:
-            q += ' AND (i.title LIKE ? OR i.content LIKE ? OR t.name LIKE ?)'
-            p.extend([f'%{search}%']*3)
-            
-        q += ' ORDER BY i.is_pinned DESC, i.updated_at DESC'
-        c.execute(q, p)
-        return c.fetchall()
+        with self._cm.reader() as conn:
+            return fetch_page(conn.cursor(), IdeaQuery(search, f_type, f_val))
 
     def get_counts(self):
-        c = self.conn.cursor()
-        d = {}
-        queries = {
-            FilterType.ALL: "is_deleted=0 OR is_deleted IS NULL",
-            FilterType.TODAY: "(is_deleted=0 OR is_deleted IS NULL) AND date(updated_at,'localtime')=date('now','localtime')",
-            FilterType.CLIPBOARD: "(is_deleted=0 OR is_deleted IS NULL) AND id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = '剪贴板'))",
-            FilterType.UNCATEGORIZED: "(is_deleted=0 OR is_deleted IS NULL) AND category_id IS NULL",
-            FilterType.UNTAGGED: "(is_deleted=0 OR is_deleted IS NULL) AND id NOT IN (SELECT idea_id FROM idea_tags)",
-            FilterType.FAVORITE: "(is_deleted=0 OR is_deleted IS NULL) AND is_favorite=1",
-            FilterType.TRASH: "is_deleted=1"
-        }
-        for k, v in queries.items():
-            c.execute(f"SELECT COUNT(*) FROM ideas WHERE {v}")
-            d[k.value] = c.fetchone()[0]
-            
-        c.execute("SELECT category_id, COUNT(*) FROM ideas WHERE (is_deleted=0 OR is_deleted IS NULL) GROUP BY category_id")
-        d['categories'] = dict(c.fetchall())
-        return d
+        with self._cm.reader() as conn:
+            c = conn.cursor()
+            counts = fetch_counts(c, {k: IdeaQuery(f_type=k) for k in FilterType if k != FilterType.CATEGORY})
+            d = {k.value: v for k, v in counts.items()}
+
+            c.execute(f"SELECT category_id, COUNT(*) FROM ideas i WHERE {active_condition()} GROUP BY category_id")
+            d['categories'] = dict(c.fetchall())
+            return d
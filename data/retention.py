@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# data/retention.py
+"""
+剪贴板历史的保留策略
+
+只清理自动采集的笔记 (带 "剪贴板" 标签)，置顶、收藏、已归入分类的默认不清理。
+三项上限任意组合 (None 表示不限制，全部为 None 时不清理)：
+- max_items:    最多保留多少条，超出时删除最久未使用的 (按 updated_at，重复采集会刷新)
+- max_age_days: 超过多少天未使用的删除
+- max_bytes:    正文与图片合计字节数上限 (近似值：共享同一图片的笔记各算一次)
+每次调用 purge_step() 最多选出 batch_size 条，调用方在空闲时逐批删除直到返回空列表。
+max_bytes 的分界只在每轮清理开始时由 byte_cutoff() 计算一次 (一次窗口函数查询)，
+之后各批只删除分界及更旧的条目，不必每批重新累计全部条目的大小。
+删除走普通的 DELETE，计数器、全文索引与图片引用由触发器同步。
+
+删除后的空闲页用 incremental_vacuum() 分批归还给文件系统：新数据库创建时即开启
+auto_vacuum=INCREMENTAL；旧数据库需要由用户执行一次完整 VACUUM 才能切换 (见 ConnectionManager.vacuum)，
+保留策略本身不会自动执行完整 VACUUM。
+"""
+from data.counters import CLIPBOARD_TAG
+
+_CLIP_TAG_ID = '(SELECT id FROM tags WHERE name = ?)'
+
+
+class RetentionPolicy:
+    def __init__(self, max_items=None, max_age_days=None, max_bytes=None,
+                 keep_pinned=True, keep_favorite=True, keep_categorized=True):
+        self.max_items = max_items
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.keep_pinned = keep_pinned
+        self.keep_favorite = keep_favorite
+        self.keep_categorized = keep_categorized
+
+    @classmethod
+    def from_dict(cls, values):
+        """从配置字典创建，忽略未知键"""
+        keys = ('max_items', 'max_age_days', 'max_bytes', 'keep_pinned', 'keep_favorite', 'keep_categorized')
+        return cls(**{k: values[k] for k in keys if k in values})
+
+    @property
+    def enabled(self):
+        return any(v is not None for v in (self.max_items, self.max_age_days, self.max_bytes))
+
+    def candidates(self, alias='i'):
+        """可被清理的笔记条件，返回 (sql, params)"""
+        a = alias
+        conds = [f'EXISTS (SELECT 1 FROM idea_tags WHERE idea_id = {a}.id AND tag_id = {_CLIP_TAG_ID})']
+        if self.keep_pinned: conds.append(f'COALESCE({a}.is_pinned, 0) = 0')
+        if self.keep_favorite: conds.append(f'COALESCE({a}.is_favorite, 0) = 0')
+        if self.keep_categorized: conds.append(f'{a}.category_id IS NULL')
+        return ' AND '.join(conds), [CLIPBOARD_TAG]
+
+
+def _expired(c, policy, limit):
+    where, p = policy.candidates()
+    c.execute(f'''SELECT i.id FROM ideas i WHERE {where}
+                  AND i.updated_ts < CAST(strftime('%s', 'now') AS INTEGER) - ?
+                  ORDER BY i.updated_ts LIMIT ?''', (*p, int(policy.max_age_days * 86400), limit))
+    return [r[0] for r in c.fetchall()]
+
+
+def _over_count(c, policy, limit):
+    where, p = policy.candidates()
+    c.execute(f'SELECT COUNT(*) FROM ideas i WHERE {where}', p)
+    excess = c.fetchone()[0] - policy.max_items
+    if excess <= 0:
+        return []
+    c.execute(f'SELECT i.id FROM ideas i WHERE {where} ORDER BY i.updated_at, i.id LIMIT ?', (*p, min(excess, limit)))
+    return [r[0] for r in c.fetchall()]
+
+
+def byte_cutoff(c, policy):
+    """
+    max_bytes 的分界：从新到旧累计大小，第一条使合计超出上限的条目的 (updated_at, id)；
+    该条目及更旧的都应删除。未超出上限 (或未设置 max_bytes) 时返回 None。
+    """
+    if policy.max_bytes is None:
+        return None
+    # 按字节计算：length() 作用于 TEXT 返回字符数，因此 content 先转换为 BLOB。
+    # length() 作用于 BLOB 时只读取记录头中的长度，不会读取溢出页中的图片数据
+    where, p = policy.candidates()
+    c.execute(f'''SELECT updated_at, id FROM (
+                      SELECT i.id, i.updated_at,
+                             SUM(COALESCE(length(CAST(i.content AS BLOB)), 0) + COALESCE(length(i.content_z), 0)
+                                 + COALESCE((SELECT length(b.data) FROM blobs b WHERE b.content_hash = i.blob_hash), 0))
+                                 OVER (ORDER BY i.updated_at DESC, i.id DESC) AS running
+                      FROM ideas i WHERE {where})
+                  WHERE running > ? ORDER BY updated_at DESC, id DESC LIMIT 1''', (*p, policy.max_bytes))
+    row = c.fetchone()
+    return tuple(row) if row else None
+
+
+def _over_bytes(c, policy, cutoff, limit):
+    # 从最旧的开始删除，直到分界 (含)
+    where, p = policy.candidates()
+    c.execute(f'''SELECT i.id FROM ideas i WHERE {where} AND (i.updated_at, i.id) <= (?, ?)
+                  ORDER BY i.updated_at, i.id LIMIT ?''', (*p, *cutoff, limit))
+    return [r[0] for r in c.fetchall()]
+
+
+def purge_step(c, policy, batch_size, cutoff=None):
+    """
+    按策略选出一批要删除的笔记，返回 id 列表 (空列表表示已满足全部上限)。
+    max_bytes 只在传入 byte_cutoff() 计算的 cutoff 时处理。
+    """
+    if not policy.enabled:
+        return []
+    ids = []
+    if policy.max_age_days is not None:
+        ids = _expired(c, policy, batch_size)
+    if not ids and policy.max_items is not None:
+        ids = _over_count(c, policy, batch_size)
+    if not ids and cutoff is not None:
+        ids = _over_bytes(c, policy, cutoff, batch_size)
+    return ids
+
+
+# --- 空间回收 ---
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def space_stats(c):
+    """返回 (auto_vacuum 模式, 总页数, 空闲页数)"""
+    mode = c.execute('PRAGMA auto_vacuum').fetchone()[0]
+    pages = c.execute('PRAGMA page_count').fetchone()[0]
+    free = c.execute('PRAGMA freelist_count').fetchone()[0]
+    return mode, pages, free
+
+
+def incremental_vacuum(c, max_pages):
+    """把至多 max_pages 个空闲页归还给文件系统，返回实际回收的页数 (仅 auto_vacuum=INCREMENTAL 时有效)"""
+    before = c.execute('PRAGMA freelist_count').fetchone()[0]
+    # 每回收一页执行一步，必须取完结果才会全部执行
+    c.execute(f'PRAGMA incremental_vacuum({int(max_pages)})').fetchall()
+    return before - c.execute('PRAGMA freelist_count').fetchone()[0]
@@ -1,8 +1,131 @@
 # data/schema_migrations.py
+"""
+按版本号执行的数据库结构迁移
+
+数据库版本记录在 PRAGMA user_version 中。启动时版本已是最新则只读一次 user_version，
+不再探测任何表结构；否则依次执行缺少的版本：
+- 结构变更 (schema) 在一个事务内完成，且可以重复执行 (兼容没有版本号的旧数据库)
+- 数据迁移 (jobs) 按 ideas.id 分批执行，每批一个事务，进度保存在 schema_migration_state 表中，
+  中途退出后再次启动会从上次的位置继续
+- 该版本的全部步骤完成后，才在同一事务中清理进度并更新 user_version
+新增结构变更时在 MIGRATIONS 末尾追加一个版本，不要修改已发布的版本。
+"""
 import logging
+from contextlib import contextmanager
+from core.config import COLORS
+from data.blob_store import ensure_blob_store, ensure_blob_encodings, migrate_inline_blobs, BLOB_MIGRATION_BATCH
+from data.change_journal import ensure_change_journal, rebuild_update_triggers
+from data.content_store import ensure_content_store, compress_large_content
+from data.counters import ensure_counters, add_tag_insert_trigger
+from data.filter_indexes import ensure_timestamp_columns, backfill_timestamps, ensure_filter_indexes
+from data.search_index import ensure_search_index, backfill_search_index
 
 logger = logging.getLogger(__name__)
 
+MIGRATION_BATCH = 2000
+
+
+class BatchJob:
+    """
+    分批数据迁移：step(c, after_id, limit) 处理 id > after_id 的至多 limit 条笔记，
+    返回本批最后一个 id，全部完成时返回 None。step 必须可以重复执行。
+    """
+    def __init__(self, name, description, step, batch_size=MIGRATION_BATCH):
+        self.name = name
+        self.description = description
+        self.step = step
+        self.batch_size = batch_size
+
+
+class Migration:
+    def __init__(self, version, description, schema, jobs=()):
+        self.version = version
+        self.description = description
+        self.schema = schema
+        self.jobs = tuple(jobs)
+
+
+def _add_missing_columns(c, table, columns):
+    c.execute(f"PRAGMA table_info({table})")
+    existing = {i[1] for i in c.fetchall()}
+    for name, decl in columns:
+        if name not in existing:
+            c.execute(f'ALTER TABLE {table} ADD COLUMN {name} {decl}')
+
+
+def _base_tables(c):
+    c.execute(f'''CREATE TABLE IF NOT EXISTS ideas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL, content TEXT, color TEXT DEFAULT '{COLORS['default_note']}',
+        is_pinned INTEGER DEFAULT 0, is_favorite INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        category_id INTEGER, is_deleted INTEGER DEFAULT 0
+    )''')
+    c.execute('CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL)')
+    c.execute('''CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        parent_id INTEGER,
+        color TEXT DEFAULT "#808080",
+        sort_order INTEGER DEFAULT 0
+    )''')
+    c.execute('CREATE TABLE IF NOT EXISTS idea_tags (idea_id INTEGER, tag_id INTEGER, PRIMARY KEY (idea_id, tag_id))')
+
+    # 没有版本号的旧数据库可能缺少的列
+    _add_missing_columns(c, 'ideas', [
+        ('category_id', 'INTEGER'),
+        ('is_deleted', 'INTEGER DEFAULT 0'),
+        ('item_type', "TEXT DEFAULT 'text'"),
+        ('data_blob', 'BLOB'),
+        ('content_hash', 'TEXT'),
+    ])
+    c.execute('CREATE INDEX IF NOT EXISTS idx_content_hash ON ideas(content_hash)')
+    _add_missing_columns(c, 'categories', [
+        ('sort_order', 'INTEGER DEFAULT 0'),
+        ('preset_tags', 'TEXT'),
+    ])
+
+
+MIGRATIONS = (
+    Migration(1, "基础表结构", _base_tables),
+    Migration(2, "二进制数据存储", ensure_blob_store),
+    Migration(3, "时间戳列", ensure_timestamp_columns,
+              [BatchJob('timestamps', "回填时间戳列", backfill_timestamps)]),
+    # 索引在时间戳回填之后创建，回填时无需同步维护索引
+    Migration(4, "筛选索引", ensure_filter_indexes),
+    Migration(5, "全文索引", ensure_search_index,
+              [BatchJob('fts', "回填全文索引", backfill_search_index)]),
+    Migration(6, "侧边栏计数器", ensure_counters),
+    Migration(7, "大段文本压缩", ensure_content_store,
+              [BatchJob('compress', "压缩大段文本", compress_large_content, batch_size=200)]),
+    Migration(8, "图片重新编码记录", ensure_blob_encodings),
+    Migration(9, "变更日志", ensure_change_journal),
+    Migration(10, "变更日志触发器修正", rebuild_update_triggers),
+    Migration(11, "剪贴板标签新建时重算计数", add_tag_insert_trigger),
+    # 旧版本内联在 ideas.data_blob 中的图片，每行一整张图片，批次很小
+    Migration(12, "迁出内联图片", ensure_blob_store,
+              [BatchJob('inline_blobs', "迁出内联图片", migrate_inline_blobs, batch_size=BLOB_MIGRATION_BATCH)]),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+@contextmanager
+def _transaction(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _log_progress(description, done, total):
+    logger.info(f"{description}: {done}/{total}")
+
+
 class SchemaMigration:
     @staticmethod
     def _get_db_version(conn):
@@ -16,80 +139,62 @@ class SchemaMigration:
             return 0
 
     @staticmethod
-    def _set_db_version(conn, version):
-        c = conn.cursor()
-        c.execute(f"PRAGMA user_version = {version}")
-        conn.commit()
+    def _set_db_version(c, version):
+        # user_version 写在数据库文件头中，随所在事务一起提交或回滚
+        c.execute(f"PRAGMA user_version = {int(version)}")
 
     @staticmethod
-    def apply(conn):
-        logger.info("开始检查数据库结构迁移...")
+    def apply(conn, progress=None):
+        """
+        把数据库迁移到 LATEST_VERSION，返回迁移后的版本号。
+        progress(description, done, total) 在每批数据迁移后调用，默认写日志。
+        """
         current_version = SchemaMigration._get_db_version(conn)
-        logger.info(f"当前数据库版本: {current_version}")
-
-        if current_version < 1:
-            SchemaMigration._migrate_to_v1(conn)
-            SchemaMigration._set_db_version(conn, 1)
-            logger.info("数据库迁移到 v1")
-        
-        # Add future migrations here
-        # if current_version < 2:
-        #     SchemaMigration._migrate_to_v2(conn)
-        #     SchemaMigration._set_db_version(conn, 2)
-        #     logger.info("数据库迁移到 v2")
-            
-        logger.info("数据库结构检查完成。")
+        if current_version == LATEST_VERSION:
+            return current_version
+        if current_version > LATEST_VERSION:
+            logger.warning(f"数据库版本 v{current_version} 高于程序支持的 v{LATEST_VERSION}，跳过迁移")
+            return current_version
+
+        logger.info(f"数据库版本 v{current_version}，开始迁移到 v{LATEST_VERSION}")
+        if conn.in_transaction:
+            conn.commit()
+        with _transaction(conn) as c:
+            c.execute('CREATE TABLE IF NOT EXISTS schema_migration_state (job TEXT PRIMARY KEY, cursor INTEGER NOT NULL)')
+
+        for migration in MIGRATIONS:
+            if migration.version <= current_version:
+                continue
+            logger.info(f"数据库迁移 v{migration.version}: {migration.description}")
+            with _transaction(conn) as c:
+                migration.schema(c)
+            for job in migration.jobs:
+                SchemaMigration._run_job(conn, migration, job, progress or _log_progress)
+            with _transaction(conn) as c:
+                c.execute('DELETE FROM schema_migration_state WHERE job LIKE ?', (f'v{migration.version}.%',))
+                SchemaMigration._set_db_version(c, migration.version)
+
+        logger.info("数据库结构迁移完成。")
+        return LATEST_VERSION
 
     @staticmethod
-    def _migrate_to_v1(conn):
+    def _run_job(conn, migration, job, progress):
+        key = f'v{migration.version}.{job.name}'
         c = conn.cursor()
-        
-        logger.info("v1 迁移: 创建初始表结构...")
-        c.execute('''CREATE TABLE IF NOT EXISTS ideas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL, content TEXT, color TEXT DEFAULT '#4a90e2',
-            is_pinned INTEGER DEFAULT 0, is_favorite INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            category_id INTEGER, is_deleted INTEGER DEFAULT 0,
-            item_type TEXT DEFAULT 'text', data_blob BLOB,
-            content_hash TEXT
-        )''')
-        c.execute('CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL)')
-        c.execute('''CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            name TEXT NOT NULL, 
-            parent_id INTEGER, 
-            color TEXT DEFAULT "#808080",
-            sort_order INTEGER DEFAULT 0
-        )''')
-        c.execute('CREATE TABLE IF NOT EXISTS idea_tags (idea_id INTEGER, tag_id INTEGER, PRIMARY KEY (idea_id, tag_id))')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_content_hash ON ideas(content_hash)')
-        
-        # This part is for migrating from even older, pre-versioning schemas
-        logger.info("v1 迁移: 检查并添加旧版本可能缺失的列...")
-        c.execute("PRAGMA table_info(ideas)")
-        cols = [i[1] for i in c.fetchall()]
-        if 'category_id' not in cols:
-            try: c.execute('ALTER TABLE ideas ADD COLUMN category_id INTEGER')
-            except: pass
-        if 'is_deleted' not in cols:
-            try: c.execute('ALTER TABLE ideas ADD COLUMN is_deleted INTEGER DEFAULT 0')
-            except: pass
-        if 'item_type' not in cols:
-            try: c.execute("ALTER TABLE ideas ADD COLUMN item_type TEXT DEFAULT 'text'")
-            except: pass
-        if 'data_blob' not in cols:
-            try: c.execute('ALTER TABLE ideas ADD COLUMN data_blob BLOB')
-            except: pass
-        if 'content_hash' not in cols:
-            try: c.execute('ALTER TABLE ideas ADD COLUMN content_hash TEXT')
-            except: pass
-        
-        c.execute("PRAGMA table_info(categories)")
-        cat_cols = [i[1] for i in c.fetchall()]
-        if 'sort_order' not in cat_cols:
-            try: c.execute('ALTER TABLE categories ADD COLUMN sort_order INTEGER DEFAULT 0')
-            except: pass
-            
-        conn.commit()
+        c.execute('SELECT cursor FROM schema_migration_state WHERE job = ?', (key,))
+        row = c.fetchone()
+        after = row[0] if row else 0
+        if after:
+            logger.info(f"{job.description}: 从 id {after} 之后继续")
+        c.execute('SELECT COALESCE(MAX(id), 0) FROM ideas')
+        total = c.fetchone()[0]
+
+        while True:
+            with _transaction(conn) as c:
+                last = job.step(c, after, job.batch_size)
+                if last is not None:
+                    c.execute('INSERT OR REPLACE INTO schema_migration_state (job, cursor) VALUES (?, ?)', (key, last))
+            if last is None:
+                break
+            after = last
+            progress(job.description, min(after, total), total)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# data/search_index.py
+"""
+全文检索索引 (SQLite FTS5)
+
+ideas_fts 的 rowid 与 ideas.id 一一对应，包含 title / content / tags 三列，
+其中 tags 是该笔记所有标签名以空格拼接的结果。索引由触发器自动维护，
+业务代码无需关心同步问题。
+
+笔记与标签以中文为主，中文没有空格分词，因此优先使用 trigram 分词器：
+任意长度 >= 3 的子串都可以走索引；更短的查询词回退为对索引表的 LIKE 匹配，
+召回结果与原先的 LIKE '%x%' 一致。
+"""
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'ideas_fts'
+TRIGRAM_MIN_LEN = 3
+
+
+def _detect_trigram():
+    """trigram 分词器需要 SQLite 3.34+"""
+    try:
+        conn = sqlite3.connect(':memory:')
+        try:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+            return True
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+USE_TRIGRAM = _detect_trigram()
+FTS_TOKENIZER = 'trigram' if USE_TRIGRAM else 'unicode61'
+
+# 某条笔记当前所有标签名拼接 (供触发器与回填使用)
+_TAGS_OF = "(SELECT COALESCE(group_concat(t.name, ' '), '') FROM idea_tags it JOIN tags t ON t.id = it.tag_id WHERE it.idea_id = {iid})"
+
+_TRIGGERS = {
+    'trg_fts_idea_insert': f'''
+        CREATE TRIGGER trg_fts_idea_insert AFTER INSERT ON ideas BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, content, tags)
+            VALUES (new.id, new.title, COALESCE(new.content, ''), {_TAGS_OF.format(iid='new.id')});
+        END''',
+    'trg_fts_idea_update': f'''
+        CREATE TRIGGER trg_fts_idea_update AFTER UPDATE OF title, content ON ideas BEGIN
+            UPDATE {FTS_TABLE} SET title = new.title, content = COALESCE(new.content, '') WHERE rowid = new.id;
+        END''',
+    'trg_fts_idea_delete': f'''
+        CREATE TRIGGER trg_fts_idea_delete AFTER DELETE ON ideas BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END''',
+    'trg_fts_tag_link_insert': f'''
+        CREATE TRIGGER trg_fts_tag_link_insert AFTER INSERT ON idea_tags BEGIN
+            UPDATE {FTS_TABLE} SET tags = {_TAGS_OF.format(iid='new.idea_id')} WHERE rowid = new.idea_id;
+        END''',
+    'trg_fts_tag_link_delete': f'''
+        CREATE TRIGGER trg_fts_tag_link_delete AFTER DELETE ON idea_tags BEGIN
+            UPDATE {FTS_TABLE} SET tags = {_TAGS_OF.format(iid='old.idea_id')} WHERE rowid = old.idea_id;
+        END''',
+    'trg_fts_tag_link_update': f'''
+        CREATE TRIGGER trg_fts_tag_link_update AFTER UPDATE ON idea_tags BEGIN
+            UPDATE {FTS_TABLE} SET tags = {_TAGS_OF.format(iid='old.idea_id')} WHERE rowid = old.idea_id;
+            UPDATE {FTS_TABLE} SET tags = {_TAGS_OF.format(iid='new.idea_id')} WHERE rowid = new.idea_id;
+        END''',
+    'trg_fts_tag_rename': f'''
+        CREATE TRIGGER trg_fts_tag_rename AFTER UPDATE OF name ON tags BEGIN
+            UPDATE {FTS_TABLE} SET tags = {_TAGS_OF.format(iid=f'{FTS_TABLE}.rowid')}
+            WHERE rowid IN (SELECT idea_id FROM idea_tags WHERE tag_id = new.id);
+        END''',
+}
+
+
+def ensure_search_index(c):
+    """创建 FTS5 表与同步触发器；已有数据由 backfill_search_index 分批回填"""
+    c.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,))
+    row = c.fetchone()
+    if row and f"tokenize='{FTS_TOKENIZER}'" not in row[0]:
+        # 旧版本使用的是按词分词的索引，重建为当前分词器
+        logger.info(f"全文索引分词器切换为 {FTS_TOKENIZER}，重建索引")
+        c.execute(f"DROP TABLE {FTS_TABLE}")
+
+    c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, content, tags, tokenize='{FTS_TOKENIZER}')")
+
+    for name, sql in _TRIGGERS.items():
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?", (name,))
+        if c.fetchone() is None:
+            c.execute(sql)
+
+
+def backfill_search_index(c, after_id, limit):
+    """把 id > after_id 的一批笔记中尚未进入索引的写入全文索引，返回本批最后一个 id (无剩余行时返回 None)"""
+    c.execute('SELECT MAX(id) FROM (SELECT id FROM ideas WHERE id > ? ORDER BY id LIMIT ?)', (after_id, limit))
+    last = c.fetchone()[0]
+    if last is None:
+        return None
+    c.execute(f'''
+        INSERT INTO {FTS_TABLE} (rowid, title, content, tags)
+        SELECT i.id, i.title, COALESCE(i.content, ''), {_TAGS_OF.format(iid='i.id')}
+        FROM ideas i
+        WHERE i.id > ? AND i.id <= ? AND NOT EXISTS (SELECT 1 FROM {FTS_TABLE} WHERE rowid = i.id)
+    ''', (after_id, last))
+    return last
+
+
+def rebuild_search_index(c):
+    """清空并根据 ideas / tags 重新生成全文索引"""
+    c.execute(f"DELETE FROM {FTS_TABLE}")
+    c.execute(f'''
+        INSERT INTO {FTS_TABLE} (rowid, title, content, tags)
+        SELECT i.id, i.title, COALESCE(i.content, ''), {_TAGS_OF.format(iid='i.id')}
+        FROM ideas i
+    ''')
+    logger.info(f"全文索引已回填 {c.rowcount} 条记录")
+
+
+def _quote(term):
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+def build_match_query(text):
+    """
+    将用户输入转换为 FTS5 MATCH 表达式 (仅包含可走索引的词)。
+    按空白拆词，多个词之间为 AND 关系：
+    - trigram 模式：长度 >= 3 的词作为子串短语匹配，更短的词不在此处理
+    - unicode61 模式：每个词作为前缀匹配
+    没有可用词时返回 None。
+    """
+    terms = [t for t in (text or '').split() if t]
+    if USE_TRIGRAM:
+        terms = [t for t in terms if len(t) >= TRIGRAM_MIN_LEN]
+        parts = [_quote(t) for t in terms]
+    else:
+        parts = [_quote(t) + '*' for t in terms]
+    return ' '.join(parts) if parts else None
+
+
+def search_condition(text, alias='i'):
+    """
+    返回 (SQL 片段, 参数列表)，可直接拼接在 WHERE 之后。
+    输入为空时返回 (None, [])。
+    """
+    terms = [t for t in (text or '').split() if t]
+    if not terms:
+        return None, []
+
+    conds, params = [], []
+    match = build_match_query(text)
+    if match is not None:
+        conds.append(f"{alias}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)")
+        params.append(match)
+
+    if USE_TRIGRAM:
+        # 过短的词无法组成 trigram，回退为对索引表的子串匹配
+        for t in terms:
+            if len(t) >= TRIGRAM_MIN_LEN:
+                continue
+            like = '%' + t.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            conds.append(
+                f"{alias}.id IN (SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE title LIKE ? ESCAPE '\\' OR content LIKE ? ESCAPE '\\' OR tags LIKE ? ESCAPE '\\')"
+            )
+            params.extend([like] * 3)
+
+    return ' AND '.join(conds), params
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# data/tag_cache.py
+import json
+import threading
+
+
+class TagCache:
+    """
+    标签名 -> id 的内存字典，供写路径使用 (必须在写事务内调用)。
+
+    一致性保证：
+    - rename_tag / delete_tag 通过 invalidate() 主动剔除相关条目
+    - 写事务回滚时由连接管理器回调 clear()，避免缓存未提交的新 id
+    - 每次使用前检查写连接的 PRAGMA data_version，其他连接 (或其他进程)
+      提交过修改时整体清空
+    """
+    def __init__(self):
+        self._ids = {}
+        self._data_version = None
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+    def invalidate(self, *names):
+        with self._lock:
+            for name in names:
+                self._ids.pop(name, None)
+
+    def _check_version(self, c):
+        version = c.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._data_version:
+            self._ids.clear()
+            self._data_version = version
+
+    def resolve(self, c, names):
+        """
+        返回 {name: id}，不存在的标签会被创建。
+        全部命中缓存时不产生任何 SQL；否则只需一次 executemany + 一次查询。
+        """
+        names = list(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+        if not names:
+            return {}
+        with self._lock:
+            self._check_version(c)
+            missing = [n for n in names if n not in self._ids]
+            if missing:
+                c.executemany('INSERT OR IGNORE INTO tags (name) VALUES (?)', [(n,) for n in missing])
+                c.execute('SELECT name, id FROM tags WHERE name IN (SELECT value FROM json_each(?))',
+                          (json.dumps(missing),))
+                self._ids.update(c.fetchall())
+            return {n: self._ids[n] for n in names}
+
+    def lookup(self, c, name):
+        """只查询不创建，标签不存在时返回 None"""
+        with self._lock:
+            self._check_version(c)
+            if name in self._ids:
+                return self._ids[name]
+            row = c.execute('SELECT id FROM tags WHERE name=?', (name,)).fetchone()
+            if row:
+                self._ids[name] = row[0]
+            return row[0] if row else None
@@ -1,2 +1,189 @@
-﻿# -*- coding: utf-8 -*-
-# services/backup_service.pyimport osimport shutilfrom datetime import datetimefrom core.config import DB_NAME, BACKUP_DIRclass BackupService:    @staticmethod    def run_backup():        """执行数据库备份并清理旧文件"""        if not os.path.exists(BACKUP_DIR):            os.makedirs(BACKUP_DIR)                if os.path.exists(DB_NAME):            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')            target = os.path.join(BACKUP_DIR, f'ideas_{timestamp}.db')            try:                shutil.copy2(DB_NAME, target)                BackupService._clean_old_backups()                print(f"[System] Backup created: {target}")            except Exception as e:                print(f"[System] Backup failed: {e}")    @staticmethod    def _clean_old_backups(keep=20):        try:            files = sorted(                [os.path.join(BACKUP_DIR, f) for f in os.listdir(BACKUP_DIR)],                key=os.path.getmtime            )            while len(files) > keep:                os.remove(files.pop(0))        except Exception:            pass
\ No newline at end of file
+# -*- coding: utf-8 -*-
+# services/backup_service.py
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from PyQt5.QtCore import QObject, pyqtSignal
+from core.config import (DB_NAME, BACKUP_DIR, BACKUP_KEEP, BACKUP_INTERVAL_S, BACKUP_FULL_INTERVAL_S,
+                         BACKUP_STEP_PAGES, BACKUP_STEP_SLEEP_S)
+from data.backup import DELTA_SUFFIX, JournalGap, online_backup, write_delta, backup_info, trim_journal
+from data.backup_repository import BackupRepository
+
+logger = logging.getLogger(__name__)
+
+
+class BackupService(QObject):
+    """
+    后台数据库备份：
+    - 在后台线程中用 SQLite 在线备份 API 分步复制，写操作照常进行，界面不等待
+    - 每隔 full_interval_s 做一次完整快照；其间每隔 interval_s (以及退出时) 只把上次备份之后
+      变更的行写入增量文件，没有变更时不生成文件
+    - progress(copied, total) 报告完整快照的复制进度，finished(path, error) 在完成或失败时发出 (成功时 error 为空)
+    - 备份存入去重压缩的备份仓库 (data/backup_repository.py)，相邻备份共享未变化的数据块
+    - 只保留最近 keep 份完整快照及其之后的增量，不再被引用的数据块随之清理
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str, str)
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, db_path=DB_NAME, backup_dir=BACKUP_DIR, interval_s=BACKUP_INTERVAL_S,
+                 full_interval_s=BACKUP_FULL_INTERVAL_S, keep=BACKUP_KEEP, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.interval_s = interval_s
+        self.full_interval_s = full_interval_s
+        self.keep = keep
+        self.repo = BackupRepository(backup_dir)
+        self._last_run = 0
+        self._wake = threading.Event()
+        self._requested = False
+        self._stopping = False
+        self._thread = None
+
+    @classmethod
+    def instance(cls):
+        """获取进程内共享的备份服务 (首次调用须在 GUI 线程)"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='backup', daemon=True)
+            self._thread.start()
+
+    def request_backup(self):
+        """立即在后台执行一次备份"""
+        self._requested = True
+        self.start()
+        self._wake.set()
+
+    def shutdown(self, final_backup=True, timeout=None):
+        """退出程序、关闭数据库前调用：可选地再备份一次，等待正在进行的备份完成后停止线程"""
+        if final_backup:
+            self._requested = True
+            self.start()
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("等待备份完成超时")
+
+    def _loop(self):
+        self._import_legacy()
+        while True:
+            if not self._requested and not self._stopping:
+                self._wake.wait(self._seconds_until_due())
+                self._wake.clear()
+            if self._requested or (not self._stopping and self._seconds_until_due() <= 0):
+                self._requested = False
+                self.backup_now()
+            if self._stopping and not self._requested:
+                return
+
+    def _import_legacy(self):
+        """把旧版本直接保存在备份目录中的 ideas_*.db 备份文件导入仓库"""
+        try:
+            names = [f for f in os.listdir(self.backup_dir) if f.startswith('ideas_') and f.endswith('.db')]
+        except OSError:
+            return
+        for path in sorted((os.path.join(self.backup_dir, f) for f in names), key=os.path.getmtime):
+            try:
+                self.repo.import_file(path)
+                logger.info(f"已导入旧备份: {path}")
+            except Exception as e:
+                logger.warning(f"导入旧备份失败 {path}: {e}")
+
+    def _seconds_until_due(self):
+        manifests = self.repo.manifests()
+        last = max([self._last_run] + [m['created'] for m in manifests[-1:]])
+        return max(0, self.interval_s - (time.time() - last))
+
+    def _name(self, suffix):
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name, n = f'ideas_{timestamp}{suffix}', 1
+        existing = {m['name'] for m in self.repo.manifests()}
+        while name in existing:
+            name, n = f'ideas_{timestamp}_{n}{suffix}', n + 1
+        return name
+
+    def backup_now(self, full=False):
+        """在当前线程执行一次备份 (需要时自动改为完整快照)，返回备份名称 (失败时返回 None)"""
+        if not os.path.exists(self.db_path):
+            return None
+        os.makedirs(self.backup_dir, exist_ok=True)
+        self._last_run = time.time()
+        try:
+            name = None if full else self._incremental()
+            if name is None:
+                name = self._snapshot()
+                self._clean_old_backups(self.keep)
+        except Exception as e:
+            logger.warning(f"备份失败: {e}")
+            self.finished.emit('', str(e))
+            return None
+        self.finished.emit(name, '')
+        return name
+
+    def _snapshot(self):
+        """在线备份到临时文件，再切块存入仓库"""
+        name = self._name('.db')
+        tmp = os.path.join(self.backup_dir, name)
+        started = time.monotonic()
+        try:
+            online_backup(self.db_path, tmp, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP_S,
+                          progress=self.progress.emit)
+            manifest = self.repo.add_file(tmp, name, kind='full', version=backup_info(tmp)['version'])
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        logger.info(f"完整备份完成: {name} ({manifest['size'] / 1048576:.1f} MB，新增数据块 "
+                    f"{manifest['new_bytes'] / 1048576:.1f} MB，{time.monotonic() - started:.1f} 秒)")
+        return name
+
+    def _incremental(self):
+        """在最近一份备份之后写增量；需要完整快照时返回 None，没有变更时返回最近一份备份"""
+        manifests = self.repo.manifests()
+        fulls = [m for m in manifests if m['kind'] == 'full']
+        if not fulls or time.time() - fulls[-1]['created'] >= self.full_interval_s:
+            return None
+        head = manifests[-1]
+        if head['version'] is None:
+            # 变更日志出现之前的旧快照，无法作为增量的起点
+            return None
+        name = self._name(DELTA_SUFFIX)
+        tmp = os.path.join(self.backup_dir, name)
+        try:
+            new_version, rows = write_delta(self.db_path, tmp, head['version'], head['name'])
+            if new_version == head['version']:
+                return head['name']
+            manifest = self.repo.add_file(tmp, name, kind='delta', version=new_version,
+                                          from_version=head['version'], parent=head['name'])
+        except JournalGap as e:
+            logger.info(f"{e}，改为完整备份")
+            return None
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        logger.info(f"增量备份完成: {name} (v{head['version']} -> v{new_version}, {rows} 行, "
+                    f"新增 {manifest['new_bytes'] / 1024:.0f} KB)")
+        return name
+
+    def _clean_old_backups(self, keep):
+        """只保留最近 keep 份完整快照及其后的增量，并清理最新快照已包含的变更日志"""
+        try:
+            oldest, manifests, chunks = self.repo.gc(keep)
+            if manifests:
+                logger.info(f"清理旧备份: {manifests} 份备份、{chunks} 个数据块")
+            latest = [m for m in self.repo.manifests() if m['kind'] == 'full'][-1]
+            if latest['version']:
+                trim_journal(self.db_path, latest['version'])
+        except Exception as e:
+            logger.warning(f"清理旧备份失败: {e}")
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# services/capture_queue.py
+import logging
+import threading
+import time
+from PyQt5.QtCore import QObject, pyqtSignal
+from core.config import CAPTURE_FLUSH_MS, CAPTURE_BATCH_MAX
+from services.hash_calculator import HashCalculator
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureEntry:
+    """一条待写入的剪贴板采集"""
+    def __init__(self, item_type, content, data_blob, category_id, tags, content_hash, on_saved):
+        self.item_type = item_type
+        self.content = content
+        self.data_blob = data_blob
+        self.category_id = category_id
+        self.tags = list(tags or [])
+        self.content_hash = content_hash
+        self.on_saved = on_saved
+        self.queued_at = time.monotonic()
+
+    def as_row(self):
+        return (self.item_type, self.content, self.data_blob, self.category_id, self.tags, self.content_hash)
+
+
+class CaptureQueue(QObject):
+    """
+    剪贴板采集的后台写入队列 (合并提交)：
+    - enqueue() 只把采集放入队列，立即返回，GUI 线程不再等待磁盘提交
+    - 未提供 content_hash 的采集 (图片) 在写入线程计算摘要，GUI 线程不再对整张图片做哈希
+    - 写入线程收到第一条采集后最多等待 CAPTURE_FLUSH_MS，把期间到达的采集合并为一个事务提交
+      (最多 CAPTURE_BATCH_MAX 条)，连续采集时每秒只需少量几次提交
+    - 提交结果 (idea_id, is_new) 通过 Qt 信号回到 GUI 线程，再调用 on_saved
+    - 新图片提交后交给缩略图线程生成缩略图
+    - 写入线程启动时先加载内容哈希过滤器，新内容无需按哈希查库
+    - flush() 等待队列写完 (退出程序、关闭数据库前调用)
+    """
+    _committed = pyqtSignal(object)  # [(entry, result)]
+
+    def __init__(self, db_manager, thumbnails=None, flush_ms=CAPTURE_FLUSH_MS,
+                 batch_max=CAPTURE_BATCH_MAX, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self.thumbnails = thumbnails
+        self.hasher = HashCalculator()
+        self._latency = max(0, flush_ms) / 1000.0
+        self._batch_max = max(1, batch_max)
+        self._pending = []
+        self._busy = False
+        self._flushing = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._committed.connect(self._deliver)
+        self._thread = threading.Thread(target=self._loop, name='capture-writer', daemon=True)
+        self._thread.start()
+
+    def enqueue(self, item_type, content, data_blob=None, category_id=None, tags=None,
+                content_hash=None, on_saved=None):
+        """放入一条采集；on_saved(idea_id, is_new) 在提交后于 GUI 线程调用"""
+        entry = CaptureEntry(item_type, content, data_blob, category_id, tags, content_hash, on_saved)
+        with self._cond:
+            if not self._closed:
+                self._pending.append(entry)
+                self._cond.notify_all()
+                return
+        # 队列已关闭 (正在退出)：直接同步写入
+        self._deliver(self._save([entry]))
+
+    def flush(self, timeout=None):
+        """立即提交队列中的采集并等待写完，返回是否在超时前写完"""
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+            finally:
+                self._flushing -= 1
+
+    def shutdown(self, timeout=None):
+        """写完剩余采集并停止写入线程"""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        """阻塞直到凑满一批、最早一条等待超时、或被要求立即提交；队列关闭且为空时返回 None"""
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            deadline = self._pending[0].queued_at + self._latency
+            while len(self._pending) < self._batch_max and not self._flushing and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self._batch_max]
+            del self._pending[:self._batch_max]
+            self._busy = True
+            return batch
+
+    def _loop(self):
+        try:
+            self.db.warm_hash_filter()
+        except Exception as e:
+            logger.warning(f"加载内容哈希过滤器失败: {e}")
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                done = self._save(batch)
+                self._committed.emit(done)
+                self._make_thumbnails(done)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _save(self, batch):
+        """整批写入一个事务；失败时逐条重试，避免一条坏数据拖累整批"""
+        # 摘要在事务之外计算，不占用写连接
+        for entry in batch:
+            if entry.content_hash is None:
+                entry.content_hash = self.hasher.compute(entry.content, entry.data_blob)
+        try:
+            results = self.db.add_clipboard_items([e.as_row() for e in batch])
+            return list(zip(batch, results))
+        except Exception as e:
+            if len(batch) == 1:
+                logger.warning(f"保存剪贴板采集失败: {e}")
+                return [(batch[0], None)]
+            logger.warning(f"合并提交 {len(batch)} 条采集失败，改为逐条写入: {e}")
+        done = []
+        for entry in batch:
+            done.extend(self._save([entry]))
+        return done
+
+    def _make_thumbnails(self, done):
+        if not self.thumbnails:
+            return
+        for entry, result in done:
+            if result and result[1] and entry.item_type == 'image':
+                self.thumbnails.request(entry.data_blob, entry.content_hash)
+
+    def _deliver(self, done):
+        for entry, result in done:
+            if result and entry.on_saved:
+                try:
+                    entry.on_saved(*result)
+                except Exception as e:
+                    logger.warning(f"处理采集结果失败: {e}")
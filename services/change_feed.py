@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# services/change_feed.py
+import logging
+import threading
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from core.config import CHANGE_POLL_MS
+from data.change_journal import JournalGap
+from services.db_worker import DbWorker
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed(QObject):
+    """
+    数据变更通知 (界面增量刷新的依据)：
+    - 定时检查 PRAGMA data_version，只有本进程的写操作、后台线程或其他进程提交过修改时才查询变更日志
+    - 检查与读取变更日志都在后台查询线程执行 (DbWorker)，GUI 线程只处理结果
+    - changed(ChangeSet) 携带上次通知之后变更过的行 (见 data/change_journal.py)；
+      日志已被清理而无法得知具体变更时发出 changed(None)，订阅方应整体重新加载
+    - 只修改了未跟踪的表 (缩略图、图片编码等) 时变更为空，不发出通知
+    - 本进程写入后调用 notify() 尽快通知，不必等到下一次定时检查
+    只能在 GUI 线程使用。
+    """
+    changed = pyqtSignal(object)
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, db_manager, interval_ms=CHANGE_POLL_MS, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self.db_worker = DbWorker.instance()
+        self.version = db_manager.current_version()
+        self._data_version = db_manager.data_version()
+        self._request = None
+        self._recheck = False
+        self._force = False
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.check)
+        self._timer.start(interval_ms)
+
+    @classmethod
+    def instance(cls, db_manager=None):
+        """获取进程内共享的变更通知 (首次调用须在 GUI 线程并提供 db_manager)"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(db_manager)
+            return cls._instance
+
+    def stop(self):
+        self._timer.stop()
+        self.db_worker.cancel('change_feed')
+        self._request = None
+
+    def notify(self):
+        """本进程写操作之后调用：立即检查并通知；没有读到任何变更时也发出 changed(None)，保证界面刷新"""
+        self._force = True
+        self.check()
+
+    def check(self):
+        """在后台线程检查是否有新的提交，有变更时回到 GUI 线程通知；上一次检查未完成时完成后再检查一次"""
+        if self._request is not None:
+            self._recheck = True
+            return
+        self._request = self.db_worker.submit('change_feed', self._read, self.version, self._data_version,
+                                              on_done=self._on_read, on_error=self._on_read_error)
+
+    def _read(self, version, last_data_version):
+        """后台线程：返回 (data_version, 新的日志版本, ChangeSet)；没有新提交时 ChangeSet 为 False，日志缺口时为 None"""
+        data_version = self.db.data_version()
+        if data_version == last_data_version:
+            return data_version, version, False
+        try:
+            changes = self.db.changes_since(version)
+        except JournalGap as e:
+            logger.info(f"{e}，整体刷新")
+            return data_version, self.db.current_version(), None
+        return data_version, changes.version, changes
+
+    def _on_read(self, result):
+        self._request = None
+        self._data_version, self.version, changes = result
+        force, self._force = self._force, False
+        if changes is None or changes:
+            self.changed.emit(changes)
+        elif force:
+            self.changed.emit(None)
+        self._check_again()
+
+    def _on_read_error(self, _error):
+        # 错误已由 DbWorker 记录日志
+        self._request = None
+        if self._force:
+            self._force = False
+            self.changed.emit(None)
+        self._check_again()
+
+    def _check_again(self):
+        if self._recheck:
+            self._recheck = False
+            self.check()
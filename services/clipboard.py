@@ -3,10 +3,12 @@
 import datetime
 import os
 import uuid
-import hashlib
 from PyQt5.QtCore import QObject, pyqtSignal, QBuffer
 from PyQt5.QtGui import QImage
 from PyQt5.QtWidgets import QApplication
+from services.thumbnail_service import ThumbnailWorker
+from services.capture_queue import CaptureQueue
+from services.hash_calculator import HashCalculator
 
 class ClipboardManager(QObject):
     """
@@ -17,13 +19,23 @@ class ClipboardManager(QObject):
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
+        self.thumbnails = ThumbnailWorker.instance(db_manager)
+        self.hasher = HashCalculator()
+        # 采集写入走后台合并提交，GUI 线程不等待磁盘
+        self.queue = CaptureQueue(db_manager, self.thumbnails, parent=self)
         self._last_hash = None
 
-    def _hash_data(self, data):
-        """为数据创建一个简单的哈希值以检查重复。"""
-        if isinstance(data, QImage):
-            return hash(data.bits().tobytes())
-        return hashlib.md5(str(data).encode('utf-8')).hexdigest()
+    def _on_saved(self, idea_id, is_new):
+        if is_new:
+            self.data_captured.emit(idea_id)
+
+    def flush(self):
+        """写完队列中尚未提交的采集 (退出程序、关闭数据库前调用)"""
+        self.queue.shutdown()
+
+    def _hash_data(self, text):
+        """文本 (及文件路径) 的摘要：既用于识别连续重复的剪贴板事件，也作为 content_hash 写入数据库"""
+        return self.hasher.compute(text)
 
     def process_clipboard(self, mime_data, category_id=None):
         """
@@ -57,16 +69,10 @@ class ClipboardManager(QObject):
                                 if ext:
                                     extra_tags.add(ext)
 
-                        result = self.db.add_clipboard_item(item_type='file', content=content, category_id=category_id)
+                        # 【应用智能标签】新建笔记时随采集一起写入
+                        self.queue.enqueue('file', content, category_id=category_id, tags=extra_tags,
+                                           content_hash=current_hash, on_saved=self._on_saved)
                         self._last_hash = current_hash
-                        
-                        if result:
-                            idea_id, is_new = result
-                            if is_new:
-                                # 【应用智能标签】
-                                if extra_tags:
-                                    self.db.add_tags_to_multiple_ideas([idea_id], list(extra_tags))
-                                self.data_captured.emit(idea_id)
                         return
 
             # --- 处理图片 ---
@@ -77,17 +83,13 @@ class ClipboardManager(QObject):
                 image.save(buffer, "PNG")
                 image_bytes = buffer.data()
                 
-                current_hash = hashlib.md5(image_bytes).hexdigest()
-                
-                if current_hash != self._last_hash:
-                    result = self.db.add_clipboard_item(item_type='image', content='[Image Data]', data_blob=image_bytes, category_id=category_id)
-                    self._last_hash = current_hash
-                    
-                    if result:
-                        idea_id, is_new = result
-                        if is_new:
-                            self.data_captured.emit(idea_id)
-                    return
+                image_bytes = bytes(image_bytes)
+                # 图片的摘要由写入线程计算 (见 CaptureQueue)，重复的图片在写入时按 content_hash 去重；
+                # 缩略图在提交后由缩略图线程生成，列表渲染无需再解码原图
+                self.queue.enqueue('image', '[Image Data]', data_blob=image_bytes, category_id=category_id,
+                                   on_saved=self._on_saved)
+                self._last_hash = None
+                return
 
             # --- 处理文本 (含网址识别) ---
             if mime_data.hasText():
@@ -103,16 +105,10 @@ class ClipboardManager(QObject):
                         extra_tags.add("网址")
                         extra_tags.add("链接")
                     
-                    result = self.db.add_clipboard_item(item_type='text', content=text, category_id=category_id)
+                    # 【应用智能标签】新建笔记时随采集一起写入
+                    self.queue.enqueue('text', text, category_id=category_id, tags=extra_tags,
+                                       content_hash=current_hash, on_saved=self._on_saved)
                     self._last_hash = current_hash
-                    
-                    if result:
-                        idea_id, is_new = result
-                        if is_new:
-                            # 【应用智能标签】
-                            if extra_tags:
-                                self.db.add_tags_to_multiple_ideas([idea_id], list(extra_tags))
-                            self.data_captured.emit(idea_id)
                     return
 
         except Exception as e:
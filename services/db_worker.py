@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# services/db_worker.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+from core.config import DB_WORKER_THREADS
+from data.query_cancel import CancelToken, QueryCancelled, cancel_scope
+
+logger = logging.getLogger(__name__)
+
+
+class DbRequest:
+    """一次后台查询请求"""
+    def __init__(self, channel, fn, args, kwargs, on_done, on_error):
+        self.channel = channel
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_error = on_error
+        self.token = CancelToken()
+
+    @property
+    def cancelled(self):
+        return self.token.cancelled
+
+    def cancel(self):
+        """作废请求；正在执行的 SQL 会被 interrupt() 立即中止"""
+        self.token.cancel()
+
+
+class DbWorker(QObject):
+    """
+    后台数据库查询线程：
+    - submit() 把查询函数放入队列，由后台线程执行 (只读查询走只读连接池，不阻塞 GUI 线程)
+    - 结果通过 Qt 信号回到 GUI 线程，再调用 on_done / on_error
+    - 每个请求属于一个 channel (如 'main_list')，同一 channel 提交新请求时旧请求作废：
+      尚未开始的直接跳过，正在执行的查询通过 Connection.interrupt() 中止
+    submit / cancel 只能在 GUI 线程调用。
+    """
+    _finished = pyqtSignal(object, object, object)  # request, result, error
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_workers=DB_WORKER_THREADS, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='db-worker')
+        self._latest = {}
+        self._closed = False
+        self._finished.connect(self._deliver)
+
+    @classmethod
+    def instance(cls):
+        """获取进程内共享的查询线程 (首次调用须在 GUI 线程)"""
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance._closed:
+                cls._instance = cls()
+            return cls._instance
+
+    def submit(self, channel, fn, *args, on_done=None, on_error=None, **kwargs):
+        """提交查询，返回 DbRequest (可调用 cancel())"""
+        self.cancel(channel)
+        request = DbRequest(channel, fn, args, kwargs, on_done, on_error)
+        if self._closed:
+            request.cancel()
+            return request
+        self._latest[channel] = request
+        self._executor.submit(self._run, request)
+        return request
+
+    def cancel(self, channel):
+        request = self._latest.pop(channel, None)
+        if request:
+            request.cancel()
+
+    def _run(self, request):
+        if request.cancelled:
+            return
+        try:
+            with cancel_scope(request.token):
+                result, error = request.fn(*request.args, **request.kwargs), None
+        except QueryCancelled:
+            return
+        except Exception as e:
+            result, error = None, e
+        if not request.cancelled:
+            self._finished.emit(request, result, error)
+
+    def _deliver(self, request, result, error):
+        if self._latest.get(request.channel) is request:
+            del self._latest[request.channel]
+        if request.cancelled:
+            return
+        if error is not None:
+            logger.warning(f"后台查询失败 [{request.channel}]: {error}")
+            if request.on_error:
+                request.on_error(error)
+        elif request.on_done:
+            request.on_done(result)
+
+    def shutdown(self):
+        """作废所有请求并等待正在执行的查询结束 (退出程序、关闭数据库前调用)"""
+        self._closed = True
+        for channel in list(self._latest):
+            self.cancel(channel)
+        self._executor.shutdown(wait=True)
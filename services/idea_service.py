@@ -32,21 +32,23 @@ class IdeaService:
     def toggle_pinned(self, idea_id):
         self.idea_repo.toggle_field(idea_id, 'is_pinned')
 
+    def toggle_favorites(self, idea_ids):
+        if idea_ids: self.idea_repo.toggle_field_many(idea_ids, 'is_favorite')
+
+    def toggle_pins(self, idea_ids):
+        if idea_ids: self.idea_repo.toggle_field_many(idea_ids, 'is_pinned')
+
     def move_to_trash(self, idea_ids):
-        for iid in idea_ids:
-            self.idea_repo.set_deleted(iid, True)
+        if idea_ids: self.idea_repo.set_deleted_many(idea_ids, True)
     
     def restore_from_trash(self, idea_ids):
-        for iid in idea_ids:
-            self.idea_repo.set_deleted(iid, False)
+        if idea_ids: self.idea_repo.set_deleted_many(idea_ids, False)
 
     def delete_permanently(self, idea_ids):
-        for iid in idea_ids:
-            self.idea_repo.delete_permanent(iid)
+        if idea_ids: self.idea_repo.delete_permanent_many(idea_ids)
 
     def move_to_category(self, idea_ids, category_id):
-        for iid in idea_ids:
-            self.idea_repo.move_category(iid, category_id)
+        if idea_ids: self.idea_repo.move_category_many(idea_ids, category_id)
 
     # --- Pass-through methods to repositories ---
     
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# services/image_storage.py
+import logging
+import math
+import threading
+from PyQt5.QtCore import Qt, QBuffer
+from PyQt5.QtGui import QImage
+from core.config import (IMAGE_PNG_COMPRESSION, IMAGE_LOSSY_ENABLED, IMAGE_LOSSY_FORMAT,
+                         IMAGE_LOSSY_QUALITIES, IMAGE_SIZE_BUDGET, IMAGE_MIN_SAVING,
+                         IMAGE_REENCODE_IDLE_S)
+
+logger = logging.getLogger(__name__)
+
+ORIGINAL = 'original'
+
+
+def _png_quality(level):
+    """Qt 的 PNG 写入器用 quality 表示压缩级别：compression = (100 - quality) * 9 / 91"""
+    return max(0, 100 - math.ceil(level * 91 / 9))
+
+
+class ImageEncoder:
+    """
+    把采集时以默认参数保存的 PNG 重新编码为更小的数据：
+    - 无损：最高压缩级别的 PNG；不透明图片去掉 alpha 通道
+    - 有损 (可选)：无损结果仍超出大小预算、且看起来是照片的不透明图片，依次降低质量直到满足预算
+    QImage 可以在任意线程使用，编码在后台线程执行。
+    """
+    def __init__(self, png_level=IMAGE_PNG_COMPRESSION, lossy=IMAGE_LOSSY_ENABLED,
+                 lossy_format=IMAGE_LOSSY_FORMAT, lossy_qualities=IMAGE_LOSSY_QUALITIES,
+                 size_budget=IMAGE_SIZE_BUDGET, min_saving=IMAGE_MIN_SAVING):
+        self.png_level = png_level
+        self.lossy = lossy
+        self.lossy_format = lossy_format
+        self.lossy_qualities = lossy_qualities
+        self.size_budget = size_budget
+        self.min_saving = min_saving
+
+    def _encode(self, image, fmt, quality):
+        buffer = QBuffer()
+        buffer.open(QBuffer.ReadWrite)
+        image.save(buffer, fmt, quality)
+        return bytes(buffer.data())
+
+    def _is_opaque(self, image):
+        if not image.hasAlphaChannel():
+            return True
+        alpha = image.convertToFormat(QImage.Format_Alpha8)
+        width, stride = alpha.width(), alpha.bytesPerLine()
+        data = alpha.constBits().asstring(alpha.byteCount())
+        return all(data.count(255, y * stride, y * stride + width) == width for y in range(alpha.height()))
+
+    def _is_photo(self, image):
+        """缩小到 64x64 后统计颜色数：截图通常只有少量纯色，照片的颜色数接近像素数"""
+        sample = image.scaled(64, 64, Qt.IgnoreAspectRatio, Qt.FastTransformation).convertToFormat(QImage.Format_RGB32)
+        data = sample.constBits().asstring(sample.byteCount())
+        colors = {data[i:i + 4] for i in range(0, len(data), 4)}
+        return len(colors) > 1500
+
+    def reencode(self, data):
+        """返回 (新数据, 编码标识)；无法解码或收益不足时返回 (None, 'original')"""
+        image = QImage()
+        if not data or not image.loadFromData(bytes(data)):
+            return None, ORIGINAL
+
+        opaque = self._is_opaque(image)
+        if opaque and image.hasAlphaChannel():
+            image = image.convertToFormat(QImage.Format_RGB888)
+
+        best = self._encode(image, 'PNG', _png_quality(self.png_level))
+        encoding = f'png{self.png_level}'
+
+        if self.lossy and opaque and len(best) > self.size_budget and self._is_photo(image):
+            for quality in self.lossy_qualities:
+                candidate = self._encode(image, self.lossy_format, quality)
+                if candidate and len(candidate) < len(best):
+                    best, encoding = candidate, f'{self.lossy_format.lower()}{quality}'
+                if len(best) <= self.size_budget:
+                    break
+
+        if len(best) > len(data) * (1 - self.min_saving):
+            return None, ORIGINAL
+        return best, encoding
+
+
+class ImageStorageWorker:
+    """
+    后台重新编码图片的线程：逐张处理尚未重新编码的图片，每张一个短写事务。
+    主键仍是原始数据的哈希，去重、缩略图与已有引用都不受影响。
+    处理完成后等待 notify() (有新图片采集时调用) 或每隔 IMAGE_REENCODE_IDLE_S 再检查一次。
+    """
+    def __init__(self, db_manager, encoder=None, batch_size=20, idle_s=IMAGE_REENCODE_IDLE_S):
+        self.db = db_manager
+        self.encoder = encoder or ImageEncoder()
+        self.batch_size = batch_size
+        self.idle_s = idle_s
+        self._wake = threading.Event()
+        self._stopping = False
+        self._failed = set()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='image-storage', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """停止线程 (退出程序、关闭数据库前调用)；正在编码的图片处理完后退出"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stopping:
+            try:
+                hashes = [h for h in self.db.get_blobs_pending_reencode(self.batch_size + len(self._failed))
+                          if h not in self._failed][:self.batch_size]
+            except Exception as e:
+                logger.warning(f"读取待重新编码的图片失败: {e}")
+                hashes = []
+            if not hashes:
+                self._wake.wait(self.idle_s)
+                self._wake.clear()
+                continue
+
+            saved = 0
+            for content_hash in hashes:
+                if self._stopping:
+                    break
+                saved += self._process(content_hash)
+            if saved:
+                stats = self.db.get_image_storage_stats()
+                logger.info(f"图片重新编码：本批节省 {saved / 1048576:.1f} MB，"
+                            f"累计 {stats['count']} 张节省 {stats['saved_bytes'] / 1048576:.1f} MB")
+
+    def _process(self, content_hash):
+        """处理一张图片，返回节省的字节数"""
+        try:
+            data = self.db.get_blob(content_hash)
+            if not data:
+                return 0
+            new_data, encoding = self.encoder.reencode(data)
+            if self.db.save_reencoded_blob(content_hash, new_data, encoding, len(data)) and new_data is not None:
+                return len(data) - len(new_data)
+        except Exception as e:
+            # 同一进程内不再重试，避免反复处理同一张出错的图片
+            self._failed.add(content_hash)
+            logger.warning(f"重新编码图片失败 {content_hash[:12]}: {e}")
+        return 0
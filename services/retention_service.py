@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# services/retention_service.py
+import logging
+import threading
+import time
+from core.config import (RETENTION_MAX_ITEMS, RETENTION_MAX_AGE_DAYS, RETENTION_MAX_BYTES,
+                         RETENTION_KEEP_PINNED, RETENTION_KEEP_FAVORITE, RETENTION_KEEP_CATEGORIZED,
+                         RETENTION_BATCH, RETENTION_IDLE_S, RETENTION_INTERVAL_S,
+                         RETENTION_VACUUM_PAGES)
+from core.settings import load_setting
+from data.retention import RetentionPolicy, AUTO_VACUUM_INCREMENTAL
+
+logger = logging.getLogger(__name__)
+
+
+def load_retention_policy():
+    """config.py 中的默认值 (默认不限制)，可被 settings.json 的 clipboard_retention 项覆盖"""
+    values = {
+        'max_items': RETENTION_MAX_ITEMS,
+        'max_age_days': RETENTION_MAX_AGE_DAYS,
+        'max_bytes': RETENTION_MAX_BYTES,
+        'keep_pinned': RETENTION_KEEP_PINNED,
+        'keep_favorite': RETENTION_KEEP_FAVORITE,
+        'keep_categorized': RETENTION_KEEP_CATEGORIZED,
+    }
+    overrides = load_setting('clipboard_retention', {})
+    if isinstance(overrides, dict):
+        values.update(overrides)
+    return RetentionPolicy.from_dict(values)
+
+
+class RetentionWorker:
+    """
+    在空闲时执行剪贴板保留策略的后台线程：
+    - 距离上次采集 (touch()) 超过 idle_s 才开始，每批一个短写事务，批次之间让出写连接；
+      清理过程中又有新的采集时暂停，等下次空闲再继续
+    - max_bytes 的分界在按时间、条数清理完之后计算一次，之后各批只删除分界及更旧的条目
+    - 清理完成后分批增量回收空闲页；从不执行完整 VACUUM (未开启增量回收的旧数据库需由用户执行)
+    """
+    def __init__(self, db_manager, policy=None, batch_size=RETENTION_BATCH,
+                 idle_s=RETENTION_IDLE_S, interval_s=RETENTION_INTERVAL_S):
+        self.db = db_manager
+        self.policy = policy or load_retention_policy()
+        self.batch_size = batch_size
+        self.idle_s = idle_s
+        self.interval_s = interval_s
+        self._last_activity = time.monotonic()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.policy.enabled:
+            self._thread = threading.Thread(target=self._loop, name='retention', daemon=True)
+            self._thread.start()
+
+    def touch(self):
+        """有新的采集或编辑时调用，推迟清理"""
+        self._last_activity = time.monotonic()
+
+    def stop(self, timeout=None):
+        """停止线程 (退出程序、关闭数据库前调用)；正在执行的批次完成后退出"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _idle(self):
+        return not self._stopping and time.monotonic() - self._last_activity >= self.idle_s
+
+    def _loop(self):
+        while not self._stopping:
+            wait = self.idle_s - (time.monotonic() - self._last_activity)
+            if wait > 0:
+                self._wake.wait(wait)
+                continue
+            try:
+                if self.run_once():
+                    self._wake.wait(self.interval_s)
+                else:
+                    # 被新的采集打断，空闲后继续
+                    self._wake.wait(self.idle_s)
+            except Exception as e:
+                logger.warning(f"执行剪贴板保留策略失败: {e}")
+                self._wake.wait(self.interval_s)
+
+    def run_once(self):
+        """执行一轮清理与空间回收，返回是否完成 (中途变为非空闲时返回 False)"""
+        deleted, cutoff = 0, None
+        while self._idle():
+            n = self.db.purge_clipboard_history(self.policy, self.batch_size, cutoff)
+            if not n:
+                if cutoff is not None:
+                    break
+                cutoff = self.db.get_clipboard_byte_cutoff(self.policy)
+                if cutoff is None:
+                    break
+                continue
+            deleted += n
+            time.sleep(0.05)
+        if deleted:
+            logger.info(f"剪贴板保留策略：清理 {deleted} 条")
+        if not self._idle():
+            return False
+        self._reclaim()
+        return self._idle()
+
+    def _reclaim(self):
+        stats = self.db.get_space_stats()
+        if not stats['free_pages']:
+            return
+        if stats['auto_vacuum'] != AUTO_VACUUM_INCREMENTAL:
+            # 完整 VACUUM 会长时间占用写连接，不在后台自动执行
+            logger.debug(f"数据库有 {stats['free_pages']}/{stats['page_count']} 个空闲页，未开启增量回收，需手动整理数据库")
+            return
+        freed = 0
+        while self._idle():
+            n = self.db.reclaim_space(RETENTION_VACUUM_PAGES)
+            if not n:
+                break
+            freed += n
+            time.sleep(0.05)
+        if freed:
+            logger.info(f"增量回收 {freed} 个空闲页")
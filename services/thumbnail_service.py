@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# services/thumbnail_service.py
+import logging
+import threading
+from PyQt5.QtCore import QObject, Qt, QBuffer, pyqtSignal
+from PyQt5.QtGui import QImage
+from core.config import THUMB_CARD_HEIGHT, THUMB_CARD_MAX_WIDTH, THUMB_LIST_SIZE, THUMB_BACKFILL_BATCH
+from data.blob_store import blob_hash
+
+logger = logging.getLogger(__name__)
+
+THUMB_CARD = 'card'
+THUMB_LIST = 'list'
+
+
+class ThumbnailService:
+    """
+    生成并缓存图片缩略图：
+    - card: 主界面卡片 (最大 400x160)
+    - list: 快速窗口列表图标 (120x90)
+    缩略图按原图内容哈希存储，相同图片只生成一次。
+    """
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def _encode(self, image):
+        buffer = QBuffer()
+        buffer.open(QBuffer.ReadWrite)
+        # 不透明图片用 JPG 更小，有透明通道时保留 PNG
+        fmt = "PNG" if image.hasAlphaChannel() else "JPG"
+        image.save(buffer, fmt, 85 if fmt == "JPG" else -1)
+        return bytes(buffer.data())
+
+    def make_thumbnails(self, image_bytes):
+        """返回 {size_key: bytes}；无法解码的图片返回空 bytes"""
+        image = QImage()
+        if not image_bytes or not image.loadFromData(bytes(image_bytes)):
+            return {THUMB_CARD: b'', THUMB_LIST: b''}
+
+        card = image
+        if card.height() > THUMB_CARD_HEIGHT:
+            card = card.scaledToHeight(THUMB_CARD_HEIGHT, Qt.SmoothTransformation)
+        if card.width() > THUMB_CARD_MAX_WIDTH:
+            card = card.scaledToWidth(THUMB_CARD_MAX_WIDTH, Qt.SmoothTransformation)
+
+        list_w, list_h = THUMB_LIST_SIZE
+        icon = image
+        if image.width() > list_w or image.height() > list_h:
+            icon = image.scaled(list_w, list_h, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+        return {THUMB_CARD: self._encode(card), THUMB_LIST: self._encode(icon)}
+
+    def generate(self, image_bytes, content_hash=None):
+        """为一张刚保存的图片生成缩略图 (采集/保存时调用)；content_hash 为已算好的图片哈希"""
+        if not image_bytes:
+            return
+        image_bytes = bytes(image_bytes)
+        try:
+            self.db.save_thumbnails(content_hash or blob_hash(image_bytes), self.make_thumbnails(image_bytes))
+        except Exception as e:
+            logger.warning(f"生成缩略图失败: {e}")
+
+
+class ThumbnailWorker(QObject):
+    """
+    后台生成缩略图的线程 (QImage 可以在任意线程使用，GUI 线程不再解码原图)：
+    - request() 把刚保存的图片放入队列，立即返回
+    - 队列为空时分批为还没有缩略图的旧图片补生成，全部完成后等待新的请求
+    - 每处理完一批发出 generated(哈希列表)，显示占位图的列表据此重新读取
+    出错的图片记录日志，同一进程内不再重试。
+    """
+    generated = pyqtSignal(object)
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, db_manager, batch_size=THUMB_BACKFILL_BATCH, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self.service = ThumbnailService(db_manager)
+        self.batch_size = batch_size
+        self._queue = []
+        self._failed = set()
+        self._backfill_done = False
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @classmethod
+    def instance(cls, db_manager=None):
+        """获取进程内共享的缩略图线程 (首次调用须在 GUI 线程并提供 db_manager)"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(db_manager)
+            return cls._instance
+
+    def start(self):
+        with self._cond:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._loop, name='thumbnails', daemon=True)
+                self._thread.start()
+
+    def request(self, image_bytes, content_hash=None):
+        """为一张刚保存的图片生成缩略图；content_hash 为已算好的图片哈希"""
+        if not image_bytes:
+            return
+        with self._cond:
+            self._queue.append((bytes(image_bytes), content_hash))
+            self._cond.notify_all()
+        self.start()
+
+    def stop(self, timeout=None):
+        """停止线程 (退出程序、关闭数据库前调用)；正在处理的图片完成后退出"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _next_batch(self):
+        """返回 [(图片数据或 None, 哈希)]；None 表示按哈希读取原图 (补生成)。停止时返回 None"""
+        with self._cond:
+            while not self._stopping:
+                if self._queue:
+                    batch, self._queue = self._queue, []
+                    return batch
+                if not self._backfill_done:
+                    break
+                self._cond.wait()
+            else:
+                return None
+        try:
+            hashes = [h for h in self.db.get_blobs_missing_thumbnail(THUMB_LIST, self.batch_size + len(self._failed))
+                      if h not in self._failed][:self.batch_size]
+        except Exception as e:
+            logger.warning(f"读取缺少缩略图的图片失败: {e}")
+            hashes = []
+        if not hashes:
+            self._backfill_done = True
+        return [(None, h) for h in hashes]
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            done = []
+            for data, content_hash in batch:
+                if self._stopping:
+                    break
+                try:
+                    if data is None:
+                        data = self.db.get_blob(content_hash)
+                    content_hash = content_hash or blob_hash(data)
+                    self.db.save_thumbnails(content_hash, self.service.make_thumbnails(data))
+                    done.append(content_hash)
+                except Exception as e:
+                    self._failed.add(content_hash)
+                    logger.warning(f"生成缩略图失败 {(content_hash or '')[:12]}: {e}")
+            if done:
+                self.generated.emit(done)
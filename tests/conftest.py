@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# tests/conftest.py
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path):
+    """临时数据库上的 DatabaseManager (独立的连接管理器，不影响进程内单例)"""
+    from data.connection_manager import ConnectionManager
+    from data.db_manager import DatabaseManager
+    manager = DatabaseManager(ConnectionManager(str(tmp_path / 'ideas.db')))
+    yield manager
+    manager.close()
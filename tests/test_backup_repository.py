@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# tests/test_backup_repository.py
+import os
+import threading
+import time
+from data.backup_repository import BackupRepository
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _chunk_files(repo):
+    return {f for sub in os.listdir(repo.chunk_dir) for f in os.listdir(os.path.join(repo.chunk_dir, sub))}
+
+
+def test_gc_keeps_recent_unreferenced_chunks(tmp_path):
+    repo = BackupRepository(str(tmp_path / 'repo'), chunk_pages=1)
+    src = str(tmp_path / 'a.db')
+    _write(src, os.urandom(3 * 4096))
+    repo.add_file(src, 'a', kind='full', version=1)
+    # 模拟另一个写入者刚写入、尚未写索引的数据块
+    pending = os.path.join(repo.chunk_dir, 'ff', 'ff' * 32)
+    os.makedirs(os.path.dirname(pending), exist_ok=True)
+    _write(pending, b'x')
+
+    assert repo.gc(keep=1)[2] == 0
+    assert os.path.exists(pending)
+
+    old = time.time() - 7200
+    os.utime(pending, (old, old))
+    assert repo.gc(keep=1, grace_s=3600)[2] == 1
+    assert not os.path.exists(pending)
+    assert len(_chunk_files(repo)) == 3
+
+
+def test_gc_waits_for_add_file(tmp_path):
+    repo = BackupRepository(str(tmp_path / 'repo'), chunk_pages=1)
+    src = str(tmp_path / 'a.db')
+    _write(src, os.urandom(2 * 4096))
+    repo.add_file(src, 'a', kind='full', version=1)
+
+    done = threading.Event()
+    with repo.locked():
+        worker = threading.Thread(target=lambda: (repo.gc(keep=1, grace_s=0), done.set()))
+        worker.start()
+        assert not done.wait(0.2)
+    worker.join(5)
+    assert done.is_set()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# tests/test_capture_queue.py
+"""剪贴板采集的合并提交：一批采集一个事务，退出时写完队列中剩余的采集"""
+import hashlib
+import pytest
+
+pytest.importorskip('PyQt5')
+from PyQt5.QtCore import QCoreApplication
+from services.capture_queue import CaptureQueue
+
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def batches(db, monkeypatch):
+    """记录每次提交的批次大小"""
+    sizes = []
+    save = db.add_clipboard_items
+
+    def recording(items):
+        sizes.append(len(items))
+        return save(items)
+
+    monkeypatch.setattr(db, 'add_clipboard_items', recording)
+    return sizes
+
+
+def _contents(db):
+    with db._read() as c:
+        c.execute('SELECT content FROM ideas ORDER BY id')
+        return [r[0] for r in c.fetchall()]
+
+
+def test_captures_within_latency_are_committed_together(db, batches):
+    # 等待时间足够长，只有 flush() 才会让写入线程提前提交
+    queue = CaptureQueue(db, flush_ms=10000, batch_max=50)
+    for k in range(5):
+        queue.enqueue('text', f'clip {k}')
+    assert queue.flush(timeout=5)
+    assert batches == [5]
+    assert _contents(db) == [f'clip {k}' for k in range(5)]
+    queue.shutdown(timeout=5)
+
+
+def test_batches_are_capped_at_batch_max(db, batches):
+    queue = CaptureQueue(db, flush_ms=10000, batch_max=3)
+    for k in range(7):
+        queue.enqueue('text', f'clip {k}')
+    assert queue.flush(timeout=5)
+    assert batches == [3, 3, 1]
+    assert len(_contents(db)) == 7
+    queue.shutdown(timeout=5)
+
+
+def test_results_are_delivered_on_the_gui_thread(db, app):
+    queue = CaptureQueue(db, flush_ms=10000)
+    saved = []
+    queue.enqueue('text', 'same', on_saved=lambda *r: saved.append(r))
+    queue.enqueue('text', 'same', on_saved=lambda *r: saved.append(r))
+    assert queue.flush(timeout=5)
+    app.processEvents()
+    # 同一批次中的重复内容按顺序去重
+    (first_id, first_new), (second_id, second_new) = saved
+    assert (first_new, second_new) == (True, False)
+    assert first_id == second_id
+    queue.shutdown(timeout=5)
+
+
+def test_shutdown_flushes_pending_captures(db, batches):
+    queue = CaptureQueue(db, flush_ms=10000, batch_max=50)
+    for k in range(4):
+        queue.enqueue('text', f'clip {k}')
+    queue.shutdown(timeout=5)
+    assert not queue._thread.is_alive()
+    assert batches == [4]
+    assert _contents(db) == [f'clip {k}' for k in range(4)]
+
+    # 关闭后的采集同步写入，不会丢失
+    queue.enqueue('text', 'late')
+    assert _contents(db)[-1] == 'late'
+
+
+def test_image_hash_is_computed_on_the_writer_thread(db):
+    queue = CaptureQueue(db, flush_ms=0)
+    data = b'\x89PNG fake image bytes' * 1000
+    queue.enqueue('image', '[Image Data]', data_blob=data)
+    queue.enqueue('image', '[Image Data]', data_blob=data)
+    queue.shutdown(timeout=5)
+    with db._read() as c:
+        c.execute("SELECT content_hash FROM ideas WHERE item_type = 'image'")
+        assert c.fetchall() == [(hashlib.sha256(data).hexdigest(),)]
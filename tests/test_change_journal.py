@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# tests/test_change_journal.py
+import shutil
+import sqlite3
+from data.backup import apply_delta, online_backup, write_delta
+
+
+def _content(path, iid):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT title, content, is_favorite, is_deleted FROM ideas WHERE id = ?', (iid,)).fetchone()
+    finally:
+        conn.close()
+
+
+def test_repeated_edits_of_newest_row_are_journaled(db, tmp_path):
+    db_path = db._cm.db_path
+    iid = db.add_idea('note', 'original text')
+    snapshot = str(tmp_path / 'snapshot.db')
+    online_backup(db_path, snapshot)
+    base = db.current_version()
+
+    # 同一条 (日志中最新的) 笔记在不同事务中连续修改
+    db.update_idea(iid, 'note', 'EDITED text', None, [])
+    after_edit = db.current_version()
+    assert after_edit > base
+    db.toggle_field(iid, 'is_favorite')
+    assert db.current_version() > after_edit
+    db.set_deleted(iid, True)
+
+    changes = db.changes_since(base)
+    assert changes.keys('ideas') == {iid}
+    assert db.changes_since(after_edit).keys('ideas') == {iid}
+
+    delta = str(tmp_path / 'step.delta.db')
+    version, rows = write_delta(db_path, delta, base, 'snapshot.db')
+    assert version == db.current_version()
+    assert rows >= 1
+
+    restored = str(tmp_path / 'restored.db')
+    shutil.copy(snapshot, restored)
+    conn = sqlite3.connect(restored)
+    try:
+        apply_delta(conn, delta)
+    finally:
+        conn.close()
+    assert _content(restored, iid) == _content(db_path, iid) == ('note', 'EDITED text', 1, 1)
+
+
+def test_timestamp_writeback_is_not_journaled(db):
+    base = db.current_version()
+    iid = db.add_idea('note', 'text')
+    c = db._cm.writer.execute('SELECT entity, entity_id, op FROM change_journal WHERE version > ? AND entity = ?',
+                              (base, 'ideas'))
+    assert c.fetchall() == [('ideas', iid, 'i')]
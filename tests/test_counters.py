@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# tests/test_counters.py
+from data.counters import CLIPBOARD_TAG, read_counters, rebuild_counters
+
+
+def _stats(db):
+    with db._read() as c:
+        return read_counters(c)[0]
+
+
+def test_creating_clipboard_tag_recounts(db):
+    iid = db.add_idea('note', 'text')
+    # 关联行先于标签写入 (按 id 导入数据、或旧数据中遗留的关联)
+    with db._write() as c:
+        c.execute('INSERT INTO idea_tags (idea_id, tag_id) VALUES (?, 99)', (iid,))
+        c.execute('INSERT INTO tags (id, name) VALUES (99, ?)', (CLIPBOARD_TAG,))
+
+    counted = _stats(db)
+    assert counted['clipboard'] == 1
+    with db._write() as c:
+        rebuild_counters(c)
+    assert _stats(db) == counted
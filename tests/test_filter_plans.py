@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# tests/test_filter_plans.py
+"""列表筛选的每个分支都应走索引：查询计划中不能出现对 ideas / idea_tags 的全表扫描"""
+import re
+import pytest
+from core.enums import FilterType
+from data.counters import CLIPBOARD_TAG
+from data.idea_query import IdeaQuery
+
+# 不带 USING ... INDEX 的 SCAN 即全表扫描 (ideas 在列表查询中的别名为 i)
+_TABLE_SCAN = re.compile(r'^SCAN (ideas|idea_tags|i)$')
+
+_BRANCHES = [(f_type, 1 if f_type is FilterType.CATEGORY else None, None, '') for f_type in FilterType] + [
+    (FilterType.CATEGORY, None, None, ''),
+    (FilterType.ALL, None, 'work', ''),
+    (FilterType.CLIPBOARD, None, 'work', ''),
+    (FilterType.TRASH, None, 'work', ''),
+    (FilterType.ALL, None, None, 'hello'),
+    (FilterType.FAVORITE, None, 'work', 'hello'),
+]
+
+
+def _populate(db):
+    with db._write() as c:
+        c.execute("INSERT INTO categories (name) VALUES ('a')")
+        for k in range(300):
+            c.execute('INSERT INTO ideas (title, content, is_deleted, is_favorite, category_id) VALUES (?,?,?,?,?)',
+                      (f'note {k}', 'hello world', int(k % 10 == 0), int(k % 7 == 0), 1 if k % 3 else None))
+        c.executemany('INSERT INTO tags (name) VALUES (?)', [(CLIPBOARD_TAG,), ('work',)])
+        c.execute('INSERT INTO idea_tags (idea_id, tag_id) SELECT id, 1 FROM ideas WHERE id % 2 = 0')
+        c.execute('INSERT INTO idea_tags (idea_id, tag_id) SELECT id, 2 FROM ideas WHERE id % 5 = 0')
+        c.execute('ANALYZE')
+
+
+def _statements(query):
+    yield query.count()
+    for kw in ({}, {'with_total': True}, {'after': (0, '2026-01-01 00:00:00', 10)},
+               {'before': (0, '2026-01-01 00:00:00', 10)}, {'from_end': True}):
+        sql, p, _ = query.select(limit=20, **kw)
+        yield sql, p
+
+
+@pytest.mark.parametrize('analyzed', [False, True], ids=['empty', 'analyzed'])
+@pytest.mark.parametrize('f_type, f_val, tag_filter, search', _BRANCHES,
+                         ids=lambda v: getattr(v, 'value', str(v)))
+def test_filter_branch_uses_indexes(db, analyzed, f_type, f_val, tag_filter, search):
+    if analyzed:
+        _populate(db)
+    query = IdeaQuery(search, f_type, f_val, tag_filter)
+    with db._read() as c:
+        for sql, p in _statements(query):
+            plan = [row[3] for row in c.execute('EXPLAIN QUERY PLAN ' + sql, p)]
+            scans = [step for step in plan if _TABLE_SCAN.match(step)]
+            assert not scans, f"{f_type.value} 全表扫描: {plan}"
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# tests/test_hash_filter.py
+"""内容哈希过滤器只允许误判为"可能存在"，已存在的哈希必须总是返回 True"""
+import hashlib
+import sqlite3
+from data import hash_filter
+from data.hash_filter import HashFilter
+from services.hash_calculator import HashCalculator
+
+
+def _hashes(n, prefix='h'):
+    return [hashlib.sha256(f'{prefix}{k}'.encode()).hexdigest() for k in range(n)]
+
+
+def _insert(db, hashes):
+    with db._write() as c:
+        c.executemany("INSERT INTO ideas (title, content, content_hash) VALUES ('t', 'c', ?)", [(h,) for h in hashes])
+
+
+def test_no_false_negatives_for_loaded_and_added_hashes(db):
+    loaded, added = _hashes(2000, 'a'), _hashes(500, 'b')
+    _insert(db, loaded)
+    f = HashFilter()
+    with db._write() as c:
+        f.warm(c)
+        for h in added:
+            f.add(h)
+        assert all(f.might_contain(c, h) for h in loaded + added)
+        # 非十六进制的旧数据哈希也能登记
+        f.add('legacy-hash')
+        assert f.might_contain(c, 'legacy-hash')
+
+
+def test_reload_after_external_write_and_over_capacity(db, monkeypatch):
+    monkeypatch.setattr(hash_filter, 'MIN_CAPACITY', 100)
+    f = HashFilter()
+    with db._write() as c:
+        f.warm(c)
+
+    # 其他连接写入的哈希不会经过 add()，只能靠 data_version 触发重新加载
+    external = _hashes(50, 'x')
+    conn = sqlite3.connect(db._cm.db_path)
+    with conn:
+        conn.executemany("INSERT INTO ideas (title, content, content_hash) VALUES ('t', 'c', ?)", [(h,) for h in external])
+    conn.close()
+
+    # 超过容量后整体重新加载
+    grown = _hashes(300, 'y')
+    _insert(db, grown)
+    with db._write() as c:
+        for h in grown:
+            f.add(h)
+        assert all(f.might_contain(c, h) for h in external + grown)
+
+
+def test_clipboard_dedup_uses_filter_without_missing_duplicates(db):
+    first = db.add_clipboard_items([('text', f'clip {k}', None, None, [], None) for k in range(200)])
+    again = db.add_clipboard_items([('text', f'clip {k}', None, None, [], None) for k in range(200)])
+    assert [r[1] for r in first] == [True] * 200
+    assert again == [(iid, False) for iid, _ in first]
+
+
+def test_streaming_hash_matches_one_shot_digest():
+    calc = HashCalculator()
+    # 多字节字符跨越分段边界
+    text = ('中文' * (calc.CHUNK_SIZE // 3)) + 'tail'
+    assert calc.compute(text) == hashlib.sha256(text.encode('utf-8')).hexdigest()
+    data = bytes(range(256)) * (calc.CHUNK_SIZE // 100)
+    assert calc.compute(None, data) == hashlib.sha256(data).hexdigest()
+    assert calc.compute('') is None
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# tests/test_idea_bulk.py
+from data.repositories.idea_repository import IdeaRepository
+
+
+def _tags(db, iid):
+    return sorted(db.get_tags(iid))
+
+
+def test_repository_move_category_creates_preset_tags_through_tag_cache(db):
+    repo = IdeaRepository(db._cm)
+    ids = [db.add_idea(f'note {k}', 'text') for k in range(3)]
+    db.add_category('工作')
+    with db._read() as c:
+        cat = c.execute("SELECT id FROM categories WHERE name = '工作'").fetchone()[0]
+    db.set_category_preset_tags(cat, ' 项目 ,周报,')
+
+    repo.move_category_many(ids[:2], cat)
+
+    assert [_tags(db, i) for i in ids] == [['周报', '项目'], ['周报', '项目'], []]
+    # 新标签经 TagCache 创建，缓存中的 id 与表中一致
+    with db._write() as c:
+        assert db._cm.tag_cache.resolve(c, ['项目', '周报']) == dict(
+            c.execute("SELECT name, id FROM tags WHERE name IN ('项目', '周报')").fetchall())
+
+
+def test_repository_and_manager_share_bulk_semantics(db):
+    repo = IdeaRepository(db._cm)
+    ids = [db.add_idea(f'note {k}', 'text') for k in range(4)]
+
+    repo.set_deleted_many(ids[:2], True)
+    repo.toggle_field_many(ids[1:3], 'is_pinned')
+    repo.delete_permanent_many([ids[3]])
+
+    with db._read() as c:
+        c.execute('SELECT id, is_deleted, is_pinned FROM ideas ORDER BY id')
+        assert c.fetchall() == [(ids[0], 1, 0), (ids[1], 1, 1), (ids[2], 0, 1)]
+        c.execute('SELECT COUNT(*) FROM idea_tags WHERE idea_id = ?', (ids[3],))
+        assert c.fetchone()[0] == 0
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# tests/test_keyset_paging.py
+"""键集分页：置顶行与相同 updated_at 的行在页边界上不重复、不遗漏"""
+import pytest
+from data.idea_query import page_key
+
+PAGE = 4
+
+
+def _populate(db):
+    ids = [db.add_idea(f'note {k}', 'text') for k in range(23)]
+    with db._write() as c:
+        # 大部分行的 updated_at 相同，只能靠 id 区分先后；置顶行分散在其中
+        c.execute("UPDATE ideas SET updated_at = '2026-01-01 00:00:00'")
+        c.execute("UPDATE ideas SET updated_at = '2026-01-02 00:00:00' WHERE id % 5 = 0")
+        c.execute('UPDATE ideas SET is_pinned = 1 WHERE id % 4 = 1')
+    return ids
+
+
+def _ordered(db):
+    return [r[0] for r in db.get_ideas('', 'all', None)]
+
+
+def test_full_order_is_pinned_then_newest_then_id(db):
+    _populate(db)
+    rows = db.get_ideas('', 'all', None)
+    keys = [page_key(r) for r in rows]
+    assert keys == sorted(keys, reverse=True)
+    assert len(set(keys)) == len(keys)
+
+
+def test_forward_pages_cover_every_row_once(db):
+    _populate(db)
+    seen, after = [], None
+    while True:
+        rows = db.get_ideas_page('', 'all', None, page_size=PAGE, after=after)
+        if not rows:
+            break
+        assert len(rows) <= PAGE
+        seen.extend(r[0] for r in rows)
+        after = page_key(rows[-1])
+    assert seen == _ordered(db)
+
+
+def test_backward_pages_from_end_cover_every_row_once(db):
+    _populate(db)
+    rows = db.get_ideas_page('', 'all', None, page_size=PAGE, from_end=True)
+    pages = [[r[0] for r in rows]]
+    while rows:
+        rows = db.get_ideas_page('', 'all', None, page_size=PAGE, before=page_key(rows[0]))
+        if rows:
+            pages.insert(0, [r[0] for r in rows])
+    assert [i for page in pages for i in page] == _ordered(db)
+    # 最后一页取自列表末尾，其余页都是满页
+    assert all(len(page) == PAGE for page in pages[1:])
+
+
+@pytest.mark.parametrize('page', [1, 2, 4, 6])
+def test_jump_with_offset_matches_offset_paging(db, page):
+    _populate(db)
+    expected = _ordered(db)[(page - 1) * PAGE:page * PAGE]
+    forward = db.get_ideas_page('', 'all', None, page_size=PAGE, offset=(page - 1) * PAGE)
+    assert [r[0] for r in forward] == expected
+
+    total = len(_ordered(db))
+    skip_backward = total - page * PAGE
+    backward = db.get_ideas_page('', 'all', None, from_end=True, offset=max(0, skip_backward),
+                                 page_size=PAGE + min(0, skip_backward))
+    assert [r[0] for r in backward] == expected
+
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# tests/test_retention.py
+from data.counters import CLIPBOARD_TAG
+from data.retention import RetentionPolicy
+from services.retention_service import RetentionWorker
+
+
+def _add_clips(db, n, size):
+    ids = []
+    for k in range(n):
+        iid = db.add_idea(f'clip {k}', f'{k:04d}'.ljust(size, 'x'), tags=[CLIPBOARD_TAG])
+        with db._write() as c:
+            c.execute("UPDATE ideas SET updated_at = datetime('2026-01-01', ?) WHERE id = ?", (f'+{k} minutes', iid))
+        ids.append(iid)
+    return ids
+
+
+def _remaining(db):
+    with db._read() as c:
+        c.execute('SELECT id FROM ideas ORDER BY id')
+        return [r[0] for r in c.fetchall()]
+
+
+def test_byte_cutoff_keeps_newest_items_within_limit(db):
+    ids = _add_clips(db, 10, 100)
+    policy = RetentionPolicy(max_bytes=350)
+    # 最新的 3 条合计 300 字节，第 4 新的一条是分界
+    with db._read() as c:
+        c.execute('SELECT updated_at FROM ideas WHERE id = ?', (ids[6],))
+        assert db.get_clipboard_byte_cutoff(policy) == (c.fetchone()[0], ids[6])
+
+    worker = RetentionWorker(db, policy, batch_size=2, idle_s=0)
+    assert worker.run_once()
+    assert _remaining(db) == ids[7:]
+    assert db.get_clipboard_byte_cutoff(policy) is None
+
+
+def test_byte_cutoff_counts_utf8_bytes_not_characters(db):
+    # 每条 50 个汉字，UTF-8 编码为 150 字节
+    ids = _add_clips(db, 4, 0)
+    with db._write() as c:
+        c.execute("UPDATE ideas SET content = ?", ('中' * 50,))
+    policy = RetentionPolicy(max_bytes=350)
+    # 最新的 2 条合计 300 字节，第 3 新的一条是分界 (按字符数计算则远未超出上限)
+    with db._read() as c:
+        c.execute('SELECT updated_at FROM ideas WHERE id = ?', (ids[1],))
+        assert db.get_clipboard_byte_cutoff(policy) == (c.fetchone()[0], ids[1])
+
+
+def test_byte_limit_not_applied_without_cutoff(db):
+    _add_clips(db, 5, 100)
+    policy = RetentionPolicy(max_bytes=1)
+    assert db.purge_clipboard_history(policy, 100) == 0
+    assert len(_remaining(db)) == 5
+
+
+def test_policy_without_limits_is_disabled():
+    assert not RetentionPolicy().enabled
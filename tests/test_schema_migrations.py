@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# tests/test_schema_migrations.py
+import sqlite3
+from data.schema_migrations import LATEST_VERSION, SchemaMigration
+
+
+def _legacy_db(path, images):
+    """最新结构的数据库退回 v11，并写入内联在 ideas.data_blob 中的图片"""
+    conn = sqlite3.connect(path)
+    SchemaMigration.apply(conn)
+    conn.executemany("INSERT INTO ideas (title, item_type, data_blob) VALUES (?, 'image', ?)",
+                     [(f'image {k}', bytes([k]) * 64) for k in range(images)])
+    conn.execute('PRAGMA user_version = 11')
+    conn.commit()
+    return conn
+
+
+def test_inline_blobs_are_moved_by_migration(tmp_path):
+    conn = _legacy_db(str(tmp_path / 'ideas.db'), 45)
+    progress = []
+    assert SchemaMigration.apply(conn, progress=lambda *args: progress.append(args)) == LATEST_VERSION
+    assert conn.execute('SELECT COUNT(*) FROM ideas WHERE data_blob IS NOT NULL').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM ideas WHERE blob_hash IS NULL').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0] == 45
+    assert progress and progress[-1][0] == "迁出内联图片"
+    assert conn.execute('SELECT COUNT(*) FROM schema_migration_state').fetchone()[0] == 0
+    conn.close()
+
+
+def test_inline_blob_move_resumes_from_saved_cursor(tmp_path):
+    conn = _legacy_db(str(tmp_path / 'ideas.db'), 30)
+    # 上次运行在 id 10 之后中断：之前的行已迁出
+    conn.execute("INSERT INTO schema_migration_state (job, cursor) VALUES ('v12.inline_blobs', 10)")
+    conn.execute('UPDATE ideas SET data_blob = NULL, blob_hash = NULL WHERE id <= 10')
+    conn.commit()
+    SchemaMigration.apply(conn)
+    assert conn.execute('SELECT MIN(id) FROM ideas WHERE blob_hash IS NOT NULL').fetchone()[0] == 11
+    assert conn.execute('SELECT COUNT(*) FROM ideas WHERE data_blob IS NOT NULL').fetchone()[0] == 0
+    conn.close()
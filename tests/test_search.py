@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# tests/test_search.py
+"""全文检索：索引由触发器与 ideas / idea_tags / tags 同步，列表与计数使用同一组条件"""
+import pytest
+from data.search_index import USE_TRIGRAM, build_match_query
+
+
+def _search(db, text, f_type='all'):
+    ids = sorted(r[0] for r in db.get_ideas(text, f_type, None))
+    assert db.get_ideas_count(text, f_type, None) == len(ids)
+    return ids
+
+
+def test_search_matches_title_content_and_tags(db):
+    a = db.add_idea('weekly report', 'numbers for march')
+    b = db.add_idea('groceries', 'milk and report cards')
+    c = db.add_idea('ideas', 'nothing here', tags=['reporting'])
+    db.add_idea('other', 'unrelated')
+
+    assert _search(db, 'report') == [a, b, c]
+    # 多个词之间为 AND
+    assert _search(db, 'report march') == [a]
+
+
+def test_search_index_follows_edits_tags_and_deletes(db):
+    iid = db.add_idea('draft', 'first version')
+    assert _search(db, 'version') == [iid]
+
+    db.update_idea(iid, 'draft', 'second edition', None, [])
+    assert _search(db, 'version') == []
+    assert _search(db, 'edition') == [iid]
+
+    db.set_idea_tags(iid, ['important'])
+    assert _search(db, 'important') == [iid]
+    db.rename_tag('important', 'urgent')
+    assert _search(db, 'important') == []
+    assert _search(db, 'urgent') == [iid]
+    db.set_idea_tags(iid, [])
+    assert _search(db, 'urgent') == []
+
+    db.set_deleted(iid, True)
+    assert _search(db, 'edition') == []
+    assert _search(db, 'edition', 'trash') == [iid]
+    db.delete_permanent(iid)
+    assert _search(db, 'edition', 'trash') == []
+
+
+def test_trigram_finds_cjk_substrings(db):
+    if not USE_TRIGRAM:
+        pytest.skip('SQLite 不支持 trigram 分词器')
+    a = db.add_idea('会议记录', '明天下午讨论数据库迁移方案')
+    db.add_idea('购物清单', '牛奶、面包、数据线')
+    db.add_idea('随笔', '今天天气不错')
+
+    # 没有空格分词的中文子串 (>= 3 个字符) 走索引
+    assert build_match_query('数据库迁移') is not None
+    assert _search(db, '数据库迁移') == [a]
+    assert _search(db, '讨论数据') == [a]
+    assert _search(db, '会议记') == [a]
+
+
+def test_short_terms_fall_back_to_like(db):
+    if not USE_TRIGRAM:
+        pytest.skip('SQLite 不支持 trigram 分词器')
+    a = db.add_idea('会议记录', '明天下午讨论数据库迁移方案')
+    b = db.add_idea('购物清单', '牛奶、面包、数据线', tags=['家'])
+    c = db.add_idea('进度 100%', 'a_b')
+
+    # 少于 3 个字符的词无法组成 trigram，不进入 MATCH 表达式
+    assert build_match_query('数据') is None
+    assert _search(db, '数据') == [a, b]
+    assert _search(db, '家') == [b]
+    # 与长词组合时两种条件同时生效
+    assert _search(db, '数据 数据库') == [a]
+    # LIKE 通配符按字面匹配
+    assert _search(db, '%') == [c]
+    assert _search(db, '_') == [c]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# tests/test_sidebar_counts.py
+"""侧边栏计数 (计数表、合并统计查询、列表总数) 与直接 COUNT(*) 的结果一致"""
+from core.enums import FilterType
+from data.counters import CLIPBOARD_TAG
+from data.repositories.idea_repository import IdeaRepository
+
+_TRUTH = {
+    'all': 'is_deleted = 0',
+    'today': "is_deleted = 0 AND date(updated_at, 'localtime') = date('now', 'localtime')",
+    'clipboard': ('is_deleted = 0 AND id IN (SELECT it.idea_id FROM idea_tags it JOIN tags t ON t.id = it.tag_id '
+                  f"WHERE t.name = '{CLIPBOARD_TAG}')"),
+    'uncategorized': 'is_deleted = 0 AND category_id IS NULL',
+    'untagged': 'is_deleted = 0 AND id NOT IN (SELECT idea_id FROM idea_tags)',
+    'favorite': 'is_deleted = 0 AND is_favorite = 1',
+    'trash': 'is_deleted = 1',
+}
+
+
+def _truth(db):
+    with db._read() as c:
+        d = {k: c.execute(f'SELECT COUNT(*) FROM ideas WHERE {cond}').fetchone()[0] for k, cond in _TRUTH.items()}
+        c.execute('SELECT category_id, COUNT(*) FROM ideas WHERE is_deleted = 0 AND category_id IS NOT NULL GROUP BY category_id')
+        d['categories'] = dict(c.fetchall())
+    return d
+
+
+def _category(db, name):
+    db.add_category(name)
+    with db._read() as c:
+        return c.execute('SELECT id FROM categories WHERE name = ?', (name,)).fetchone()[0]
+
+
+def _populate(db):
+    work, home = _category(db, 'work'), _category(db, 'home')
+    ids = [db.add_idea(f'note {k}', 'text', tags=['a'] if k % 3 == 0 else []) for k in range(12)]
+    for k in range(3):
+        db.add_clipboard_items([('text', f'clip {k}', None, None, [], None)])
+    with db._write() as c:
+        # 一部分笔记不是今天修改的
+        c.execute("UPDATE ideas SET updated_at = '2020-01-01 12:00:00' WHERE id % 4 = 0")
+    db.move_category_many(ids[:4], work)
+    db.move_category_many(ids[4:6], home)
+    db.set_favorite_many(ids[2:7], True)
+    db.set_deleted_many(ids[5:8], True)
+    db.add_tags_to_multiple_ideas(ids[8:10], [CLIPBOARD_TAG])
+    db.remove_tag_from_multiple_ideas([ids[0]], 'a')
+    db.delete_permanent(ids[7])
+    db.set_deleted(ids[6], False)
+    db.delete_category(home)
+    return ids
+
+
+def test_counters_match_count_star(db):
+    _populate(db)
+    truth = _truth(db)
+    counts = db.get_counts()
+    categories = counts.pop('categories')
+    assert counts == {k: truth[k] for k in counts}
+    assert set(counts) == set(_TRUTH)
+    assert categories == {**truth['categories'], None: truth['uncategorized']}
+
+
+def test_combined_count_query_matches_count_star(db):
+    _populate(db)
+    truth = _truth(db)
+    counts = IdeaRepository(db._cm).get_counts()
+    assert counts.pop('categories') == {**truth['categories'], None: truth['uncategorized']}
+    assert counts == {k: v for k, v in truth.items() if k != 'categories'}
+
+
+def test_list_totals_match_count_star(db):
+    _populate(db)
+    truth = _truth(db)
+    for f_type in FilterType:
+        if f_type is FilterType.CATEGORY:
+            continue
+        rows, total = db.get_ideas_page('', f_type, None, page_size=5, with_total=True)
+        assert total == truth[f_type.value] == db.get_ideas_count('', f_type, None)
+        assert len(rows) == min(5, total)
+    for cat_id, n in truth['categories'].items():
+        assert db.get_ideas_count('', FilterType.CATEGORY, cat_id) == n
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# tests/test_tag_cache.py
+"""标签 id 缓存：回滚与其他连接的提交之后不能留下指向不存在 (或已改名) 标签的 id"""
+import sqlite3
+import pytest
+
+
+def _linked_tags(db, iid):
+    """笔记关联的标签名；关联到不存在的标签时为 None"""
+    with db._read() as c:
+        c.execute('SELECT t.name FROM idea_tags it LEFT JOIN tags t ON t.id = it.tag_id WHERE it.idea_id = ?', (iid,))
+        return sorted(r[0] for r in c.fetchall())
+
+
+def _external_write(db, sql, params=()):
+    conn = sqlite3.connect(db._cm.db_path)
+    try:
+        with conn:
+            conn.execute(sql, params)
+    finally:
+        conn.close()
+
+
+def test_rollback_discards_cached_ids_of_uncommitted_tags(db):
+    with pytest.raises(RuntimeError):
+        with db._write() as c:
+            db._cm.tag_cache.resolve(c, ['草稿'])
+            raise RuntimeError('abort')
+    with db._read() as c:
+        assert c.execute("SELECT COUNT(*) FROM tags WHERE name = '草稿'").fetchone()[0] == 0
+
+    iid = db.add_idea('note', 'text', tags=['草稿'])
+    assert _linked_tags(db, iid) == ['草稿']
+
+
+def test_cache_is_cleared_after_external_delete(db):
+    first = db.add_idea('first', 'text', tags=['work'])
+    _external_write(db, "DELETE FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = 'work')")
+    _external_write(db, "DELETE FROM tags WHERE name = 'work'")
+
+    second = db.add_idea('second', 'text', tags=['work'])
+    assert _linked_tags(db, first) == []
+    assert _linked_tags(db, second) == ['work']
+
+
+def test_cache_is_cleared_after_external_rename(db):
+    db.add_idea('first', 'text', tags=['work'])
+    _external_write(db, "UPDATE tags SET name = 'job' WHERE name = 'work'")
+
+    second = db.add_idea('second', 'text', tags=['work'])
+    assert _linked_tags(db, second) == ['work']
+
+
+def test_rename_and_delete_invalidate_cached_names(db):
+    db.add_idea('first', 'text', tags=['old'])
+    db.rename_tag('old', 'new')
+    assert _linked_tags(db, db.add_idea('second', 'text', tags=['old'])) == ['old']
+
+    db.delete_tag('new')
+    assert _linked_tags(db, db.add_idea('third', 'text', tags=['new'])) == ['new']
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# tests/test_thumbnails.py
+from data.blob_store import blob_hash
+
+
+def test_get_thumbnails_distinguishes_pending_from_invalid(db):
+    good = db.add_idea('good', '', item_type='image', data_blob=b'good image')
+    bad = db.add_idea('bad', '', item_type='image', data_blob=b'bad image')
+    pending = db.add_idea('pending', '', item_type='image', data_blob=b'pending image')
+    db.save_thumbnails(blob_hash(b'good image'), {'list': b'thumb'})
+    # 空 bytes 表示无法生成缩略图，不应再显示为"生成中"
+    db.save_thumbnails(blob_hash(b'bad image'), {'list': b''})
+
+    thumbs = db.get_thumbnails([good, bad, pending], 'list')
+    assert thumbs == {good: b'thumb', bad: b''}
+    assert db.get_blobs_missing_thumbnail('list') == [blob_hash(b'pending image')]
@@ -184,18 +184,8 @@ class AdvancedTagSelector(QWidget):
         if self.idea_id:
             self.selected_tags = set(self.db.get_tags(self.idea_id))
         
-        c = self.db.conn.cursor()
-        # 【关键修改】ORDER BY last_used DESC 确保按时间倒序排列
-        # MAX(i.updated_at) 获取该标签最后一次被使用（关联笔记更新）的时间
-        c.execute('''
-            SELECT t.name, COUNT(it.idea_id) as cnt, MAX(i.updated_at) as last_used
-            FROM tags t
-            LEFT JOIN idea_tags it ON t.id = it.tag_id
-            LEFT JOIN ideas i ON it.idea_id = i.id AND i.is_deleted = 0
-            GROUP BY t.id 
-            ORDER BY last_used DESC, cnt DESC, t.name ASC
-        ''')
-        all_tags = c.fetchall()
+        # 按最近使用时间倒序 (该标签关联笔记的最后更新时间)
+        all_tags = self.db.get_tags_by_last_used()
         
         self.recent_label.setText(f"最近使用 ({len(all_tags)})")
 
@@ -313,16 +303,7 @@ class AdvancedTagSelector(QWidget):
         if not self.idea_id:
             return
 
-        c = self.db.conn.cursor()
-        c.execute('DELETE FROM idea_tags WHERE idea_id = ?', (self.idea_id,))
-        for tag_name in self.selected_tags:
-            c.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag_name,))
-            c.execute('SELECT id FROM tags WHERE name = ?', (tag_name,))
-            result = c.fetchone()
-            if result:
-                tag_id = result[0]
-                c.execute('INSERT INTO idea_tags (idea_id, tag_id) VALUES (?, ?)', (self.idea_id, tag_id))
-        self.db.conn.commit()
+        self.db.set_idea_tags(self.idea_id, list(self.selected_tags))
 
     def _is_child_widget(self, widget):
         if widget is None: return False
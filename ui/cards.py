@@ -4,19 +4,21 @@ import sys
 from PyQt5.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QLabel, QApplication, QSizePolicy
 from PyQt5.QtCore import Qt, pyqtSignal, QMimeData, QSize
 from PyQt5.QtGui import QDrag, QPixmap, QImage
-from core.config import STYLES
+from core.config import STYLES, THUMB_CARD_HEIGHT, THUMB_CARD_MAX_WIDTH
 
 class IdeaCard(QFrame):
     # (id, is_ctrl, is_shift)
     selection_requested = pyqtSignal(int, bool, bool)
     double_clicked = pyqtSignal(int)
 
-    def __init__(self, data, db, parent=None):
+    def __init__(self, data, db, parent=None, thumbnail=None, tags=None):
         super().__init__(parent)
         self.setAttribute(Qt.WA_StyledBackground)
         
         self.data = data
         self.db = db
+        self.thumbnail = thumbnail  # 预先批量读取的卡片缩略图 (bytes)
+        self.tags = tags            # 预先批量读取的标签列表，为 None 时自行查询
         self.id = data[0]
         self.setCursor(Qt.PointingHandCursor)
         
@@ -62,26 +64,31 @@ class IdeaCard(QFrame):
         
         # --- 2. 中部：内容预览 (文本 或 图片) ---
         # 解析数据类型
-        # data结构: 0:id, 1:title, 2:content ... 10:item_type, 11:data_blob
+        # data结构: 0:id, 1:title, 2:content ... 10:item_type, 11:data_blob (列表数据中为空)
         item_type = self.data[10] if len(self.data) > 10 and self.data[10] else 'text'
         
         if item_type == 'image':
             # === 图片模式 ===
-            blob_data = self.data[11] if len(self.data) > 11 else None
-            if blob_data:
+            # 只显示缓存的缩略图；还没生成时显示占位，由缩略图线程生成后刷新列表
+            blob_data = self.thumbnail if self.thumbnail is not None else (self.data[11] if len(self.data) > 11 else None)
+            if blob_data is None:
+                placeholder = QLabel("🖼️ 缩略图生成中…")
+                placeholder.setStyleSheet("color: #666; font-style: italic;")
+                layout.addWidget(placeholder)
+            else:
                 pixmap = QPixmap()
-                pixmap.loadFromData(blob_data)
+                pixmap.loadFromData(blob_data or b'')
                 
                 if not pixmap.isNull():
                     img_label = QLabel()
                     # 限制最大显示高度，防止卡片过大
-                    max_height = 160
+                    max_height = THUMB_CARD_HEIGHT
                     if pixmap.height() > max_height:
                         pixmap = pixmap.scaledToHeight(max_height, Qt.SmoothTransformation)
                     
                     # 如果宽度也太宽，限制宽度
-                    if pixmap.width() > 400: # 假设卡片大概这么宽
-                        pixmap = pixmap.scaledToWidth(400, Qt.SmoothTransformation)
+                    if pixmap.width() > THUMB_CARD_MAX_WIDTH: # 假设卡片大概这么宽
+                        pixmap = pixmap.scaledToWidth(THUMB_CARD_MAX_WIDTH, Qt.SmoothTransformation)
                         
                     img_label.setPixmap(pixmap)
                     img_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
@@ -128,7 +135,7 @@ class IdeaCard(QFrame):
         bot.addStretch()
         
         # 标签
-        tags = self.db.get_tags(self.id)
+        tags = self.tags if self.tags is not None else self.db.get_tags(self.id)
         visible_tags = tags[:3]
         remaining = len(tags) - 3
         
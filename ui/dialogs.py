@@ -11,6 +11,7 @@ from PyQt5.QtCore import Qt, QPoint, QRect, QEvent
 from core.config import STYLES, COLORS
 from core.settings import save_setting, load_setting
 from .components.rich_text_edit import RichTextEdit
+from services.thumbnail_service import ThumbnailWorker
 
 # 自定义深灰色滚动条样式
 SCROLLBAR_STYLE = """
@@ -689,7 +690,7 @@ class EditDialog(BaseDialog):
         d = self.db.get_idea(self.idea_id, include_blob=True)
         if d:
             self.title_inp.setText(d[1])
-            item_type = d[9]
+            item_type = d[10]
             if item_type != 'image':
                 self.content_inp.setText(d[2])
             else:
@@ -702,7 +703,7 @@ class EditDialog(BaseDialog):
                 if idx >= 0:
                     self.category_combo.setCurrentIndex(idx)
             
-            data_blob = d[10]
+            data_blob = d[11]
             if item_type == 'image' and data_blob:
                 self.content_inp.set_image_data(data_blob)
 
@@ -735,6 +736,9 @@ class EditDialog(BaseDialog):
             self.db.update_idea(self.idea_id, title, content, color, tags, cat_id, item_type, data_blob)
         else:
             self.db.add_idea(title, content, color, tags, cat_id, item_type, data_blob)
+
+        if data_blob:
+            ThumbnailWorker.instance(self.db).request(data_blob)
         
         self.accept()
 
@@ -829,7 +833,7 @@ class ExtractDialog(BaseDialog):
         self.txt.setPlaceholderText("暂无数据...")
         layout.addWidget(self.txt)
         
-        data = db.get_ideas('', 'all', None)
+        data = db.get_ideas('', 'all', None, full_content=True)
         text = '\n' + '-'*60 + '\n'
         text += '\n'.join([f"【{d[1]}】\n{d[2]}\n" + '-'*60 for d in data])
         self.txt.setText(text)
@@ -11,7 +11,6 @@ from PyQt5.QtGui import QKeySequence, QCursor, QColor, QIntValidator
 from core.config import STYLES, COLORS
 from core.settings import load_setting, save_setting
 from data.db_manager import DatabaseManager
-from services.backup_service import BackupService
 from ui.sidebar import Sidebar
 from ui.cards import IdeaCard
 from ui.dialogs import EditDialog
@@ -19,6 +18,9 @@ from ui.ball import FloatingBall
 from ui.advanced_tag_selector import AdvancedTagSelector
 from ui.components.search_line_edit import SearchLineEdit
 from services.preview_service import PreviewService
+from services.thumbnail_service import THUMB_CARD, ThumbnailWorker
+from services.db_worker import DbWorker
+from services.change_feed import ChangeFeed
 
 # --- 辅助类：流式布局 ---
 class FlowLayout(QLayout):
@@ -120,10 +122,20 @@ class MainWindow(QWidget):
     closing = pyqtSignal()
     RESIZE_MARGIN = 8
 
-    def __init__(self):
+    def __init__(self, db=None):
         super().__init__()
         QApplication.setQuitOnLastWindowClosed(False)
-        self.db = DatabaseManager()
+        # 与快速窗口共用同一个数据库管理器 (底层共享一套连接)
+        self.db = db or DatabaseManager()
+        # 列表、侧边栏、标签面板的查询都在后台线程执行
+        self.db_worker = DbWorker.instance()
+        # 数据变更 (本窗口、其他窗口、后台线程或其他进程) 按受影响的部分刷新
+        self.change_feed = ChangeFeed.instance(self.db)
+        self.change_feed.changed.connect(self._on_data_changed)
+        self._data_stale = False
+        # 当前页有图片还没有缩略图 (显示占位) 时，缩略图生成后重新读取
+        self._thumbs_pending = False
+        ThumbnailWorker.instance(self.db).generated.connect(self._on_thumbnails_generated)
         self.preview_service = PreviewService(self.db, self)
         
         self.curr_filter = ('all', None)
@@ -140,6 +152,12 @@ class MainWindow(QWidget):
         self.current_page = 1
         self.page_size = 20
         self.total_pages = 1
+        self.total_items = 0
+        self._total_pending = False  # 搜索时总数在第一页之后才统计完成
+        # 键集分页游标：页码 -> 上一页最后一行的 page_key
+        self._page_anchors = {}
+        self._page_first_key = None
+        self._page_signature = None
         
         self.open_dialogs = [] # 存储打开的窗口
         
@@ -189,7 +207,7 @@ class MainWindow(QWidget):
         
         self.sidebar = Sidebar(self.db)
         self.sidebar.filter_changed.connect(self._set_filter)
-        self.sidebar.data_changed.connect(self._load_data)
+        self.sidebar.data_changed.connect(self._refresh_all)
         self.sidebar.new_data_requested.connect(self._on_new_data_in_category_requested)
         splitter.addWidget(self.sidebar)
         
@@ -275,12 +293,12 @@ class MainWindow(QWidget):
         self.btn_first = QPushButton("<<")
         self.btn_first.setStyleSheet(page_btn_style)
         self.btn_first.setToolTip("首页")
-        self.btn_first.clicked.connect(lambda: self._set_page(1))
+        self.btn_first.clicked.connect(lambda: self._goto_page(1))
         
         self.btn_prev = QPushButton("<")
         self.btn_prev.setStyleSheet(page_btn_style)
         self.btn_prev.setToolTip("上一页")
-        self.btn_prev.clicked.connect(lambda: self._set_page(self.current_page - 1))
+        self.btn_prev.clicked.connect(lambda: self._goto_page(self.current_page - 1))
         
         self.page_input = QLineEdit()
         self.page_input.setFixedWidth(40)
@@ -295,12 +313,12 @@ class MainWindow(QWidget):
         self.btn_next = QPushButton(">")
         self.btn_next.setStyleSheet(page_btn_style)
         self.btn_next.setToolTip("下一页")
-        self.btn_next.clicked.connect(lambda: self._set_page(self.current_page + 1))
+        self.btn_next.clicked.connect(lambda: self._goto_page(self.current_page + 1))
         
         self.btn_last = QPushButton(">>")
         self.btn_last.setStyleSheet(page_btn_style)
         self.btn_last.setToolTip("末页")
-        self.btn_last.clicked.connect(lambda: self._set_page(self.total_pages))
+        self.btn_last.clicked.connect(lambda: self._goto_page(self.total_pages))
         
         layout.addWidget(self.btn_first)
         layout.addWidget(self.btn_prev)
@@ -350,20 +368,25 @@ class MainWindow(QWidget):
         self.current_page = page_num
         self._load_data()
 
+    def _goto_page(self, page_num):
+        """翻页：沿用已统计的总数，用游标定位目标页"""
+        page_num = max(1, min(page_num, self.total_pages))
+        self._request_page(page_num)
+
     def _jump_to_page(self):
         text = self.page_input.text().strip()
         if text.isdigit():
             page = int(text)
-            self._set_page(page)
+            self._goto_page(page)
         else:
             self.page_input.setText(str(self.current_page))
 
     def _update_pagination_ui(self):
         self.page_input.setText(str(self.current_page))
-        self.total_page_label.setText(f"/ {self.total_pages}")
+        self.total_page_label.setText("/ …" if self._total_pending else f"/ {self.total_pages}")
         
         is_first = (self.current_page <= 1)
-        is_last = (self.current_page >= self.total_pages)
+        is_last = self._total_pending or (self.current_page >= self.total_pages)
         
         self.btn_first.setDisabled(is_first)
         self.btn_prev.setDisabled(is_first)
@@ -678,17 +701,25 @@ class MainWindow(QWidget):
         return dlg.exec_() == QDialog.Accepted
 
     def _refresh_tag_panel(self):
+        """后台读取标签数据，完成后重建标签面板"""
+        if self.selected_ids:
+            count = len(self.selected_ids)
+            self.db_worker.submit('tag_panel', self.db.get_union_tags, list(self.selected_ids),
+                                  on_done=lambda tags: self._render_tag_panel(tags, count))
+        else:
+            self.db_worker.submit('tag_panel', self.db.get_recent_tags, self.tag_input.text().strip(),
+                                  on_done=lambda tags: self._render_tag_panel(tags))
+
+    def _render_tag_panel(self, tags, selection_count=0):
         while self.tag_list_layout.count():
             item = self.tag_list_layout.takeAt(0)
             if item.widget(): item.widget().deleteLater()
             
-        if self.selected_ids:
-            self.tag_panel_title.setText(f"🖊️ 标签管理 ({len(self.selected_ids)})")
+        if selection_count:
+            self.tag_panel_title.setText(f"🖊️ 标签管理 ({selection_count})")
             self.tag_input.setPlaceholderText("输入添加... (双击更多)")
             self.clear_tag_btn.hide()
             
-            tags = self.db.get_union_tags(list(self.selected_ids))
-            
             if not tags:
                 lbl = QLabel("无标签")
                 lbl.setStyleSheet("color:#666; font-style:italic; margin-top:10px;")
@@ -727,25 +758,6 @@ class MainWindow(QWidget):
             else:
                 self.clear_tag_btn.hide()
                 
-            c = self.db.conn.cursor()
-            search_term = self.tag_input.text().strip()
-            sql = '''
-                SELECT t.name, COUNT(it.idea_id) as cnt, MAX(i.updated_at) as last_used
-                FROM tags t 
-                JOIN idea_tags it ON t.id = it.tag_id 
-                JOIN ideas i ON it.idea_id = i.id 
-                WHERE i.is_deleted = 0 
-            '''
-            params = []
-            if search_term:
-                sql += " AND t.name LIKE ?"
-                params.append(f"%{search_term}%")
-            
-            sql += ' GROUP BY t.id ORDER BY last_used DESC, cnt DESC, t.name ASC'
-            
-            c.execute(sql, params)
-            tags = c.fetchall()
-            
             if not tags:
                 return
                 
@@ -937,26 +949,120 @@ class MainWindow(QWidget):
         self._refresh_tag_panel()
 
     def _load_data(self):
+        # 筛选条件变化后，旧的分页游标全部作废，并回到第一页
+        signature = (self.search.text(), self.curr_filter, self.current_tag_filter)
+        if signature != self._page_signature:
+            self._page_signature = signature
+            self._page_anchors = {}
+            self.current_page = 1
+
+        if self.current_page < 1: self.current_page = 1
+        if self.search.text().strip():
+            # 搜索时先显示当前页，总数随后单独统计 (全文检索的计数可能较慢)
+            self._total_pending = True
+            self._request_page(self.current_page)
+            self._request_total()
+        else:
+            # 当前页与总数在同一次查询中取回
+            self._total_pending = False
+            self.db_worker.cancel('main_count')
+            self._request_page(self.current_page, with_total=True)
+
+    def _request_total(self):
+        args = (self.search.text(), *self.curr_filter)
+        self.db_worker.submit('main_count', self.db.get_ideas_count, *args, tag_filter=self.current_tag_filter,
+                              on_done=self._on_total_loaded)
+
+    def _on_total_loaded(self, total):
+        self._total_pending = False
+        self._set_total(total)
+        if self.current_page > self.total_pages:
+            self._request_page(self.total_pages)
+        else:
+            self._update_pagination_ui()
+
+    def _set_total(self, total):
+        self.total_items = total
+        self.total_pages = math.ceil(total / self.page_size) if total > 0 else 1
+
+    def _page_plans(self, page):
+        """
+        按页码生成分页参数 (依次尝试，直到取到数据)：优先使用游标，只有跳页时才需要跳过若干行。
+        在 GUI 线程计算，交给后台线程执行。
+        """
+        if page == 1:
+            return [{}]
+        plans = []
+        anchors = self._page_anchors
+        if page in anchors:
+            plans.append({'after': anchors[page]})
+            anchors = {}  # 游标可能已失效 (数据被大量删除)，失败时退回跳页方式
+        elif page == self.current_page - 1 and self._page_first_key is not None:
+            return [{'before': self._page_first_key}]
+
+        # 跳页：从最近的已知游标向后跳，或从列表末尾向前跳，取较近的一侧
+        known = max((p for p in anchors if p < page), default=1)
+        skip_forward = (page - known) * self.page_size
+        skip_backward = self.total_items - page * self.page_size
+        if max(0, skip_backward) < skip_forward:
+            plans.append({'from_end': True, 'offset': max(0, skip_backward),
+                          'page_size': self.page_size + min(0, skip_backward)})
+        else:
+            plans.append({'after': anchors.get(known), 'offset': skip_forward})
+        return plans
+
+    def _request_page(self, page, with_total=False):
+        """在后台线程读取一页数据 (行、总数、缩略图、标签)，完成后回到 GUI 线程渲染"""
+        db = self.db
+        args = (self.search.text(), *self.curr_filter)
+        base = {'page_size': self.page_size, 'tag_filter': self.current_tag_filter, 'with_total': with_total}
+        plans = self._page_plans(page)
+
+        def work():
+            for used, plan in enumerate(plans):
+                rows = db.get_ideas_page(*args, **{**base, **plan})
+                rows, total = rows if with_total else (rows, None)
+                if rows: break
+            image_ids = [d[0] for d in rows if len(d) > 10 and d[10] == 'image']
+            # 缩略图尚未生成的图片显示占位，不读取原图
+            thumbs = db.get_thumbnails(image_ids, THUMB_CARD) if image_ids else {}
+            tags_map = db.get_tags_for_ideas([d[0] for d in rows])
+            return {'rows': rows, 'total': total, 'thumbs': thumbs, 'tags': tags_map, 'fallback': used > 0}
+
+        self.db_worker.submit('main_list', work, on_done=lambda result: self._on_page_loaded(page, result, with_total))
+
+    def _on_page_loaded(self, page, result, with_total):
+        if result['fallback']:
+            self._page_anchors = {}
+        if with_total:
+            self._set_total(result['total'])
+            # 数据减少导致当前页越界时，退到最后一页
+            if page > self.total_pages:
+                self._request_page(self.total_pages)
+                return
+        self._show_page(page, result)
+
+    def _show_page(self, page, result):
         while self.list_layout.count():
             w = self.list_layout.takeAt(0).widget()
             if w: w.deleteLater()
         self.cards = {}
         self.card_ordered_ids = []
-        
-        # 【核心补充】此处必须先计算总数，否则分页控件全是 1/1
-        total_items = self.db.get_ideas_count(self.search.text(), *self.curr_filter, tag_filter=self.current_tag_filter)
-        self.total_pages = math.ceil(total_items / self.page_size) if total_items > 0 else 1
-        
-        # 修正页码范围
-        if self.current_page > self.total_pages: self.current_page = self.total_pages
-        if self.current_page < 1: self.current_page = 1
 
-        data_list = self.db.get_ideas(self.search.text(), *self.curr_filter, page=self.current_page, page_size=self.page_size, tag_filter=self.current_tag_filter)
-        
+        data_list = result['rows']
+        thumbs, tags_map = result['thumbs'], result['tags']
+        self.current_page = page
+        self._thumbs_pending = any(len(d) > 10 and d[10] == 'image' and d[0] not in thumbs for d in data_list)
+        if data_list:
+            self._page_first_key = self.db.page_key(data_list[0])
+            self._page_anchors[page + 1] = self.db.page_key(data_list[-1])
+        else:
+            self._page_first_key = None
+
         if not data_list:
             self.list_layout.addWidget(QLabel("🔭 空空如也", alignment=Qt.AlignCenter, styleSheet="color:#666;font-size:16px;margin-top:50px"))
         for d in data_list:
-            c = IdeaCard(d, self.db)
+            c = IdeaCard(d, self.db, thumbnail=thumbs.get(d[0]), tags=tags_map.get(d[0], []))
             c.get_selected_ids_func = lambda: list(self.selected_ids)
             c.selection_requested.connect(self._handle_selection_request)
             c.double_clicked.connect(self._extract_single)
@@ -1001,8 +1107,7 @@ class MainWindow(QWidget):
 
     def _move_to_category(self, cat_id):
         if self.selected_ids:
-            for iid in self.selected_ids:
-                self.db.move_category(iid, cat_id)
+            self.db.move_category_many(self.selected_ids, cat_id)
             self._refresh_all()
             self._show_tooltip(f'✅ 已移动 {len(self.selected_ids)} 项')
 
@@ -1090,37 +1195,66 @@ class MainWindow(QWidget):
 
     def _do_pin(self):
         if self.selected_ids:
-            for iid in self.selected_ids: self.db.toggle_field(iid, 'is_pinned')
-            self._load_data()
+            self.db.toggle_field_many(self.selected_ids, 'is_pinned')
+            self._refresh_all()
 
     def _do_fav(self):
         if self.selected_ids:
-            for iid in self.selected_ids: self.db.toggle_field(iid, 'is_favorite')
+            self.db.toggle_field_many(self.selected_ids, 'is_favorite')
             self._refresh_all()
 
     def _do_del(self):
         if self.selected_ids:
-            for iid in self.selected_ids: self.db.set_deleted(iid, True)
+            self.db.set_deleted_many(self.selected_ids, True)
             self.selected_ids.clear()
             self._refresh_all()
 
     def _do_restore(self):
         if self.selected_ids:
-            for iid in self.selected_ids: self.db.set_deleted(iid, False)
+            self.db.set_deleted_many(self.selected_ids, False)
             self.selected_ids.clear()
             self._refresh_all()
 
     def _do_destroy(self):
         if self.selected_ids and QMessageBox.Yes == QMessageBox.warning(self, '⚠️ 警告', f'确定永久删除选中的 {len(self.selected_ids)} 项?\n此操作不可恢复!', QMessageBox.Yes | QMessageBox.No):
-            for iid in self.selected_ids: self.db.delete_permanent(iid)
+            self.db.delete_permanent_many(self.selected_ids)
             self.selected_ids.clear()
             self._refresh_all()
 
     def _refresh_all(self):
-        self._load_data()
-        self.sidebar.refresh()
+        """写操作之后调用：立即通知变更，按受影响的部分刷新 (见 _on_data_changed)；无法判断时整体刷新"""
+        self.change_feed.notify()
         self._update_ui_state()
-        self._refresh_tag_panel()
+
+    def _on_data_changed(self, changes):
+        """
+        列表只在笔记、标签或分类变化时重新读取当前页；侧边栏分类不变时只更新计数；
+        标签面板只在标签变化时刷新。窗口隐藏期间只做标记，显示时再整体刷新。
+        """
+        if not self.isVisible():
+            self._data_stale = True
+            return
+        if changes is None or changes.touches('ideas', 'idea_tags', 'tags', 'categories'):
+            self._load_data()
+        self.sidebar.apply_changes(changes)
+        if changes is None or changes.touches('tags', 'idea_tags'):
+            self._refresh_tag_panel()
+
+    def _on_thumbnails_generated(self, _hashes):
+        if not self._thumbs_pending:
+            return
+        if not self.isVisible():
+            self._data_stale = True
+            return
+        self._load_data()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._data_stale:
+            self._data_stale = False
+            self._load_data()
+            self.sidebar.refresh()
+            self._refresh_tag_panel()
 
     def _extract_single(self, idea_id):
         data = self.db.get_idea(idea_id)
@@ -1134,16 +1268,17 @@ class MainWindow(QWidget):
 
     # 【补充方法】_extract_all
     def _extract_all(self):
-        data = self.db.get_ideas('', 'all', None)
+        data = self.db.get_ideas('', 'all', None, full_content=True)
         if not data:
             self._show_tooltip('🔭 暂无数据', 1500)
             return
         lines = ['='*60, '💡 灵感闪记 - 内容导出', '='*60, '']
+        tags_map = self.db.get_tags_for_ideas([d[0] for d in data])
         for d in data:
             lines.append(f"【{d[1]}】")
             if d[4]: lines.append('📌 已置顶')
             if d[5]: lines.append('⭐ 已收藏')
-            tags = self.db.get_tags(d[0])
+            tags = tags_map.get(d[0])
             if tags: lines.append(f"标签: {', '.join(tags)}")
             lines.append(f"时间: {d[6]}")
             if d[2]: lines.append(f"\n{d[2]}")
@@ -1167,10 +1302,6 @@ class MainWindow(QWidget):
         self.show()
         self.activateWindow()
 
-    def quit_app(self):
-        BackupService.run_backup()
-        QApplication.quit()
-
     def _save_window_state(self):
         save_setting("main_window_geometry_hex", self.saveGeometry().toHex().data().decode())
         save_setting("main_window_maximized", self.isMaximized())
@@ -15,9 +15,11 @@ from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QListWidget, QL
 from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, QSettings, QUrl, QMimeData, pyqtSignal, QObject, QSize, QByteArray
 from PyQt5.QtGui import QImage, QColor, QCursor, QPixmap, QPainter, QIcon, QKeySequence, QDrag
 from services.preview_service import PreviewService
+from services.db_worker import DbWorker
+from services.change_feed import ChangeFeed
 from ui.dialogs import EditDialog
 from ui.advanced_tag_selector import AdvancedTagSelector
-from core.config import COLORS
+from core.config import COLORS, QUICK_FIRST_PAGE
 from core.settings import load_setting, save_setting
 
 # =================================================================================
@@ -62,7 +64,9 @@ def log(message):
 try:
     from data.db_manager import DatabaseManager as DBManager
     from services.clipboard import ClipboardManager
+    from services.thumbnail_service import THUMB_LIST
 except ImportError:
+    THUMB_LIST = 'list'
     class DBManager:
         def get_items(self, **kwargs): return []
         def get_partitions_tree(self): return []
@@ -232,6 +236,13 @@ class QuickWindow(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
+        self.db_worker = DbWorker.instance()
+        # 数据变更时只刷新受影响的列表与分区计数
+        self.change_feed = ChangeFeed.instance(self.db)
+        self.change_feed.changed.connect(self._on_data_changed)
+        self._data_stale = False
+        # 列表中有图片还没有缩略图 (显示占位图标) 时，缩略图生成后重新读取
+        self._thumbs_pending = False
         self.settings = QSettings("MyTools", "RapidNotes")
         
         self.m_drag = False
@@ -245,14 +256,16 @@ class QuickWindow(QWidget):
         self.my_hwnd = None
         
         self.cm = ClipboardManager(self.db)
+        if getattr(self.cm, 'thumbnails', None):
+            self.cm.thumbnails.generated.connect(self._on_thumbnails_generated)
         self.clipboard = QApplication.clipboard()
         self.clipboard.dataChanged.connect(self.on_clipboard_changed)
         
         # 【新增】撤销栈，用于记录最近自动创建的 ID
         self.creation_history = []
         
-        # 1. 连接更新列表
-        self.cm.data_captured.connect(self._update_list)
+        # 1. 采集后立即检查变更，更新列表
+        self.cm.data_captured.connect(lambda _id: self.change_feed.check())
         # 2. 连接记录历史 (用于 Ctrl+Z 撤销)
         self.cm.data_captured.connect(self._record_creation_history)
         
@@ -461,8 +474,7 @@ class QuickWindow(QWidget):
             self.db.delete_permanent(last_id)
             
             # 刷新 UI
-            self._update_list()
-            self._update_partition_tree()
+            self.change_feed.notify()
             
             # 显示反馈
             QToolTip.showText(QCursor.pos(), f"↩️ 已撤销最后一次创建 (ID: {last_id})", self)
@@ -524,7 +536,7 @@ class QuickWindow(QWidget):
     def _copy_item_content(self, data):
         item_type_idx = 10
         item_type = data[item_type_idx] if len(data) > item_type_idx else 'text'
-        content = data[2]
+        content = self._full_content(data)
         if item_type == 'text' and content:
             QApplication.clipboard().setText(content)
 
@@ -543,35 +555,32 @@ class QuickWindow(QWidget):
         if iid:
             dialog = EditDialog(self.db, idea_id=iid)
             if dialog.exec_():
-                self._update_list()
-                self._update_partition_tree()
+                self.change_feed.notify()
 
     def _do_delete_selected(self):
         iid = self._get_selected_id()
         if iid:
             self.db.set_deleted(iid, True)
-            self._update_list()
-            self._update_partition_tree()
+            self.change_feed.notify()
 
     def _do_toggle_favorite(self):
         iid = self._get_selected_id()
         if iid:
             self.db.toggle_field(iid, 'is_favorite')
-            self._update_list() 
+            self.change_feed.notify()
 
     def _do_toggle_pin(self):
         iid = self._get_selected_id()
         if iid:
             self.db.toggle_field(iid, 'is_pinned')
-            self._update_list()
+            self.change_feed.notify()
 
     def _handle_category_drop(self, idea_id, cat_id):
         if cat_id == -20: # 收藏
              self.db.set_favorite(idea_id, True)
         else:
              self.db.move_category(idea_id, cat_id)
-        self._update_list()
-        self._update_partition_tree()
+        self.change_feed.notify()
 
     def _save_partition_order(self):
         update_list = []
@@ -704,6 +713,28 @@ class QuickWindow(QWidget):
     def showEvent(self, event):
         if not self.my_hwnd and user32: self.my_hwnd = int(self.winId())
         super().showEvent(event)
+        if self._data_stale:
+            self._data_stale = False
+            self._update_partition_tree()
+            self._update_list()
+
+    def _on_data_changed(self, changes):
+        """分区计数只在笔记或分类变化时重建，列表只在笔记、标签关联或分类变化时重新读取；隐藏期间只做标记"""
+        if not self.isVisible():
+            self._data_stale = True
+            return
+        if changes is None or changes.touches('ideas', 'categories'):
+            self._update_partition_tree()
+        if changes is None or changes.touches('ideas', 'idea_tags', 'categories'):
+            self._update_list()
+
+    def _on_thumbnails_generated(self, _hashes):
+        if not self._thumbs_pending:
+            return
+        if not self.isVisible():
+            self._data_stale = True
+            return
+        self._update_list()
 
     def _monitor_foreground_window(self):
         if not user32: return 
@@ -745,20 +776,48 @@ class QuickWindow(QWidget):
         else:
             f_type, f_val = 'all', None
 
-        items = self.db.get_ideas(search=search_text, f_type=f_type, f_val=f_val)
-        self.list_widget.clear()
-        
-        # 1. 预加载分类映射 (ID -> Name)
-        categories = {c[0]: c[1] for c in self.db.get_categories()}
-        
+        db = self.db
+
+        def load(after=None):
+            """读取一批列表项；after 为空时只取第一屏，否则取 after 之后的全部"""
+            limit = QUICK_FIRST_PAGE if after is None else None
+            items = db.get_ideas_page(search_text, f_type, f_val, page_size=limit, after=after)
+            # 1. 预加载分类映射 (ID -> Name)
+            categories = {c[0]: c[1] for c in db.get_categories()}
+            # 2. 批量读取图片的列表缩略图，尚未生成的显示占位图标，不读取原图
+            image_ids = [t[0] for t in items if len(t) > 10 and t[10] == 'image']
+            thumbs = db.get_thumbnails(image_ids, THUMB_LIST) if image_ids else {}
+            # 3. 一次查询取回所有行的标签 (用于 Tooltip)
+            tags_map = db.get_tags_for_ideas([t[0] for t in items])
+            return items, categories, thumbs, tags_map
+
+        def on_first_page(result):
+            self._render_list(*result)
+            items = result[0]
+            if len(items) == QUICK_FIRST_PAGE:
+                # 第一屏先显示，其余结果随后追加
+                self.db_worker.submit('quick_list', load, db.page_key(items[-1]),
+                                      on_done=lambda rest: self._render_list(*rest, append=True))
+
+        # 查询在后台线程执行，连续输入时旧的查询会被中止
+        self.db_worker.submit('quick_list', load, on_done=on_first_page)
+
+    def _render_list(self, items, categories, thumbs, tags_map, append=False):
+        if not append:
+            self.list_widget.clear()
+            self._thumbs_pending = False
+
         for item_tuple in items:
             list_item = QListWidgetItem()
             list_item.setData(Qt.UserRole, item_tuple)
             
             item_type = item_tuple[10] if len(item_tuple) > 10 else 'text'
             if item_type == 'image':
-                blob_data = item_tuple[11] if len(item_tuple) > 11 else None
-                if blob_data:
+                blob_data = thumbs.get(item_tuple[0])
+                if blob_data is None:
+                    self._thumbs_pending = True
+                    list_item.setIcon(self.style().standardIcon(QStyle.SP_FileIcon))
+                elif blob_data:
                     pixmap = QPixmap()
                     pixmap.loadFromData(blob_data)
                     if not pixmap.isNull():
@@ -773,14 +832,14 @@ class QuickWindow(QWidget):
             category_id = item_tuple[8]
             
             cat_name = categories.get(category_id, "未分类")
-            tags = self.db.get_tags(idea_id)
+            tags = tags_map.get(idea_id)
             tags_str = " ".join([f"#{t}" for t in tags]) if tags else "无"
             
             tooltip = f"📂 分区: {cat_name}\n🏷️ 标签: {tags_str}"
             list_item.setToolTip(tooltip)
             
             self.list_widget.addItem(list_item)
-        if self.list_widget.count() > 0: self.list_widget.setCurrentRow(0)
+        if not append and self.list_widget.count() > 0: self.list_widget.setCurrentRow(0)
 
     def _get_content_display(self, item_tuple):
         title = item_tuple[1]
@@ -896,6 +955,11 @@ class QuickWindow(QWidget):
         else:
             user32.SetWindowPos(hwnd, HWND_NOTOPMOST, 0, 0, 0, 0, SWP_FLAGS)
 
+    def _full_content(self, item_tuple):
+        """列表行中的大段正文只有前缀，粘贴 / 复制前读取完整正文"""
+        full = self.db.get_idea(item_tuple[0])
+        return full[2] if full else item_tuple[2]
+
     def _on_item_activated(self, item):
         item_tuple = item.data(Qt.UserRole)
         if not item_tuple: return
@@ -908,22 +972,21 @@ class QuickWindow(QWidget):
             
             if item_type == 'image':
                 blob_index = 11
-                image_blob = item_tuple[blob_index]
+                full = self.db.get_idea(item_tuple[0], include_blob=True)
+                image_blob = full[blob_index] if full else None
                 if image_blob:
                     image = QImage()
                     image.loadFromData(image_blob)
                     clipboard.setImage(image)
             elif item_type == 'file':
-                content_index = 2
-                file_path_str = item_tuple[content_index]
+                file_path_str = self._full_content(item_tuple)
                 if file_path_str:
                     mime_data = QMimeData()
                     urls = [QUrl.fromLocalFile(p) for p in file_path_str.split(';') if p]
                     mime_data.setUrls(urls)
                     clipboard.setMimeData(mime_data)
             else:
-                content_index = 2
-                content_to_copy = item_tuple[content_index] if item_tuple[content_index] else ""
+                content_to_copy = self._full_content(item_tuple) or ""
                 clipboard.setText(content_to_copy)
 
             self._paste_ditto_style()
@@ -1013,51 +1076,45 @@ class QuickWindow(QWidget):
     def _request_new_data(self, cat_id):
         dialog = EditDialog(self.db, category_id_for_new=cat_id)
         if dialog.exec_():
-            self._update_list()
-            self._update_partition_tree()
+            self.change_feed.notify()
 
     def _new_group(self):
         text, ok = QInputDialog.getText(self, '新建组', '组名称:')
         if ok and text:
             self.db.add_category(text, parent_id=None)
-            self._update_partition_tree()
+            self.change_feed.notify()
             
     def _new_zone(self, parent_id):
         text, ok = QInputDialog.getText(self, '新建区', '区名称:')
         if ok and text:
             self.db.add_category(text, parent_id=parent_id)
-            self._update_partition_tree()
+            self.change_feed.notify()
 
     def _rename_category(self, cat_id, old_name):
         text, ok = QInputDialog.getText(self, '重命名', '新名称:', text=old_name)
         if ok and text and text.strip():
             self.db.rename_category(cat_id, text.strip())
-            self._update_partition_tree()
-            self._update_list() # 可能影响列表显示的分类名
+            self.change_feed.notify()
 
     def _del_category(self, cid):
-        c = self.db.conn.cursor()
-        c.execute("SELECT COUNT(*) FROM categories WHERE parent_id = ?", (cid,))
-        child_count = c.fetchone()[0]
+        child_ids = self.db.get_child_category_ids(cid)
+        child_count = len(child_ids)
 
         msg = '确认删除此分类? (其中的内容将移至未分类)'
         if child_count > 0:
             msg = f'此组包含 {child_count} 个区，确认一并删除?\n(所有内容都将移至未分类)'
 
         if QMessageBox.Yes == QMessageBox.question(self, '确认删除', msg):
-            c.execute("SELECT id FROM categories WHERE parent_id = ?", (cid,))
-            child_ids = [row[0] for row in c.fetchall()]
             for child_id in child_ids:
                 self.db.delete_category(child_id)
             self.db.delete_category(cid)
-            self._update_partition_tree()
-            self._update_list()
+            self.change_feed.notify()
 
     def _change_color(self, cat_id):
         color = QColorDialog.getColor(Qt.gray, self, "选择分类颜色")
         if color.isValid():
             self.db.set_category_color(cat_id, color.name())
-            self._update_partition_tree()
+            self.change_feed.notify()
 
     def _set_preset_tags(self, cat_id):
         current_tags = self.db.get_category_preset_tags(cat_id)
@@ -7,6 +7,10 @@ from PyQt5.QtCore import Qt, pyqtSignal, QSize, QEvent
 from PyQt5.QtGui import QFont, QColor, QPixmap, QPainter, QIcon, QCursor
 from core.config import COLORS
 from ui.advanced_tag_selector import AdvancedTagSelector
+from services.db_worker import DbWorker
+
+# 计数标签：(显示名称, 系统项的计数键, 分类项参与计数的分类 id)，计数变化时原位更新文字
+_COUNT_ROLE = Qt.UserRole + 1
 
 # 可双击的输入框，用于触发标签选择器
 class ClickableLineEdit(QLineEdit):
@@ -23,6 +27,7 @@ class Sidebar(QTreeWidget):
     def __init__(self, db, parent=None):
         super().__init__(parent)
         self.db = db
+        self.db_worker = DbWorker.instance()
         self.setHeaderHidden(True)
         self.setIndentation(15)
         
@@ -68,9 +73,34 @@ class Sidebar(QTreeWidget):
         super().enterEvent(event)
 
     def refresh(self):
+        """后台读取计数与分区树，完成后重建列表"""
+        db = self.db
+        self.db_worker.submit('sidebar', lambda: (db.get_counts(), db.get_partitions_tree()),
+                              on_done=lambda result: self._rebuild(*result))
+
+    def apply_changes(self, changes):
+        """按数据变更增量更新 (changes 为 None 时整体刷新)：分类有变化才重建，否则只原位更新计数"""
+        if changes is None or changes.touches('categories'):
+            self.refresh()
+        elif changes.touches('ideas', 'idea_tags'):
+            self.db_worker.submit('sidebar_counts', self.db.get_counts, on_done=self._apply_counts)
+
+    def _apply_counts(self, counts):
+        categories = counts.get('categories', {})
+        pending = [self.topLevelItem(i) for i in range(self.topLevelItemCount())]
+        while pending:
+            item = pending.pop()
+            pending.extend(item.child(i) for i in range(item.childCount()))
+            label = item.data(0, _COUNT_ROLE)
+            if not label:
+                continue
+            name, key, category_ids = label
+            count = counts.get(key, 0) if key else sum(categories.get(cid, 0) for cid in category_ids)
+            item.setText(0, f"{name} ({count})")
+
+    def _rebuild(self, counts, partitions_tree):
         self.clear()
         self.setColumnCount(1)
-        counts = self.db.get_counts()
 
         system_menu_items = [
             ("全部数据", 'all', '🗂️'), ("今日数据", 'today', '📅'),
@@ -82,6 +112,7 @@ class Sidebar(QTreeWidget):
         for name, key, icon in system_menu_items:
             item = QTreeWidgetItem(self, [f"{icon}  {name} ({counts.get(key, 0)})"])
             item.setData(0, Qt.UserRole, (key, None))
+            item.setData(0, _COUNT_ROLE, (f"{icon}  {name}", key, None))
             item.setFlags(item.flags() & ~Qt.ItemIsDragEnabled)
             item.setExpanded(False)
 
@@ -115,7 +146,6 @@ class Sidebar(QTreeWidget):
         user_partitions_root.setFont(0, font)
         user_partitions_root.setForeground(0, QColor("#FFFFFF"))
         
-        partitions_tree = self.db.get_partitions_tree()
         self._add_partition_recursive(partitions_tree, user_partitions_root, counts.get('categories', {}))
         
         self.expandAll()
@@ -142,6 +172,7 @@ class Sidebar(QTreeWidget):
             item = QTreeWidgetItem(parent_item, [f"{p.name} ({total_count})"])
             item.setIcon(0, self._create_color_icon(p.color))
             item.setData(0, Qt.UserRole, ('category', p.id))
+            item.setData(0, _COUNT_ROLE, (p.name, None, [p.id] + [child.id for child in p.children]))
             
             if p.children:
                 self._add_partition_recursive(p.children, item, counts)
@@ -187,14 +218,12 @@ class Sidebar(QTreeWidget):
                 if not d: return
                 key, val = d
                 
-                for iid in ids_to_process:
-                    if key == 'category': self.db.move_category(iid, val)
-                    elif key == 'uncategorized': self.db.move_category(iid, None)
-                    elif key == 'trash': self.db.set_deleted(iid, True)
-                    elif key == 'favorite': self.db.set_favorite(iid, True)
+                if key == 'category': self.db.move_category_many(ids_to_process, val)
+                elif key == 'uncategorized': self.db.move_category_many(ids_to_process, None)
+                elif key == 'trash': self.db.set_deleted_many(ids_to_process, True)
+                elif key == 'favorite': self.db.set_favorite_many(ids_to_process, True)
                 
                 self.data_changed.emit()
-                self.refresh()
                 e.acceptProposedAction()
             except Exception as err:
                 pass
@@ -302,7 +331,7 @@ class Sidebar(QTreeWidget):
         color = QColorDialog.getColor(Qt.gray, self, "选择分类颜色")
         if color.isValid():
             self.db.set_category_color(cat_id, color.name())
-            self.refresh()
+            self.data_changed.emit()
 
     def _request_new_data(self, cat_id):
         self.new_data_requested.emit(cat_id)
@@ -311,33 +340,30 @@ class Sidebar(QTreeWidget):
         text, ok = QInputDialog.getText(self, '新建组', '组名称:')
         if ok and text:
             self.db.add_category(text, parent_id=None)
-            self.refresh()
+            self.data_changed.emit()
             
     def _new_zone(self, parent_id):
         text, ok = QInputDialog.getText(self, '新建区', '区名称:')
         if ok and text:
             self.db.add_category(text, parent_id=parent_id)
-            self.refresh()
+            self.data_changed.emit()
 
     def _rename_category(self, cat_id, old_name):
         text, ok = QInputDialog.getText(self, '重命名', '新名称:', text=old_name)
         if ok and text and text.strip():
             self.db.rename_category(cat_id, text.strip())
-            self.refresh()
+            self.data_changed.emit()
 
     def _del_category(self, cid):
-        c = self.db.conn.cursor()
-        c.execute("SELECT COUNT(*) FROM categories WHERE parent_id = ?", (cid,))
-        child_count = c.fetchone()[0]
+        child_ids = self.db.get_child_category_ids(cid)
+        child_count = len(child_ids)
 
         msg = '确认删除此分类? (其中的内容将移至未分类)'
         if child_count > 0:
             msg = f'此组包含 {child_count} 个区，确认一并删除?\n(所有内容都将移至未分类)'
 
         if QMessageBox.Yes == QMessageBox.question(self, '确认删除', msg):
-            c.execute("SELECT id FROM categories WHERE parent_id = ?", (cid,))
-            child_ids = [row[0] for row in c.fetchall()]
             for child_id in child_ids:
                 self.db.delete_category(child_id)
             self.db.delete_category(cid)
-            self.refresh()
\ No newline at end of file
+            self.data_changed.emit()
\ No newline at end of file